@@ -0,0 +1,17 @@
+import pytest
+from django.conf import settings
+from django.test import override_settings
+
+
+@pytest.fixture(autouse=True, scope="session")
+def session_cache_dir(tmp_path_factory):
+    """Keep the sessions of test logins out of the project's cache directory"""
+    cache_settings = {
+        **settings.CACHES,
+        "sessions": {
+            **settings.CACHES["sessions"],
+            "LOCATION": tmp_path_factory.mktemp("sessions"),
+        },
+    }
+    with override_settings(CACHES=cache_settings):
+        yield
@@ -21,6 +21,7 @@ mkdir -p /srv/gymtracker/app
 mkdir -p /srv/gymtracker/data
 mkdir -p /srv/gymtracker/backups
 mkdir -p /srv/gymtracker/logs
+mkdir -p /srv/gymtracker/cache
 
 # Install uv for the gymtracker user
 echo "Installing uv for gymtracker user..."
@@ -32,14 +33,18 @@ echo "Enabling systemd user services..."
 sudo -u gymtracker systemctl --user daemon-reload
 sudo loginctl enable-linger gymtracker
 
-# Copy systemd service file to user directory
+# Copy systemd service files to user directory
 echo "Installing systemd service..."
 sudo -u gymtracker mkdir -p /home/gymtracker/.config/systemd/user/
 sudo -u gymtracker cp deploy/gymtracker.service /home/gymtracker/.config/systemd/user/
+sudo -u gymtracker cp deploy/gymtracker-backup.service deploy/gymtracker-backup.timer /home/gymtracker/.config/systemd/user/
+sudo -u gymtracker cp deploy/gymtracker-sweep-sessions.service deploy/gymtracker-sweep-sessions.timer /home/gymtracker/.config/systemd/user/
 
-# Reload systemd and enable service
+# Reload systemd and enable service, nightly backups and session cleanup
 sudo -u gymtracker systemctl --user daemon-reload
 sudo -u gymtracker systemctl --user enable gymtracker
+sudo -u gymtracker systemctl --user enable --now gymtracker-backup.timer
+sudo -u gymtracker systemctl --user enable --now gymtracker-sweep-sessions.timer
 
 echo "✅ Server setup completed!"
 echo ""
@@ -53,3 +58,4 @@ echo "  sudo -u gymtracker systemctl --user status gymtracker"
 echo "  sudo -u gymtracker systemctl --user start gymtracker"
 echo "  sudo -u gymtracker systemctl --user stop gymtracker"
 echo "  sudo -u gymtracker systemctl --user restart gymtracker"
+echo "  sudo -u gymtracker systemctl --user start gymtracker-backup"
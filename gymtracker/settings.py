@@ -12,9 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
-import sentry_sdk
-from sentry_sdk.integrations.django import DjangoIntegration
 
 # Load environment variables from .env file in user's home directory
 load_dotenv(os.path.expanduser("~/.env"))
@@ -22,6 +21,11 @@ load_dotenv(os.path.expanduser("~/.env"))
 # Initialize Sentry if BUGSINK_DSN is provided
 BUGSINK_DSN = os.getenv("BUGSINK_DSN")
 if BUGSINK_DSN:
+    # Imported here: the SDK adds ~150ms to every process start, including
+    # management commands, and is only needed when error tracking is set up
+    import sentry_sdk
+    from sentry_sdk.integrations.django import DjangoIntegration
+
     sentry_sdk.init(
         dsn=BUGSINK_DSN,
         integrations=[
@@ -57,6 +61,7 @@ SECRET_KEY = "django-insecure-#s$cy)k&ldy6r^12mx*n=dh4oj6lth0bln@53v^2)ocp^9!&*(
 # Smart DEBUG setting: True for development (no ALLOWED_HOSTS), False for production
 if allowed_hosts := os.getenv("ALLOWED_HOSTS"):
     ALLOWED_HOSTS = [host.strip() for host in allowed_hosts.split(",")]
+    DEBUG = False
 else:
     DEBUG = True  # Development mode
 
@@ -84,12 +89,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "workouts.middleware.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "workouts.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "workouts.middleware.GymMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    "workouts.middleware.ProfilerMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
 ]
@@ -117,13 +126,57 @@ WSGI_APPLICATION = "gymtracker.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+DATABASE_PATH = Path(os.getenv("DATABASE_PATH", BASE_DIR / "db.sqlite3")).resolve()
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": os.getenv("DATABASE_PATH", BASE_DIR / "db.sqlite3"),
-    }
+        "NAME": DATABASE_PATH,
+        "OPTIONS": {
+            # In WAL mode readers and the writer don't block each other
+            "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+        },
+    },
+    # Read-only connection to the same database for reporting queries, see
+    # workouts.routers
+    "analytics": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": f"{DATABASE_PATH.as_uri()}?mode=ro",
+        "TEST": {"MIRROR": "default"},
+    },
+    # Read-only connection that also sees the archived workouts, see
+    # workouts.archive
+    "archive": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": f"{DATABASE_PATH.as_uri()}?mode=ro",
+        "TEST": {"MIRROR": "default"},
+    },
 }
 
+# Gyms whose members' workouts are kept in a database of their own, as a comma
+# separated list of Gym slugs, see workouts.shards
+GYM_SHARDS = [slug for slug in os.getenv("GYM_SHARDS", "").split(",") if slug]
+GYM_SHARD_DIR = Path(os.getenv("GYM_SHARD_DIR", DATABASE_PATH.parent / "gyms"))
+for slug in GYM_SHARDS:
+    DATABASES[f"gym_{slug}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": GYM_SHARD_DIR / f"{slug}.sqlite3",
+        "OPTIONS": DATABASES["default"]["OPTIONS"],
+        # Attached read-only for the users, exercises and other shared tables
+        "CATALOG": DATABASE_PATH,
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = [
+    "workouts.routers.TenantRouter",
+    "workouts.routers.AnalyticsRouter",
+]
+
+# Workout sessions older than this many days are moved to yearly archive
+# databases by the archive_workouts command, see workouts.archive
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", DATABASE_PATH.parent / "archive"))
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -185,6 +238,12 @@ LOGOUT_REDIRECT_URL = "/"
 # Session configuration - remember users by default (2 weeks)
 SESSION_COOKIE_AGE = 1209600  # 2 weeks in seconds
 
+# Sessions are read from the "sessions" cache, which every worker process
+# shares, and written through to the database. Expired sessions are deleted by
+# the sweep_sessions command.
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+SESSION_CACHE_ALIAS = "sessions"
+
 # Email configuration
 # For local development with Mailpit
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
@@ -208,6 +267,134 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# In production collectstatic writes content-hashed, precompressed files and
+# the app serves them itself (see workouts.assets)
+if not DEBUG:
+    STORAGES = {
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {
+            "BACKEND": "workouts.assets.CompressedManifestStaticFilesStorage"
+        },
+    }
+
+# Optionally delegate static file delivery to a front-end server, e.g.
+# STATIC_SENDFILE_HEADER=X-Accel-Redirect for nginx
+STATIC_SENDFILE_HEADER = os.getenv("STATIC_SENDFILE_HEADER")
+STATIC_SENDFILE_PREFIX = os.getenv("STATIC_SENDFILE_PREFIX", "/internal-static/")
+
+# Response compression (see workouts.middleware). Bodies smaller than the
+# minimum size aren't worth the CPU; higher levels trade CPU for bandwidth.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "512"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+# Up to this many random bytes pad every gzip response, so that its length
+# doesn't give away secrets in the page (BREACH), like Django's GZipMiddleware
+COMPRESSION_MAX_RANDOM_BYTES = int(os.getenv("COMPRESSION_MAX_RANDOM_BYTES", "100"))
+
+# Serve the dashboard, workout and add-exercise pages with async views that
+# run their queries concurrently. Only worth it under an ASGI server
+# (gymtracker.asgi); under WSGI every async view needs its own event loop.
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "False").lower() == "true"
+
+# Live updates of the workout page over Server-Sent Events (see
+# workouts.events). LocalBackend only reaches subscribers in the same process.
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "workouts.events.LocalBackend")
+EVENTS_HEARTBEAT_SECONDS = 15
+# Messages queued per subscriber before it is told it missed some
+EVENTS_QUEUE_SIZE = 16
+
+# Partner activity kept per user on the dashboard feed, older entries are
+# trimmed when new ones are written
+FEED_MAX_ENTRIES = 100
+
+# Recent sessions per exercise that weight recommendations are based on, see
+# workouts.recommendations
+RECOMMENDATION_SESSIONS = 5
+
+# Per-request query, template, cache and view timings in a Server-Timing
+# header and the gymtracker.performance log (see workouts.middleware)
+PERFORMANCE_INSTRUMENTATION = (
+    os.getenv("PERFORMANCE_INSTRUMENTATION", "True").lower() == "true"
+)
+
+# Prometheus metrics at /metrics, aggregated across worker processes through
+# one file per process (see workouts.metrics). Only scrapers on these
+# addresses may read them.
+METRICS_DIR = Path(
+    os.getenv("METRICS_DIR", Path(tempfile.gettempdir()) / "gymtracker-metrics")
+)
+METRICS_ALLOWED_IPS = [
+    ip.strip() for ip in os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+]
+
+CACHES = {
+    "default": {"BACKEND": "workouts.cache.LocMemCache"},
+    # On disk, so every process serving the app sees the same sessions;
+    # setup-server.sh creates /srv/gymtracker/cache
+    "sessions": {
+        "BACKEND": "workouts.cache.FileBasedCache",
+        "LOCATION": os.getenv(
+            "SESSION_CACHE_DIR",
+            BASE_DIR / "cache" / "sessions"
+            if DEBUG
+            else "/srv/gymtracker/cache/sessions",
+        ),
+        "TIMEOUT": SESSION_COOKIE_AGE,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+# Queries slower than this are logged with the view and template line that
+# issued them (see workouts.slow_queries and the slow_query_report command)
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+
+# Log files; setup-server.sh creates /srv/gymtracker/logs
+LOG_DIR = Path(
+    os.getenv("LOG_DIR", BASE_DIR / "logs" if DEBUG else "/srv/gymtracker/logs")
+)
+
+# Database backups written by the backup_db command; setup-server.sh creates
+# /srv/gymtracker/backups
+BACKUP_DIR = Path(
+    os.getenv(
+        "BACKUP_DIR", BASE_DIR / "backups" if DEBUG else "/srv/gymtracker/backups"
+    )
+)
+
+# Superusers can profile a request with ?_profile (see workouts.profiling);
+# ?_profile=store keeps the profile here instead of returning it
+PROFILE_DIR = LOG_DIR / "profiles"
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "1"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "gymtracker": {
+            "handlers": ["console"],
+            "level": os.getenv("GYMTRACKER_LOG_LEVEL", "INFO"),
+        },
+    },
+}
+
+# Without a log directory (e.g. in development) slow queries only go to the
+# console
+if LOG_DIR.is_dir():
+    LOGGING["handlers"]["slow_query_file"] = {
+        "class": "logging.handlers.RotatingFileHandler",
+        "filename": LOG_DIR / "slow_queries.log",
+        "maxBytes": 10 * 1024 * 1024,
+        "backupCount": 5,
+    }
+    LOGGING["loggers"]["gymtracker.slow_queries"] = {
+        "handlers": ["slow_query_file"],
+        "level": "WARNING",
+        "propagate": False,
+    }
+
 # Media files
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
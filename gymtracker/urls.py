@@ -16,9 +16,10 @@ Including another URLconf
 """
 
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from workouts.assets import serve_static
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -29,3 +30,13 @@ urlpatterns = [
 # Serve media files in development
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+else:
+    # runserver only serves static files in DEBUG mode; serve the collected,
+    # hashed and precompressed files ourselves in production
+    urlpatterns += [
+        re_path(
+            rf"^{settings.STATIC_URL.lstrip('/')}(?P<path>.*)$",
+            serve_static,
+            name="static",
+        ),
+    ]
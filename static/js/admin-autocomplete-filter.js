@@ -0,0 +1,19 @@
+// Admin autocomplete filters
+//
+// The change list filters in workouts/admin.py use the admin's autocomplete
+// widget to pick a user or exercise. Picking one, or clearing it, reloads the
+// change list with the filter applied, from the first page.
+window.addEventListener("load", function () {
+    "use strict";
+
+    django.jQuery("[data-autocomplete-filter]").on("change", function () {
+        const params = new URLSearchParams(window.location.search);
+        params.delete("p");
+        if (this.value) {
+            params.set(this.dataset.autocompleteFilter, this.value);
+        } else {
+            params.delete(this.dataset.autocompleteFilter);
+        }
+        window.location.search = params.toString();
+    });
+});
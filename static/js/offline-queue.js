@@ -0,0 +1,195 @@
+// Offline logging queue
+//
+// Forms marked with data-offline-op are stored in localStorage instead of
+// being submitted when the browser is offline. Everything queued is sent to
+// the sync endpoint in as few requests as possible once the connection is
+// back. Every operation carries a random client_id, so a batch that is sent
+// twice (for example because the response was lost) is only applied once.
+// Operations the server rejects are set aside with their error, so they
+// don't hold up the rest of the queue.
+(function () {
+    "use strict";
+
+    const script = document.currentScript;
+    const syncUrl = script.dataset.syncUrl;
+    const serviceWorkerUrl = script.dataset.serviceWorkerUrl;
+    const STORAGE_KEY = "gymtracker-sync-queue";
+    const REJECTED_KEY = "gymtracker-sync-rejected";
+    // MAX_SYNC_OPERATIONS on the server
+    const BATCH_SIZE = 500;
+    // The service worker's cache of visited pages
+    const PAGES_CACHE = "gymtracker-pages";
+
+    function loadQueue() {
+        try {
+            const queue = JSON.parse(localStorage.getItem(STORAGE_KEY));
+            if (queue && Array.isArray(queue.sessions) && Array.isArray(queue.records)) {
+                return queue;
+            }
+        } catch (error) {
+            // Corrupt queue; start over rather than breaking every page
+        }
+        return { sessions: [], records: [] };
+    }
+
+    function saveQueue(queue) {
+        localStorage.setItem(STORAGE_KEY, JSON.stringify(queue));
+        showStatus(queue);
+    }
+
+    function loadRejected() {
+        try {
+            const rejected = JSON.parse(localStorage.getItem(REJECTED_KEY));
+            if (Array.isArray(rejected)) {
+                return rejected;
+            }
+        } catch (error) {
+            // Corrupt list; nothing to show
+        }
+        return [];
+    }
+
+    function showStatus(queue) {
+        const status = document.getElementById("offline-status");
+        if (!status) {
+            return;
+        }
+        const pending = queue.sessions.length + queue.records.length;
+        const rejected = loadRejected().length;
+        const messages = [];
+        if (pending) {
+            messages.push(
+                `${pending} change(s) saved offline, will sync when back online`,
+            );
+        }
+        if (rejected) {
+            messages.push(`${rejected} offline change(s) could not be saved`);
+        }
+        status.textContent = messages.join(". ");
+        status.classList.toggle("d-none", messages.length === 0);
+    }
+
+    function csrfToken() {
+        const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+        return match ? decodeURIComponent(match[1]) : "";
+    }
+
+    function formOperation(form) {
+        const operation = Object.fromEntries(new FormData(form));
+        delete operation.csrfmiddlewaretoken;
+        operation.client_id = crypto.randomUUID();
+        if (form.dataset.offlineOp === "record") {
+            operation.session = Number(form.dataset.sessionId);
+        } else {
+            // start_time is set by the server on insert; keep the real one
+            operation.start_time = new Date().toTimeString().slice(0, 8);
+        }
+        return operation;
+    }
+
+    let flushing = false;
+
+    function nextBatch(queue) {
+        // Sessions go first, so records never arrive before their session
+        const sessions = queue.sessions.slice(0, BATCH_SIZE);
+        const records = queue.records.slice(0, BATCH_SIZE - sessions.length);
+        return { sessions, records };
+    }
+
+    async function send(batch) {
+        const response = await fetch(syncUrl, {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json",
+                "X-CSRFToken": csrfToken(),
+            },
+            body: JSON.stringify(batch),
+        });
+        if (!response.ok) {
+            // The batch as a whole was refused, e.g. the session expired;
+            // keep it for the next attempt
+            console.error("Offline sync failed", await response.text());
+            return false;
+        }
+        const { rejected } = await response.json();
+        const failed = batch.sessions
+            .concat(batch.records)
+            .filter((op) => op.client_id in rejected)
+            .map((op) => ({ ...op, error: rejected[op.client_id] }));
+        if (failed.length) {
+            console.error("Offline changes rejected", failed);
+            localStorage.setItem(
+                REJECTED_KEY,
+                JSON.stringify(loadRejected().concat(failed)),
+            );
+        }
+        // Only drop what was sent; more may have been queued meanwhile
+        const sent = new Set(
+            batch.sessions.concat(batch.records).map((op) => op.client_id),
+        );
+        const current = loadQueue();
+        saveQueue({
+            sessions: current.sessions.filter((op) => !sent.has(op.client_id)),
+            records: current.records.filter((op) => !sent.has(op.client_id)),
+        });
+        return true;
+    }
+
+    async function flush() {
+        if (flushing) {
+            return;
+        }
+        flushing = true;
+        try {
+            let batch = nextBatch(loadQueue());
+            while (batch.sessions.length || batch.records.length) {
+                if (!(await send(batch))) {
+                    return;
+                }
+                batch = nextBatch(loadQueue());
+            }
+        } catch (error) {
+            // Still offline; the next "online" event will retry
+        } finally {
+            flushing = false;
+        }
+    }
+
+    document.addEventListener("submit", async (event) => {
+        const logout = event.target.closest("form[data-logout]");
+        if (logout && "caches" in window) {
+            // Don't leave this user's pages readable offline to the next one
+            event.preventDefault();
+            await caches.delete(PAGES_CACHE);
+            logout.submit();
+            return;
+        }
+        const form = event.target.closest("form[data-offline-op]");
+        if (!form || navigator.onLine) {
+            return;
+        }
+        event.preventDefault();
+        const queue = loadQueue();
+        const kind = form.dataset.offlineOp === "record" ? "records" : "sessions";
+        queue[kind].push(formOperation(form));
+        saveQueue(queue);
+        form.reset();
+    });
+
+    // Forms posted with htmx are queued by the submit listener above instead
+    document.addEventListener("htmx:beforeRequest", (event) => {
+        if (!navigator.onLine && event.detail.elt.closest("form[data-offline-op]")) {
+            event.preventDefault();
+        }
+    });
+
+    window.addEventListener("online", flush);
+    showStatus(loadQueue());
+    if (navigator.onLine) {
+        flush();
+    }
+
+    if ("serviceWorker" in navigator && serviceWorkerUrl) {
+        navigator.serviceWorker.register(serviceWorkerUrl);
+    }
+})();
@@ -0,0 +1,55 @@
+// Live workout updates
+//
+// Keeps the exercise list of a workout page current while the workout (or a
+// workout partner) logs sets elsewhere, without reloading the page. The server
+// sends changed records as rendered rows and the ids of all records, so rows
+// are added, replaced and removed in place. The browser reconnects by itself
+// and resumes from the last update it saw. If the page fell too far behind,
+// the server asks for a reload instead.
+(function () {
+    "use strict";
+
+    const list = document.getElementById("exercise-records");
+    if (!list || !list.dataset.eventsUrl || !window.EventSource) {
+        return;
+    }
+
+    const source = new EventSource(list.dataset.eventsUrl);
+
+    function showPlaceholder(show) {
+        const placeholder = document.getElementById("no-exercise-records");
+        if (placeholder) {
+            placeholder.classList.toggle("d-none", !show);
+        }
+    }
+
+    source.addEventListener("record", function (event) {
+        const template = document.createElement("template");
+        template.innerHTML = event.data.trim();
+        const row = template.content.firstElementChild;
+        const existing = document.getElementById(row.id);
+        if (existing) {
+            existing.replaceWith(row);
+        } else {
+            list.prepend(row);
+        }
+        // Wire up the row's edit and delete buttons
+        htmx.process(row);
+        showPlaceholder(false);
+    });
+
+    source.addEventListener("reload", function () {
+        source.close();
+        window.location.reload();
+    });
+
+    source.addEventListener("records", function (event) {
+        const ids = new Set(JSON.parse(event.data).map((id) => `exercise-record-${id}`));
+        for (const row of Array.from(list.children)) {
+            if (row.id && !ids.has(row.id)) {
+                row.remove();
+            }
+        }
+        showPlaceholder(!list.children.length);
+    });
+})();
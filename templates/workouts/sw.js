@@ -0,0 +1,72 @@
+{% load static %}
+// Gym Tracker service worker
+//
+// Keeps the pages and static assets that were visited recently available when
+// the gym has no connectivity. Workout data logged while offline is queued by
+// offline-queue.js and synced through the sync endpoint, not by this worker.
+// Pages hold the user's own data, so they are kept in a cache of their own
+// that offline-queue.js deletes on logout.
+const CACHE_NAME = "gymtracker-v2";
+const PAGES_CACHE = "gymtracker-pages";
+const STATIC_PREFIX = "{% get_static_prefix %}";
+
+self.addEventListener("install", () => self.skipWaiting());
+
+self.addEventListener("activate", (event) => {
+    event.waitUntil(
+        caches
+            .keys()
+            .then((keys) =>
+                Promise.all(
+                    keys
+                        .filter((key) => key !== CACHE_NAME && key !== PAGES_CACHE)
+                        .map((key) => caches.delete(key)),
+                ),
+            )
+            .then(() => self.clients.claim()),
+    );
+});
+
+async function cacheFirst(request) {
+    const cached = await caches.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        const cache = await caches.open(CACHE_NAME);
+        cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function networkFirst(request) {
+    try {
+        const response = await fetch(request);
+        // A redirect may be to the login page, which is no use offline
+        if (response.ok && !response.redirected) {
+            const cache = await caches.open(PAGES_CACHE);
+            cache.put(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        const cached = await caches.match(request);
+        if (cached) {
+            return cached;
+        }
+        throw error;
+    }
+}
+
+self.addEventListener("fetch", (event) => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== "GET" || url.origin !== self.location.origin) {
+        return;
+    }
+    if (url.pathname.startsWith(STATIC_PREFIX)) {
+        event.respondWith(cacheFirst(request));
+    } else if (request.mode === "navigate") {
+        event.respondWith(networkFirst(request));
+    }
+});
@@ -1,13 +1,102 @@
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.utils import get_fields_from_path
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import Exercise, WorkoutSession, ExerciseRecord, UserProfile
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Func, OuterRef, Subquery
+
+from .models import (
+    Exercise,
+    ExerciseRecommendation,
+    Gym,
+    WorkoutSession,
+    ExerciseRecord,
+    UserProfile,
+)
+
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    """
+    Filter on a related object picked with the admin's autocomplete widget,
+    instead of listing every user or exercise in the sidebar.
+    """
+
+    template = "admin/workouts/autocomplete_filter.html"
+    field_path = None
+
+    def __init__(self, request, params, model, model_admin):
+        if self.parameter_name is None:
+            self.parameter_name = self.field_path
+        super().__init__(request, params, model, model_admin)
+        field = get_fields_from_path(model, self.field_path)[-1]
+        self.form_field = field.formfield(
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False,
+        )
+
+    def has_output(self):
+        return True
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        try:
+            return queryset.filter(**{self.field_path: self.value()})
+        except (ValueError, ValidationError) as e:
+            raise IncorrectLookupParameters(e)
+
+    def choices(self, changelist):
+        # Picking a value reloads the page, see admin-autocomplete-filter.js
+        yield {
+            "widget": self.form_field.widget.render(
+                self.parameter_name,
+                self.value(),
+                attrs={"data-autocomplete-filter": self.parameter_name},
+            ),
+        }
+
+
+class AutocompleteFilterMixin:
+    """Load the autocomplete widget's scripts on the change list"""
+
+    @property
+    def media(self):
+        return (
+            super().media
+            + AutocompleteSelect(None, self.admin_site).media
+            + forms.Media(js=["js/admin-autocomplete-filter.js"])
+        )
+
+
+class UserFilter(AutocompleteFilter):
+    title = "user"
+    field_path = "user"
+
+
+class SessionUserFilter(AutocompleteFilter):
+    title = "user"
+    field_path = "workout_session__user"
+    # lookup_allowed() rejects parameters that span two relations
+    parameter_name = "user"
+
+
+class ExerciseFilter(AutocompleteFilter):
+    title = "exercise"
+    field_path = "exercise"
 
 
 class ExerciseRecordInline(admin.TabularInline):
     model = ExerciseRecord
     extra = 0
     fields = ["exercise", "weight_kg", "reps", "sets", "difficulty_rating", "notes"]
+    autocomplete_fields = ["exercise"]
 
 
 @admin.register(Exercise)
@@ -19,7 +108,7 @@ class ExerciseAdmin(admin.ModelAdmin):
 
 
 @admin.register(WorkoutSession)
-class WorkoutSessionAdmin(admin.ModelAdmin):
+class WorkoutSessionAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = [
         "user",
         "date",
@@ -28,19 +117,37 @@ class WorkoutSessionAdmin(admin.ModelAdmin):
         "is_completed",
         "exercise_count",
     ]
-    list_filter = ["date", "is_completed", "user"]
+    list_filter = ["date", "is_completed", UserFilter]
+    list_select_related = ["user"]
+    # Counting every session for the "N total" link is as slow as the page
+    show_full_result_count = False
     search_fields = ["user__username", "user__email", "notes"]
     date_hierarchy = "date"
+    autocomplete_fields = ["user"]
     inlines = [ExerciseRecordInline]
 
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                # A subquery rather than Count("exercise_records"), which would
+                # join and group the page's count and date queries too
+                exercise_count=Subquery(
+                    ExerciseRecord.objects.filter(workout_session=OuterRef("pk"))
+                    .order_by()
+                    .values(count=Func("pk", function="COUNT"))
+                )
+            )
+        )
+
+    @admin.display(description="Exercises", ordering="exercise_count")
     def exercise_count(self, obj):
-        return obj.exercise_records.count()
-
-    exercise_count.short_description = "Exercises"
+        return obj.exercise_count
 
 
 @admin.register(ExerciseRecord)
-class ExerciseRecordAdmin(admin.ModelAdmin):
+class ExerciseRecordAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = [
         "exercise",
         "workout_session",
@@ -50,9 +157,56 @@ class ExerciseRecordAdmin(admin.ModelAdmin):
         "difficulty_rating",
         "total_volume",
     ]
-    list_filter = ["exercise", "difficulty_rating", "workout_session__date"]
+    list_filter = [
+        ExerciseFilter,
+        SessionUserFilter,
+        "difficulty_rating",
+        "workout_session__date",
+    ]
+    # The session's name includes its user
+    list_select_related = ["exercise", "workout_session__user"]
+    show_full_result_count = False
     search_fields = ["exercise__name", "workout_session__user__username", "notes"]
-    date_hierarchy = "workout_session__date"
+    autocomplete_fields = ["exercise", "workout_session"]
+
+    @admin.display(description="Total volume", ordering="volume_g")
+    def total_volume(self, obj):
+        return obj.volume_g / 1000
+
+
+@admin.register(ExerciseRecommendation)
+class ExerciseRecommendationAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
+    list_display = [
+        "user",
+        "exercise",
+        "recommended_weight_kg",
+        "last_weight_kg",
+        "last_difficulty",
+        "session_count",
+        "updated_at",
+    ]
+    list_filter = [UserFilter, ExerciseFilter]
+    list_select_related = ["user", "exercise"]
+    # Computed by workouts.recommendations
+    readonly_fields = list_display
+
+
+@admin.register(Gym)
+class GymAdmin(admin.ModelAdmin):
+    list_display = ["name", "slug", "has_shard", "member_count", "created_at"]
+    search_fields = ["name", "slug"]
+    prepopulated_fields = {"slug": ["name"]}
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(member_count=Count("members"))
+
+    @admin.display(description="Own database", boolean=True)
+    def has_shard(self, obj):
+        return obj.slug in settings.GYM_SHARDS
+
+    @admin.display(description="Members", ordering="member_count")
+    def member_count(self, obj):
+        return obj.member_count
 
 
 class UserProfileInline(admin.StackedInline):
@@ -60,6 +214,7 @@ class UserProfileInline(admin.StackedInline):
     can_delete = False
     verbose_name_plural = "Profile"
     fk_name = "user"
+    autocomplete_fields = ["default_workout_partner", "gym"]
 
 
 class CustomUserAdmin(UserAdmin):
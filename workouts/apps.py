@@ -1,6 +1,25 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete
 
 
 class WorkoutsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "workouts"
+
+    def ready(self):
+        from .archive import attach_archives
+        from .shards import attach_catalog, delete_from_shards, remember_gym
+        from .slow_queries import install_slow_query_wrapper
+
+        connection_created.connect(install_slow_query_wrapper)
+        connection_created.connect(attach_archives)
+        connection_created.connect(attach_catalog)
+        user_logged_in.connect(remember_gym)
+        post_delete.connect(delete_from_shards, sender=settings.AUTH_USER_MODEL)
+        if settings.PERFORMANCE_INSTRUMENTATION:
+            from .instrumentation import install_query_wrapper
+
+            connection_created.connect(install_query_wrapper)
@@ -0,0 +1,216 @@
+"""
+Archive of old workout sessions.
+
+Sessions older than ``ARCHIVE_AFTER_DAYS`` are moved, with their exercise
+records, out of the live tables into one SQLite database per year in
+``ARCHIVE_DIR``, so the live tables and their indexes only hold recent data.
+``archive_sessions()`` does the move in small transactions on the primary
+connection with the year's archive attached. Rows keep their ids, and since
+SQLite never reuses the ids of deleted rows they stay unique.
+
+Only querysets that ask for it with ``with_archives()`` see archived rows.
+They run on the read-only ``archive`` connection, which attaches every archive
+and shadows the sessions and records tables with temporary views that union
+the live and the archived rows. Everything else in the query, such as joins
+to users or exercises, reads the live database as usual.
+"""
+
+import contextlib
+import logging
+import sqlite3
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .models import ExerciseRecord, WorkoutSession
+from .routers import ARCHIVE_DB_ALIAS
+
+logger = logging.getLogger(__name__)
+
+# Each table with the column that ties its rows to a session, and the indexes
+# the archive needs for the queries that read it
+ARCHIVED_TABLES = [
+    (WorkoutSession, "id", [("id",), ("user_id", "date")]),
+    (ExerciseRecord, "workout_session_id", [("id",), ("workout_session_id",)]),
+]
+
+
+def archive_path(year):
+    return Path(settings.ARCHIVE_DIR) / f"workouts-{year}.sqlite3"
+
+
+def archive_years():
+    """Years that have an archive, oldest first"""
+    years = []
+    for path in Path(settings.ARCHIVE_DIR).glob("workouts-*.sqlite3"):
+        with contextlib.suppress(ValueError):
+            years.append(int(path.stem.removeprefix("workouts-")))
+    return sorted(years)
+
+
+def _columns(cursor, schema, table):
+    # table_xinfo, unlike table_info, includes generated columns. They are
+    # copied into the archives as plain columns.
+    cursor.execute(f'PRAGMA {schema}.table_xinfo("{table}")')
+    return [(row[1], row[2]) for row in cursor.fetchall()]
+
+
+def attach_archives(sender, connection, **kwargs):
+    """connection_created receiver that makes the archive connection see the
+    archived rows"""
+    if connection.alias == ARCHIVE_DB_ALIAS:
+        _attach_archives(connection)
+
+
+def reattach_archives():
+    """Make an open archive connection see archives created since it opened"""
+    connection = connections[ARCHIVE_DB_ALIAS]
+    if connection.connection is not None:
+        _attach_archives(connection)
+
+
+def _attach_archives(connection):
+    with connection.cursor() as cursor:
+        for model, _, _ in ARCHIVED_TABLES:
+            cursor.execute(f'DROP VIEW IF EXISTS temp."{model._meta.db_table}"')
+        cursor.execute("PRAGMA database_list")
+        for schema in [row[1] for row in cursor.fetchall()]:
+            if schema.startswith("archive_"):
+                cursor.execute(f"DETACH DATABASE {schema}")
+
+        years = archive_years()
+        # SQLite limits the number of attached databases, 10 by default
+        limit = connection.connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        if len(years) > limit:
+            logger.warning(
+                "Only the newest %d of %d archives can be read", limit, len(years)
+            )
+            years = years[-limit:]
+        if not years:
+            return
+
+        for year in years:
+            cursor.execute(
+                "ATTACH DATABASE %s AS %s",
+                [f"{archive_path(year).as_uri()}?mode=ro", f"archive_{year}"],
+            )
+        for model, _, _ in ARCHIVED_TABLES:
+            table = model._meta.db_table
+            names = [name for name, _ in _columns(cursor, "main", table)]
+            columns = ", ".join(f'"{name}"' for name in names)
+            selects = [f'SELECT {columns} FROM main."{table}"']
+            for year in years:
+                archived = {
+                    name for name, _ in _columns(cursor, f"archive_{year}", table)
+                }
+                # Archives that missed a migration don't have its columns yet
+                columns = ", ".join(
+                    f'"{name}"' if name in archived else f'NULL AS "{name}"'
+                    for name in names
+                )
+                # Rows copied by an interrupted archive run are still live
+                selects.append(
+                    f'SELECT {columns} FROM archive_{year}."{table}" '
+                    f'WHERE id NOT IN (SELECT id FROM main."{table}")'
+                )
+            cursor.execute(
+                f'CREATE TEMP VIEW "{table}" AS {" UNION ALL ".join(selects)}'
+            )
+
+
+def find_session(user, pk):
+    """The user's archived session with this id, or None"""
+    if not archive_years():
+        return None
+    return WorkoutSession.objects.with_archives().filter(user=user, pk=pk).first()
+
+
+@contextlib.contextmanager
+def attached_archive(year):
+    """
+    Attach a year's archive to the primary connection as ``archive``.
+
+    Creates the archive's tables, or adds the columns that migrations added to
+    the live tables since. The archive tables have no constraints, the rows
+    were checked when they were written.
+    """
+    path = archive_path(year)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = connections[DEFAULT_DB_ALIAS]
+    with connection.cursor() as cursor:
+        cursor.execute("ATTACH DATABASE %s AS archive", [str(path)])
+        try:
+            for model, _, indexes in ARCHIVED_TABLES:
+                table = model._meta.db_table
+                cursor.execute(
+                    f'CREATE TABLE IF NOT EXISTS archive."{table}" AS '
+                    f'SELECT * FROM main."{table}" WHERE 0'
+                )
+                archived = {name for name, _ in _columns(cursor, "archive", table)}
+                for name, type_ in _columns(cursor, "main", table):
+                    if name not in archived:
+                        cursor.execute(
+                            f'ALTER TABLE archive."{table}" ADD COLUMN "{name}" {type_}'
+                        )
+                for fields in indexes:
+                    unique = "UNIQUE " if fields == ("id",) else ""
+                    cursor.execute(
+                        f"CREATE {unique}INDEX IF NOT EXISTS "
+                        f'archive."{table}_{"_".join(fields)}" '
+                        f'ON "{table}" ({", ".join(fields)})'
+                    )
+            yield
+        finally:
+            cursor.execute("DETACH DATABASE archive")
+
+
+def _copy_to_archive(cursor, session_ids):
+    placeholders = ", ".join(["%s"] * len(session_ids))
+    for model, key, _ in ARCHIVED_TABLES:
+        table = model._meta.db_table
+        columns = ", ".join(f'"{name}"' for name, _ in _columns(cursor, "main", table))
+        # Rows copied by an interrupted earlier run are already there
+        cursor.execute(
+            f'INSERT OR IGNORE INTO archive."{table}" ({columns}) '
+            f'SELECT {columns} FROM main."{table}" WHERE "{key}" IN ({placeholders})',
+            session_ids,
+        )
+
+
+def archive_sessions(before, chunk_size=500, dry_run=False):
+    """
+    Move sessions dated before ``before`` with their records into the archives.
+
+    Every chunk of sessions is copied and deleted in its own transaction, so
+    writers only wait for one chunk at a time. Returns the number of sessions
+    moved per year.
+    """
+    old_sessions = WorkoutSession.objects.filter(date__lt=before)
+    moved = Counter()
+    for year in [day.year for day in old_sessions.dates("date", "year")]:
+        sessions = old_sessions.filter(date__year=year)
+        if dry_run:
+            moved[year] = sessions.count()
+            continue
+        with attached_archive(year):
+            while session_ids := list(
+                sessions.order_by("pk").values_list("pk", flat=True)[:chunk_size]
+            ):
+                with transaction.atomic():
+                    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+                        _copy_to_archive(cursor, session_ids)
+                    # Also deletes the records, and feed entries about them
+                    WorkoutSession.objects.filter(pk__in=session_ids).delete()
+                moved[year] += len(session_ids)
+    if moved and not dry_run:
+        reattach_archives()
+    return moved
+
+
+def update_archive_schemas():
+    """Add columns that migrations added to the live tables to every archive"""
+    for year in archive_years():
+        with attached_archive(year):
+            pass
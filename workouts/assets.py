@@ -0,0 +1,147 @@
+"""
+Static asset storage and serving for production.
+
+``collectstatic`` writes content-hashed copies of every asset and, next to each
+compressible file, precompressed ``.gz`` and (when the optional ``brotli``
+package is installed) ``.br`` variants. ``serve_static`` then delivers those
+files straight from ``STATIC_ROOT`` without compressing anything per request.
+"""
+
+import gzip
+import mimetypes
+import os
+import posixpath
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage,
+    staticfiles_storage,
+)
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt", ".html", ".xml"}
+
+# Hashed file names change whenever their content does, so they can be cached
+# by browsers forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Unhashed names (e.g. someone linking to the original file) may change
+MUTABLE_CACHE_CONTROL = "public, max-age=60"
+
+
+def _compress_gzip(data):
+    # mtime=0 keeps the output identical between collectstatic runs
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _compress_brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes precompressed variants of each file"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        # The unhashed originals too, CompressionMiddleware skips static files
+        for name in {*self.hashed_files, *self.hashed_files.values()}:
+            if os.path.splitext(name)[1] in COMPRESSIBLE_EXTENSIONS:
+                self._write_compressed_variants(name)
+
+    def _write_compressed_variants(self, name):
+        path = Path(self.path(name))
+        data = path.read_bytes()
+        encoders = [(".gz", _compress_gzip)]
+        if brotli is not None:
+            encoders.append((".br", _compress_brotli))
+
+        for suffix, compress in encoders:
+            target = path.with_name(path.name + suffix)
+            if target.exists():
+                continue  # Same hash, same content
+            compressed = compress(data)
+            # Not worth a Content-Encoding header for tiny savings
+            if len(compressed) < len(data) * 0.95:
+                target.write_bytes(compressed)
+
+
+def accepted_encodings(request):
+    """Content codings from the Accept-Encoding header, minus those refused with q=0"""
+    accepted = set()
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _, params = part.partition(";")
+        quality = params.strip().removeprefix("q=")
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            pass
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+@require_safe
+def serve_static(request, path):
+    """
+    Serve a collected static file with far-future caching.
+
+    Picks the precompressed brotli or gzip variant when the client accepts it,
+    and hands the open file to the server through ``FileResponse`` so servers
+    with ``wsgi.file_wrapper`` support can use ``sendfile()``.
+    """
+    path = posixpath.normpath(path).lstrip("/")
+    try:
+        fullpath = Path(safe_join(settings.STATIC_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404("Invalid static file path")
+    if not fullpath.is_file():
+        raise Http404(f"Static file {path} not found")
+
+    content_type, _ = mimetypes.guess_type(fullpath.name)
+    content_type = content_type or "application/octet-stream"
+
+    accepted = accepted_encodings(request)
+    encoding = None
+    for candidate, suffix in (("br", ".br"), ("gzip", ".gz")):
+        variant = fullpath.with_name(fullpath.name + suffix)
+        if candidate in accepted and variant.is_file():
+            fullpath, encoding = variant, candidate
+            break
+
+    stat = fullpath.stat()
+    hashed = path in getattr(staticfiles_storage, "hashed_files", {}).values()
+    if not was_modified_since(request.headers.get("If-Modified-Since"), stat.st_mtime):
+        response = HttpResponseNotModified()
+    elif settings.STATIC_SENDFILE_HEADER:
+        # Let a front-end server (nginx X-Accel-Redirect, X-Sendfile) copy the
+        # file to the socket itself
+        response = HttpResponse(content_type=content_type)
+        response[settings.STATIC_SENDFILE_HEADER] = (
+            settings.STATIC_SENDFILE_PREFIX
+            + str(fullpath.relative_to(settings.STATIC_ROOT))
+        )
+    else:
+        response = FileResponse(fullpath.open("rb"), content_type=content_type)
+
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Cache-Control"] = (
+        IMMUTABLE_CACHE_CONTROL if hashed else MUTABLE_CACHE_CONTROL
+    )
+    if encoding:
+        response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
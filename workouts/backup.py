@@ -0,0 +1,190 @@
+"""
+Online backups of the SQLite database.
+
+``backup_database()`` copies the live database with SQLite's backup API a few
+pages at a time and sleeps between steps, so writers of the running app get
+the database in between instead of waiting for the whole copy. The copy is
+verified with ``PRAGMA integrity_check`` and streamed through gzip into the
+backup directory. ``expired_backups()`` applies the retention policy, and
+``WriterStallProbe`` measures how long a writer had to wait while a backup ran.
+"""
+
+import datetime
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKUP_PREFIX = "db-"
+BACKUP_SUFFIX = ".sqlite3.gz"
+_TIMESTAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def backup_path(directory, timestamp):
+    return Path(directory) / (
+        f"{BACKUP_PREFIX}{timestamp.strftime(_TIMESTAMP_FORMAT)}{BACKUP_SUFFIX}"
+    )
+
+
+def backup_timestamp(path):
+    """When a backup was taken according to its name, None for other files"""
+    name = Path(path).name
+    if not (name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX)):
+        return None
+    try:
+        return datetime.datetime.strptime(
+            name[len(BACKUP_PREFIX) : -len(BACKUP_SUFFIX)], _TIMESTAMP_FORMAT
+        )
+    except ValueError:
+        return None
+
+
+def backup_database(
+    source, directory, pages=256, sleep=0.05, max_restarts=3, compresslevel=6
+):
+    """
+    Back up the database at ``source`` into ``directory``.
+
+    Copies ``pages`` pages per step and sleeps ``sleep`` seconds after each.
+    SQLite restarts the copy when another connection writes in between; after
+    ``max_restarts`` the rest is copied in one step, which in WAL mode still
+    doesn't block writers. Raises ``sqlite3.DatabaseError`` if the copy fails
+    its integrity check, in which case nothing is written.
+
+    Returns the path of the backup and statistics about the run.
+    """
+    directory = Path(directory)
+    start = time.perf_counter()
+    stats = {"steps": 0, "restarts": 0, "pages": 0}
+
+    def progress(status, remaining, total):
+        if stats["steps"] and remaining > stats["remaining"]:
+            stats["restarts"] += 1
+            if stats["restarts"] > max_restarts:
+                raise _TooManyRestarts
+        stats["steps"] += 1
+        stats["remaining"] = remaining
+        stats["pages"] = total
+        if remaining:
+            time.sleep(sleep)
+
+    with tempfile.TemporaryDirectory(dir=directory, prefix=".backup-") as tmp:
+        snapshot = Path(tmp) / "db.sqlite3"
+        source_connection = sqlite3.connect(
+            f"{Path(source).as_uri()}?mode=ro", uri=True
+        )
+        snapshot_connection = sqlite3.connect(snapshot)
+        try:
+            try:
+                source_connection.backup(
+                    snapshot_connection, pages=pages, progress=progress
+                )
+            except _TooManyRestarts:
+                source_connection.backup(snapshot_connection)
+                stats["steps"] += 1
+            copied = time.perf_counter()
+
+            (result,) = snapshot_connection.execute("PRAGMA integrity_check").fetchone()
+            if result != "ok":
+                raise sqlite3.DatabaseError(f"Backup failed integrity check: {result}")
+            # The copy is restored as a plain file, without a -wal next to it
+            snapshot_connection.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            snapshot_connection.close()
+            source_connection.close()
+        verified = time.perf_counter()
+
+        path = backup_path(directory, datetime.datetime.now())
+        partial = Path(tmp) / path.name
+        with (
+            snapshot.open("rb") as src,
+            gzip.open(partial, "wb", compresslevel=compresslevel) as dst,
+        ):
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(partial, path)
+
+        stats.pop("remaining", None)
+        stats.update(
+            {
+                "size": snapshot.stat().st_size,
+                "compressed_size": path.stat().st_size,
+                "copy_seconds": copied - start,
+                "verify_seconds": verified - copied,
+                "compress_seconds": time.perf_counter() - verified,
+            }
+        )
+    return path, stats
+
+
+def expired_backups(paths, keep_daily=7, keep_weekly=4):
+    """
+    Backups the retention policy drops.
+
+    Keeps the newest backup of each of the last ``keep_daily`` days that have
+    one, and of each of the last ``keep_weekly`` weeks. Files that aren't
+    backups are never returned.
+    """
+    backups = sorted(
+        ((timestamp, path) for path in paths if (timestamp := backup_timestamp(path))),
+        reverse=True,
+    )
+    kept = set()
+    for period, keep in [
+        (lambda timestamp: timestamp.date(), keep_daily),
+        (lambda timestamp: timestamp.isocalendar()[:2], keep_weekly),
+    ]:
+        seen = []
+        for timestamp, path in backups:
+            if period(timestamp) not in seen:
+                seen.append(period(timestamp))
+                if len(seen) > keep:
+                    break
+                kept.add(path)
+    return [path for _, path in backups if path not in kept]
+
+
+class WriterStallProbe(threading.Thread):
+    """
+    Commit a tiny write every ``interval`` seconds, and time how long it takes.
+
+    The write rewrites the database's ``user_version`` with its own value, so
+    nothing changes, but it takes the write lock and commits to the WAL like a
+    writer of the app. The rate is kept low so the probe hardly competes with
+    those writers. Like theirs, its commits can make a running backup restart.
+    """
+
+    def __init__(self, path, interval=1.0):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.probes = 0
+        self.max_stall = 0.0
+        self._stopped = threading.Event()
+
+    def run(self):
+        connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            (version,) = connection.execute("PRAGMA user_version").fetchone()
+            while True:
+                start = time.perf_counter()
+                connection.execute("BEGIN IMMEDIATE")
+                connection.execute(f"PRAGMA user_version = {int(version)}")
+                connection.execute("COMMIT")
+                self.max_stall = max(self.max_stall, time.perf_counter() - start)
+                self.probes += 1
+                if self._stopped.wait(self.interval):
+                    break
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
@@ -0,0 +1,37 @@
+"""
+Cache backends that count hits and misses for the current request.
+
+Drop-in replacements for Django's backends, see ``workouts.instrumentation``.
+"""
+
+from django.core.cache.backends import filebased, locmem
+
+from .instrumentation import record_cache_lookup
+
+_missing = object()
+
+
+class InstrumentedCacheMixin:
+    def get(self, key, default=None, version=None):
+        # get_many(), get_or_set() and the async methods all go through get()
+        value = super().get(key, _missing, version)
+        record_cache_lookup(value is not _missing)
+        return default if value is _missing else value
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class FileBasedCache(InstrumentedCacheMixin, filebased.FileBasedCache):
+    def delete_expired(self):
+        """Delete the files of expired entries, returns how many there were"""
+        deleted = 0
+        for path in self._list_cache_files():
+            try:
+                with open(path, "rb") as f:
+                    # Deletes the file if the entry has expired
+                    deleted += self._is_expired(f)
+            except FileNotFoundError:
+                pass
+        return deleted
@@ -0,0 +1,146 @@
+"""
+Publish/subscribe for live page updates.
+
+Code that changes data calls ``publish(channel, message)`` from any thread,
+usually through ``transaction.on_commit()``. Async views ``subscribe()`` to a
+channel and read the messages from a bounded queue. When a subscriber falls
+behind and its queue is full, further messages for it are dropped and it is
+flagged as having ``missed`` some, so it can resynchronize instead of letting
+the queue grow for a client that doesn't read.
+
+The backend, ``EVENTS_BACKEND``, carries messages to the subscribers of every
+process. It is constructed with the broker's ``deliver`` callback and has a
+``publish(channel, message)`` method. ``LocalBackend`` delivers within this
+process only, which covers a single ASGI worker; a backend for several workers
+would publish to a shared server and call ``deliver`` for what it receives.
+"""
+
+import asyncio
+import functools
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class LocalBackend:
+    """Deliver messages to subscribers in this process"""
+
+    def __init__(self, deliver):
+        self.deliver = deliver
+
+    def publish(self, channel, message):
+        self.deliver(channel, message)
+
+
+class Subscription:
+    """Messages published on a channel, read with ``get()``"""
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.missed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def put(self, message):
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.missed = True
+
+    async def get(self, timeout=None):
+        """Next message, raises TimeoutError if none arrives in time"""
+        async with asyncio.timeout(timeout):
+            return await self.queue.get()
+
+    def clear(self):
+        """Drop pending messages, e.g. after reloading what they announce"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.missed = False
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def __init__(self, backend_class, queue_size):
+        self.queue_size = queue_size
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+        self.backend = backend_class(self.deliver)
+
+    def subscribe(self, channel):
+        """Subscribe the running event loop to a channel"""
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.channel, None)
+
+    def publish(self, channel, message):
+        self.backend.publish(channel, message)
+
+    def deliver(self, channel, message):
+        """Hand a message to this process's subscribers, from any thread"""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:  # Its event loop is closed
+                self.unsubscribe(subscription)
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscriptions.get(channel, ()))
+
+
+@functools.cache
+def get_broker():
+    return Broker(import_string(settings.EVENTS_BACKEND), settings.EVENTS_QUEUE_SIZE)
+
+
+def subscribe(channel):
+    return get_broker().subscribe(channel)
+
+
+def publish(channel, message):
+    get_broker().publish(channel, message)
+
+
+def workout_channel(session_id):
+    return f"workout-session-{session_id}"
+
+
+def publish_sessions_changed(session_ids):
+    """Tell live workout pages to refresh once the transaction commits"""
+    for session_id in set(session_ids):
+        transaction.on_commit(
+            functools.partial(publish, workout_channel(session_id), "changed")
+        )
+
+
+def format_event(event, data, id=None):
+    """A Server-Sent Events message"""
+    lines = [f"event: {event}"]
+    if id is not None:
+        lines.append(f"id: {id}")
+    lines += [f"data: {line}" for line in data.splitlines() or [""]]
+    return "\n".join(lines) + "\n\n"
@@ -197,6 +197,109 @@ class QuickAddExerciseForm(forms.Form):
     )
 
 
+class BatchExerciseRecordForm(forms.ModelForm):
+    """One row of the batch entry form on a workout session
+
+    The exercise is chosen from a lookup shared by every row of the formset,
+    so neither rendering nor validating a row queries the exercise table.
+    """
+
+    class Meta:
+        model = ExerciseRecord
+        fields = ["weight_kg", "reps", "sets", "difficulty_rating"]
+        widgets = {
+            "weight_kg": forms.NumberInput(
+                attrs={"class": "form-control", "step": "0.5", "min": "0"}
+            ),
+            "reps": forms.NumberInput(attrs={"class": "form-control", "min": "1"}),
+            "sets": forms.NumberInput(attrs={"class": "form-control", "min": "1"}),
+            "difficulty_rating": forms.Select(attrs={"class": "form-control"}),
+        }
+        labels = {
+            "weight_kg": "Weight (kg)",
+            "reps": "Reps",
+            "sets": "Sets",
+            "difficulty_rating": "Difficulty",
+        }
+
+    def __init__(self, *args, exercises=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if exercises is None:
+            exercises = {exercise.pk: exercise for exercise in Exercise.objects.all()}
+        self.fields["exercise"] = forms.TypedChoiceField(
+            choices=[("", "---------")]
+            + [(pk, exercise.name) for pk, exercise in exercises.items()],
+            coerce=lambda pk: exercises[int(pk)],
+            widget=forms.Select(attrs={"class": "form-control"}),
+            label="Exercise",
+        )
+        self.order_fields(["exercise"])
+        # Leave unused rows untouched so they are skipped as empty
+        self.fields["sets"].initial = 1
+
+    def save(self, commit=True):
+        self.instance.exercise = self.cleaned_data["exercise"]
+        return super().save(commit)
+
+
+class BaseBatchExerciseRecordFormSet(forms.BaseFormSet):
+    """Formset that validates all rows together and loads exercises once"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exercises = {exercise.pk: exercise for exercise in Exercise.objects.all()}
+        # Prefilled rows come before the usual blank ones
+        self.extra += len(self.initial or [])
+
+    def initial_form_count(self):
+        # Initial data only prefills new rows, which stay optional
+        return 0
+
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        kwargs["exercises"] = self.exercises
+        return kwargs
+
+    def clean(self):
+        super().clean()
+        if not any(form.has_changed() for form in self.forms):
+            raise forms.ValidationError("Fill in at least one exercise.")
+
+
+BatchExerciseRecordFormSet = forms.formset_factory(
+    BatchExerciseRecordForm,
+    formset=BaseBatchExerciseRecordFormSet,
+    extra=5,
+    max_num=30,
+    validate_max=True,
+)
+
+
+class SyncWorkoutSessionForm(forms.ModelForm):
+    """Validates a workout session operation sent by the offline sync client"""
+
+    client_id = forms.UUIDField()
+    start_time = forms.TimeField(required=False)
+
+    class Meta:
+        model = WorkoutSession
+        fields = ["date", "end_time", "notes", "is_completed"]
+
+
+class SyncExerciseRecordForm(forms.ModelForm):
+    """Validates an exercise record operation sent by the offline sync client
+
+    The exercise is resolved by the caller for the whole batch at once, so it
+    is not part of the form and does not cost a query per record.
+    """
+
+    client_id = forms.UUIDField()
+
+    class Meta:
+        model = ExerciseRecord
+        fields = ["weight_kg", "reps", "sets", "difficulty_rating", "notes"]
+
+
 class CustomLoginForm(LoginForm):
     """Custom login form with Bootstrap styling and no remember me checkbox"""
 
@@ -0,0 +1,79 @@
+"""
+Per-request performance counters.
+
+``PerformanceMiddleware`` starts a ``RequestStats`` for every request and keeps
+it in a context variable. The database wrapper installed by
+``install_query_wrapper`` and the cache backends in ``workouts.cache`` add to
+whatever request is current, so nothing has to be passed around and code
+running outside a request (management commands, migrations) pays only for a
+context variable lookup.
+"""
+
+import time
+from contextvars import ContextVar
+
+_current = ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    """Timings and counters collected while handling one request"""
+
+    __slots__ = (
+        "started",
+        "url_name",
+        "queries",
+        "sql_seconds",
+        "template_seconds",
+        "cache_hits",
+        "cache_misses",
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.url_name = None
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def begin_request():
+    """Start collecting for a new request, returns the token for end_request"""
+    return _current.set(RequestStats())
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current_stats():
+    """Stats of the request being handled, or None outside a request"""
+    return _current.get()
+
+
+def record_cache_lookup(hit):
+    if stats := _current.get():
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """Database execute wrapper counting queries and SQL time"""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.sql_seconds += time.perf_counter() - start
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """connection_created receiver that instruments every new connection"""
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
@@ -0,0 +1,55 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from workouts.archive import archive_path, archive_sessions, update_archive_schemas
+
+
+class Command(BaseCommand):
+    help = (
+        "Move old workout sessions and their exercise records out of the live "
+        "tables into yearly archive databases"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help="Archive sessions older than this many days "
+            f"(default: ARCHIVE_AFTER_DAYS, {settings.ARCHIVE_AFTER_DAYS})",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Sessions moved per transaction (default: 500)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only show how many sessions would be archived",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] < 1:
+            raise CommandError("--days must be at least 1")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        # Archives written before the latest migrations get their new columns
+        if not options["dry_run"]:
+            update_archive_schemas()
+
+        before = date.today() - timedelta(days=options["days"])
+        moved = archive_sessions(
+            before, chunk_size=options["chunk_size"], dry_run=options["dry_run"]
+        )
+        if not moved:
+            self.stdout.write(f"No sessions before {before} to archive")
+        for year, count in sorted(moved.items()):
+            verb = "Would archive" if options["dry_run"] else "Archived"
+            self.stdout.write(
+                f"{verb} {count} sessions from {year} into {archive_path(year)}"
+            )
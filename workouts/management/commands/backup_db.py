@@ -0,0 +1,109 @@
+import sqlite3
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from workouts.backup import WriterStallProbe, backup_database, expired_backups
+
+
+def megabytes(size):
+    return size / 1024 / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Back up the live SQLite database without holding up writers, verify "
+        "and compress the copy, and delete backups the retention policy drops"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output-dir",
+            type=Path,
+            help="Directory for the backups (default: BACKUP_DIR)",
+        )
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=256,
+            help="Database pages copied per step (default: 256)",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=50,
+            help="Milliseconds to pause between steps (default: 50)",
+        )
+        parser.add_argument(
+            "--keep-daily",
+            type=int,
+            default=7,
+            help="Keep the newest backup of this many days (default: 7)",
+        )
+        parser.add_argument(
+            "--keep-weekly",
+            type=int,
+            default=4,
+            help="Keep the newest backup of this many weeks (default: 4)",
+        )
+        parser.add_argument(
+            "--no-probe",
+            action="store_false",
+            dest="probe",
+            help="Don't measure how long writers wait during the backup",
+        )
+
+    def handle(self, *args, **options):
+        source = Path(settings.DATABASES["default"]["NAME"])
+        if not source.is_file():
+            raise CommandError(f"No database at {source}")
+        if options["pages"] < 1:
+            raise CommandError("--pages must be at least 1")
+        if options["keep_daily"] < 1:
+            raise CommandError("--keep-daily must be at least 1")
+        directory = options["output_dir"] or Path(settings.BACKUP_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        probe = WriterStallProbe(source) if options["probe"] else None
+        if probe:
+            probe.start()
+        try:
+            path, stats = backup_database(
+                source,
+                directory,
+                pages=options["pages"],
+                sleep=options["sleep"] / 1000,
+            )
+        except sqlite3.Error as e:
+            raise CommandError(f"Backup failed: {e}")
+        finally:
+            if probe:
+                probe.stop()
+
+        size = megabytes(stats["size"])
+        self.stdout.write(
+            f"Copied {size:.1f} MB in {stats['copy_seconds']:.2f} s "
+            f"({size / max(stats['copy_seconds'], 1e-6):.1f} MB/s, "
+            f"{stats['steps']} steps, {stats['restarts']} restarts)"
+        )
+        self.stdout.write(
+            f"Integrity check passed in {stats['verify_seconds']:.2f} s, "
+            f"compressed to {megabytes(stats['compressed_size']):.1f} MB "
+            f"({stats['compressed_size'] / max(stats['size'], 1):.0%}) "
+            f"in {stats['compress_seconds']:.2f} s"
+        )
+        if probe:
+            self.stdout.write(
+                f"Longest writer stall: {probe.max_stall * 1000:.1f} ms "
+                f"({probe.probes} probes)"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
+
+        expired = expired_backups(
+            directory.iterdir(), options["keep_daily"], options["keep_weekly"]
+        )
+        for old in expired:
+            old.unlink()
+        if expired:
+            self.stdout.write(f"Deleted {len(expired)} expired backups")
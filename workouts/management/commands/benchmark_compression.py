@@ -0,0 +1,101 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from workouts.middleware import BrotliEncoder, GzipEncoder, brotli
+from workouts.models import WorkoutSession
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Render real pages for a user and compare compression levels: "
+        "compressed size, CPU time and estimated time to deliver"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="User whose pages to render")
+        parser.add_argument(
+            "--bandwidth",
+            type=float,
+            default=2000,
+            help="Client bandwidth in kbit/s used to estimate transfer time "
+            "(default: 2000, a weak mobile connection)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Compress each page this many times and take the median",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options["email"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+
+        pages = {
+            "dashboard": reverse("workouts:dashboard"),
+            "history": reverse("workouts:workout_history"),
+        }
+        workout = (
+            WorkoutSession.objects.filter(user=user)
+            .order_by("-date", "-start_time")
+            .first()
+        )
+        if workout:
+            pages["workout_detail"] = reverse(
+                "workouts:workout_detail", kwargs={"pk": workout.pk}
+            )
+
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost"
+        client = Client(HTTP_HOST=host.lstrip("."))
+        client.force_login(user)
+
+        encoders = [("identity", None)]
+        encoders += [
+            (f"gzip-{level}", lambda level=level: GzipEncoder(level))
+            for level in (1, 6, 9)
+        ]
+        if brotli is not None:
+            encoders += [
+                (f"br-{quality}", lambda quality=quality: BrotliEncoder(quality))
+                for quality in (1, 5, 11)
+            ]
+
+        bytes_per_ms = options["bandwidth"] * 1000 / 8 / 1000
+        for name, url in pages.items():
+            response = client.get(url, secure=not settings.DEBUG)
+            if response.status_code != 200:
+                raise CommandError(f"{url} returned {response.status_code}")
+            body = response.content
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} ({url})"))
+            self.stdout.write(
+                f"  {'encoding':<10} {'bytes':>8} {'ratio':>6} "
+                f"{'cpu ms':>7} {'total ms':>9}"
+            )
+            for label, make_encoder in encoders:
+                size, cpu_ms = self._measure(body, make_encoder, options["repeat"])
+                total_ms = cpu_ms + size / bytes_per_ms
+                self.stdout.write(
+                    f"  {label:<10} {size:>8} {size / len(body):>6.1%} "
+                    f"{cpu_ms:>7.2f} {total_ms:>9.1f}"
+                )
+
+    def _measure(self, body, make_encoder, repeat):
+        if make_encoder is None:
+            return len(body), 0.0
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            encoder = make_encoder()
+            compressed = encoder.compress(body) + encoder.finish()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return len(compressed), timings[len(timings) // 2]
@@ -0,0 +1,82 @@
+import statistics
+import time
+from importlib import import_module
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+User = get_user_model()
+
+ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-request cost of loading a logged-in session, and of "
+        "saving a changed one, with the database and the cached database "
+        "session engines"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="User to log in the sessions for")
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=1000,
+            help="Requests per engine (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options["email"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+
+        self.stdout.write(f"{options['requests']} requests per engine")
+        self.stdout.write(
+            f"{'engine':<11}{'step':<6}{'mean us':>9}{'p95 us':>9}{'queries':>9}"
+        )
+        for name, engine in ENGINES.items():
+            SessionStore = import_module(engine).SessionStore
+            session = SessionStore()
+            session["_auth_user_id"] = str(user.pk)
+            session.create()
+            try:
+                for step, timings, queries in self.run_requests(
+                    SessionStore, session.session_key, options["requests"]
+                ):
+                    quantiles = statistics.quantiles(timings, n=100)
+                    self.stdout.write(
+                        f"{name:<11}{step:<6}{statistics.mean(timings):9.1f}"
+                        f"{quantiles[94]:9.1f}{queries / len(timings):9.2f}"
+                    )
+            finally:
+                Session.objects.filter(pk=session.session_key).delete()
+                session.delete()
+
+    def run_requests(self, SessionStore, session_key, requests):
+        """
+        Timings in us and the number of queries of requests that only read
+        the session, as SessionMiddleware and AuthenticationMiddleware do, and
+        of requests that change it.
+        """
+        results = []
+        for step in ["read", "write"]:
+            timings = []
+            with CaptureQueriesContext(connection) as queries:
+                for i in range(requests):
+                    start = time.perf_counter()
+                    session = SessionStore(session_key)
+                    session.get("_auth_user_id")
+                    if step == "write":
+                        session["last_seen"] = i
+                        session.save()
+                    timings.append((time.perf_counter() - start) * 1e6)
+            results.append((step, timings, len(queries)))
+        return results
@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from workouts.models import WorkoutSession
+
+User = get_user_model()
+
+
+def wsgi_get(application, path, host, cookie):
+    """Request a page from a WSGI application, as a threaded server would"""
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "SCRIPT_NAME": "",
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": host,
+        "SERVER_PORT": "443",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "REMOTE_ADDR": "127.0.0.1",
+        "HTTP_HOST": host,
+        "HTTP_COOKIE": cookie,
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "https",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    statuses = []
+    result = application(environ, lambda status, headers: statuses.append(status))
+    try:
+        b"".join(result)
+    finally:
+        result.close()
+    return int(statuses[0].split()[0])
+
+
+async def asgi_get(application, path, host, cookie):
+    """Request a page from an ASGI application, as an ASGI server would"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "https",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", host.encode()), (b"cookie", cookie.encode())],
+        "client": ("127.0.0.1", 0),
+        "server": (host, 443),
+    }
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+    statuses = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # The client stays connected until the response is sent
+        await asyncio.Future()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    await application(scope, receive, send)
+    return statuses[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the dashboard, workout and add-exercise pages with concurrent "
+        "requests, through the WSGI application with the regular views and "
+        "through the ASGI application with the async views, and compare their "
+        "latency percentiles"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="User whose pages to request")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=10,
+            help="Requests in flight at the same time (default: 10)",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Requests per page and server (default: 200)",
+        )
+        # Runs one side of the benchmark in a fresh process, see handle()
+        parser.add_argument(
+            "--server", choices=["wsgi", "asgi"], help=argparse.SUPPRESS
+        )
+        parser.add_argument("--cookie", help=argparse.SUPPRESS)
+        parser.add_argument("--paths", nargs="*", help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options["server"]:
+            latencies = self.run_load(options)
+            self.stdout.write(json.dumps(latencies))
+            return
+
+        try:
+            user = User.objects.get(email=options["email"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+        workout = (
+            WorkoutSession.objects.filter(user=user)
+            .order_by("-date", "-start_time")
+            .first()
+        )
+        if workout is None:
+            raise CommandError(f"{user.email} has no workouts")
+        pages = {
+            "dashboard": reverse("workouts:dashboard"),
+            "workout_detail": reverse(
+                "workouts:workout_detail", kwargs={"pk": workout.pk}
+            ),
+            "add_exercise": reverse("workouts:add_exercise", kwargs={"pk": workout.pk}),
+        }
+
+        client = Client()
+        client.force_login(user)
+        session = client.cookies[settings.SESSION_COOKIE_NAME]
+        cookie = f"{session.key}={session.value}"
+
+        # The URLs are routed to the async views at import time, so each
+        # server runs in its own process
+        results = {}
+        for server, async_views in [("wsgi", "False"), ("asgi", "True")]:
+            command = [
+                sys.executable,
+                "manage.py",
+                "benchmark_views",
+                user.email,
+                f"--server={server}",
+                f"--concurrency={options['concurrency']}",
+                f"--requests={options['requests']}",
+                f"--cookie={cookie}",
+                "--paths",
+                *pages.values(),
+            ]
+            result = subprocess.run(
+                command,
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                env={
+                    **os.environ,
+                    "ASYNC_VIEWS": async_views,
+                    "PERFORMANCE_INSTRUMENTATION": "False",
+                },
+            )
+            if result.returncode:
+                raise CommandError(f"{server} benchmark failed:\n{result.stderr}")
+            results[server] = json.loads(result.stdout.splitlines()[-1])
+
+        self.stdout.write(
+            f"{options['requests']} requests per page, "
+            f"{options['concurrency']} concurrent"
+        )
+        self.stdout.write(
+            f"{'page':<16}{'server':<8}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'max ms':>9}"
+        )
+        for name, path in pages.items():
+            for server in results:
+                latencies = sorted(results[server][path])
+                quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+                self.stdout.write(
+                    f"{name:<16}{server:<8}{quantiles[49]:9.1f}{quantiles[94]:9.1f}"
+                    f"{quantiles[98]:9.1f}{latencies[-1]:9.1f}"
+                )
+
+    def run_load(self, options):
+        """Latencies in ms by path, for one server"""
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost"
+        host = host.lstrip(".")
+        paths = options["paths"] * options["requests"]
+        concurrency = options["concurrency"]
+        cookie = options["cookie"]
+
+        if options["server"] == "wsgi":
+            from gymtracker.wsgi import application
+
+            def timed(path):
+                start = time.perf_counter()
+                status = wsgi_get(application, path, host, cookie)
+                return path, status, (time.perf_counter() - start) * 1000
+
+            with ThreadPoolExecutor(concurrency) as executor:
+                timings = list(executor.map(timed, paths))
+        else:
+            from gymtracker.asgi import application
+
+            async def load():
+                slots = asyncio.Semaphore(concurrency)
+
+                async def timed(path):
+                    async with slots:
+                        start = time.perf_counter()
+                        status = await asgi_get(application, path, host, cookie)
+                        return path, status, (time.perf_counter() - start) * 1000
+
+                return await asyncio.gather(*(timed(path) for path in paths))
+
+            timings = asyncio.run(load())
+
+        latencies = {path: [] for path in options["paths"]}
+        for path, status, milliseconds in timings:
+            if status != 200:
+                raise CommandError(f"{path} returned {status}")
+            latencies[path].append(milliseconds)
+        return latencies
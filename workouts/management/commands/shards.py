@@ -0,0 +1,120 @@
+import argparse
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+
+from workouts.models import Gym
+from workouts.shards import shard_alias, use_gym
+
+
+class Command(BaseCommand):
+    help = (
+        "List the gym databases, or run the migrations or another command on "
+        "every one of them, see workouts.shards"
+    )
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest="action", required=True)
+        subparsers.add_parser("list", help="Show the gyms and their databases")
+
+        migrate = subparsers.add_parser(
+            "migrate",
+            help="Create the gym databases and run their migrations, after "
+            "migrating the default database",
+        )
+        run = subparsers.add_parser(
+            "run",
+            help="Run a command once for every gym database, with the gym's "
+            "database selected as in its members' requests",
+        )
+        for subparser in [migrate, run]:
+            subparser.add_argument(
+                "--jobs",
+                type=int,
+                default=4,
+                help="Gym databases handled at the same time (default: 4)",
+            )
+        run.add_argument("command_name", help="The command to run")
+        run.add_argument(
+            "args", nargs=argparse.REMAINDER, help="Arguments for the command"
+        )
+
+    def handle(self, *args, **options):
+        if options["action"] == "list":
+            return self.list_gyms()
+
+        if not settings.GYM_SHARDS:
+            raise CommandError("No gym databases, GYM_SHARDS is empty")
+        if options["jobs"] < 1:
+            raise CommandError("--jobs must be at least 1")
+        if options["action"] == "migrate":
+            settings.GYM_SHARD_DIR.mkdir(parents=True, exist_ok=True)
+            self.for_each_shard(
+                options["jobs"],
+                lambda slug, out: call_command(
+                    "migrate",
+                    database=shard_alias(slug),
+                    interactive=False,
+                    verbosity=options["verbosity"],
+                    stdout=out,
+                ),
+            )
+        else:
+            self.for_each_shard(
+                options["jobs"],
+                lambda slug, out: call_command(
+                    options["command_name"], *args, stdout=out
+                ),
+            )
+
+    def list_gyms(self):
+        gyms = {
+            gym.slug: gym for gym in Gym.objects.annotate(member_count=Count("members"))
+        }
+        for slug in sorted(gyms.keys() | set(settings.GYM_SHARDS)):
+            gym = gyms.get(slug)
+            if gym is None:
+                self.stdout.write(f"{slug}: in GYM_SHARDS, but there is no such gym")
+            elif slug in settings.GYM_SHARDS:
+                self.stdout.write(
+                    f"{slug}: {gym.member_count} members, "
+                    f"in database {shard_alias(slug)}"
+                )
+            else:
+                self.stdout.write(
+                    f"{slug}: {gym.member_count} members, in the default database"
+                )
+
+    def for_each_shard(self, jobs, function):
+        """Call ``function(slug, out)`` for every gym database, in threads"""
+
+        def run(slug):
+            out = io.StringIO()
+            try:
+                with use_gym(slug):
+                    function(slug, out)
+            finally:
+                # Connections are per thread, and the pool's threads go away
+                connections.close_all()
+            return out.getvalue()
+
+        failed = []
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {slug: executor.submit(run, slug) for slug in settings.GYM_SHARDS}
+            for slug, future in futures.items():
+                try:
+                    output = future.result()
+                except Exception as e:
+                    failed.append(slug)
+                    self.stderr.write(f"{slug}: {e}")
+                else:
+                    self.stdout.write(f"{slug}: done")
+                    if output:
+                        self.stdout.write(output, ending="")
+        if failed:
+            raise CommandError(f"Failed for {', '.join(failed)}")
@@ -0,0 +1,77 @@
+import json
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from workouts.slow_queries import normalize_sql
+
+
+class Command(BaseCommand):
+    help = "Rank the queries in the slow query log by total time"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "files",
+            nargs="*",
+            help="Log files to read (default: slow_queries.log and its rotated "
+            "copies in LOG_DIR)",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=20, help="Number of queries to show"
+        )
+
+    def handle(self, *args, **options):
+        files = [Path(f) for f in options["files"]] or sorted(
+            Path(settings.LOG_DIR).glob("slow_queries.log*")
+        )
+        if not files:
+            raise CommandError(f"No slow query logs found in {settings.LOG_DIR}")
+
+        groups = defaultdict(
+            lambda: {
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "views": Counter(),
+                "origins": Counter(),
+            }
+        )
+        skipped = 0
+        for path in files:
+            with path.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        sql, duration = entry["sql"], float(entry["duration_ms"])
+                    except (ValueError, KeyError, TypeError):
+                        skipped += 1
+                        continue
+                    group = groups[normalize_sql(sql)]
+                    group["count"] += 1
+                    group["total_ms"] += duration
+                    group["max_ms"] = max(group["max_ms"], duration)
+                    group["views"][entry.get("view") or "-"] += 1
+                    origin = entry.get("template") or entry.get("source") or "-"
+                    group["origins"][origin] += 1
+
+        ranked = sorted(groups.items(), key=lambda item: -item[1]["total_ms"])
+        for rank, (sql, group) in enumerate(ranked[: options["limit"]], 1):
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"#{rank} {group['total_ms']:.0f} ms total, "
+                    f"{group['count']} calls, "
+                    f"{group['total_ms'] / group['count']:.1f} ms mean, "
+                    f"{group['max_ms']:.1f} ms max"
+                )
+            )
+            self.stdout.write(f"  {sql}")
+            self.stdout.write(f"  views: {self._top(group['views'])}")
+            self.stdout.write(f"  from: {self._top(group['origins'])}")
+
+        if skipped:
+            self.stderr.write(f"Skipped {skipped} unreadable lines")
+
+    def _top(self, counter):
+        return ", ".join(f"{name} ({count})" for name, count in counter.most_common(3))
@@ -0,0 +1,85 @@
+import os
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a bare `manage.py check` may cost; enforced by workouts.test_startup
+STARTUP_TIME_BUDGET = 1.0  # seconds
+IMPORTED_MODULES_BUDGET = 750
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure_startup(command=("check",), env=None):
+    """
+    Run a management command in a fresh interpreter with ``-X importtime``.
+
+    ``env`` holds extra environment variables for the child process.
+
+    Returns the wall time in seconds and a list of (module, self µs,
+    cumulative µs, nesting depth) tuples in import order.
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "manage.py", *command],
+        cwd=settings.BASE_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, **(env or {})},
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode:
+        raise CommandError(f"manage.py {' '.join(command)} failed:\n{result.stderr}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if match := IMPORT_TIME_LINE.match(line):
+            own, cumulative, indent, name = match.groups()
+            modules.append((name, int(own), int(cumulative), (len(indent) - 1) // 2))
+    return elapsed, modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how long a management command takes to start and which "
+        "imports that time goes to"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "args",
+            nargs="*",
+            metavar="command",
+            help="Management command to measure (default: check)",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=25, help="Number of modules to list"
+        )
+
+    def handle(self, *command, **options):
+        elapsed, modules = measure_startup(command or ("check",))
+        import_us = sum(own for _, own, _, _ in modules)
+
+        self.stdout.write(
+            f"{elapsed:.3f}s wall time, {len(modules)} modules imported in "
+            f"{import_us / 1e6:.3f}s "
+            f"(budget: {STARTUP_TIME_BUDGET}s, {IMPORTED_MODULES_BUDGET} modules)"
+        )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Slowest top-level imports:"))
+        top_level = [m for m in modules if m[3] == 0]
+        for name, _, cumulative, _ in sorted(top_level, key=lambda m: -m[2])[
+            : options["limit"]
+        ]:
+            self.stdout.write(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Slowest modules (self time):"))
+        for name, own, _, _ in sorted(modules, key=lambda m: -m[1])[: options["limit"]]:
+            self.stdout.write(f"  {own / 1000:8.1f} ms  {name}")
+
+        if elapsed > STARTUP_TIME_BUDGET or len(modules) > IMPORTED_MODULES_BUDGET:
+            self.stdout.write(self.style.WARNING("Over the startup budget"))
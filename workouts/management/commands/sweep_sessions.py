@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired sessions from the database in small batches, and "
+        "their entries from the session cache"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Sessions deleted per transaction (default: 500)",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=50,
+            help="Milliseconds to pause between batches (default: 50)",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        # Unlike clearsessions, which deletes them all in one statement, this
+        # holds the write lock for one batch at a time
+        expired = Session.objects.filter(expire_date__lt=timezone.now())
+        deleted = 0
+        while session_keys := list(
+            expired.values_list("pk", flat=True)[: options["batch_size"]]
+        ):
+            if deleted:
+                time.sleep(options["sleep"] / 1000)
+            Session.objects.filter(pk__in=session_keys).delete()
+            deleted += len(session_keys)
+        self.stdout.write(f"Deleted {deleted} expired sessions")
+
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+        if hasattr(cache, "delete_expired"):
+            count = cache.delete_expired()
+            self.stdout.write(f"Deleted {count} expired session cache entries")
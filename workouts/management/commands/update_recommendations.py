@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router
+
+from workouts.models import WorkoutSession
+from workouts.recommendations import update_recommendations
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the stored weight recommendations from recent sessions, "
+        "which is otherwise done when a workout is completed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "emails",
+            nargs="*",
+            help="Only update these users (default: everyone who logged a workout)",
+        )
+
+    def handle(self, *args, **options):
+        # Users with sessions in the current gym's database, see shards run
+        users = (
+            User.objects.using(router.db_for_read(WorkoutSession))
+            .filter(workout_sessions__isnull=False)
+            .distinct()
+        )
+        if options["emails"]:
+            users = User.objects.filter(email__in=options["emails"])
+            missing = set(options["emails"]) - set(
+                users.values_list("email", flat=True)
+            )
+            if missing:
+                raise CommandError(f"No user with email {', '.join(sorted(missing))}")
+
+        updated = 0
+        for user in users.order_by("pk").iterator():
+            updated += len(update_recommendations(user))
+        self.stdout.write(f"Updated {updated} recommendations")
@@ -0,0 +1,304 @@
+"""
+Prometheus metrics.
+
+Every worker process keeps its counters and histograms in memory and writes
+them to its own JSON file in ``METRICS_DIR`` at most once per second (and at
+exit). The ``/metrics`` view merges the files of all processes by summing them,
+so the totals are right however many workers serve requests, without a shared
+server.
+
+The files of stopped workers are folded into ``archive.json`` and deleted, so
+counters never go backwards and the directory doesn't fill up as workers are
+restarted. A file is named after the process ID and the time the process
+first wrote it, so a new worker that gets an earlier one's ID never overwrites
+its totals.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import locks
+
+# Upper bounds of the histogram buckets, +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+QUERY_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+METRICS = {
+    "gymtracker_http_request_duration_seconds": (
+        "histogram",
+        "Time to handle a request, by URL name and status",
+        LATENCY_BUCKETS,
+    ),
+    "gymtracker_db_queries_per_request": (
+        "histogram",
+        "Database queries run by one request",
+        QUERY_COUNT_BUCKETS,
+    ),
+    "gymtracker_db_query_seconds_per_request": (
+        "histogram",
+        "Total database time of one request",
+        QUERY_TIME_BUCKETS,
+    ),
+    "gymtracker_cache_requests_total": (
+        "counter",
+        "Cache lookups by result (hit or miss)",
+        None,
+    ),
+    "gymtracker_compression_bytes_in_total": (
+        "counter",
+        "Response bytes before compression",
+        None,
+    ),
+    "gymtracker_compression_bytes_out_total": (
+        "counter",
+        "Response bytes after compression",
+        None,
+    ),
+    "gymtracker_compression_cpu_seconds_total": (
+        "counter",
+        "CPU time spent compressing responses",
+        None,
+    ),
+}
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+# (name, sorted label items) -> value for counters, or
+# [cumulative bucket counts..., +Inf count, sum] for histograms
+_values = {}
+_last_flush = 0.0
+# The process ID and metrics file name of this process
+_process = None
+
+ARCHIVE_FILE = "archive.json"
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, labels, amount=1):
+    if not amount:
+        return
+    with _lock:
+        key = _key(name, labels)
+        _values[key] = _values.get(key, 0) + amount
+
+
+def observe(name, labels, value):
+    buckets = METRICS[name][2]
+    with _lock:
+        key = _key(name, labels)
+        series = _values.get(key)
+        if series is None:
+            series = _values[key] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += 1
+        series[-1] += value
+
+
+def observe_request(url_name, status, seconds, stats):
+    """Record a finished request, ``stats`` is its instrumentation.RequestStats"""
+    labels = {"url_name": url_name or "", "status": str(status)}
+    observe("gymtracker_http_request_duration_seconds", labels, seconds)
+    view = {"url_name": url_name or ""}
+    observe("gymtracker_db_queries_per_request", view, stats.queries)
+    observe("gymtracker_db_query_seconds_per_request", view, stats.sql_seconds)
+    inc("gymtracker_cache_requests_total", {"result": "hit"}, stats.cache_hits)
+    inc("gymtracker_cache_requests_total", {"result": "miss"}, stats.cache_misses)
+    maybe_flush()
+
+
+def _process_file():
+    global _process
+    pid = os.getpid()
+    # A forked worker gets a file of its own
+    if _process is None or _process[0] != pid:
+        _process = pid, f"{pid}-{time.time_ns()}.json"
+    return Path(settings.METRICS_DIR) / _process[1]
+
+
+def maybe_flush():
+    """Write this process's metrics unless that happened less than 1s ago"""
+    global _last_flush
+    now = time.monotonic()
+    if now - _last_flush >= 1:
+        _last_flush = now
+        flush()
+
+
+def flush():
+    from .middleware import compression_stats
+
+    compression = compression_stats()
+    with _lock:
+        values = [
+            [name, dict(labels), list(value) if isinstance(value, list) else value]
+            for (name, labels), value in _values.items()
+        ]
+    values += [
+        ["gymtracker_compression_bytes_in_total", {}, compression["bytes_in"]],
+        ["gymtracker_compression_bytes_out_total", {}, compression["bytes_out"]],
+        ["gymtracker_compression_cpu_seconds_total", {}, compression["cpu_seconds"]],
+    ]
+
+    path = _process_file()
+    with _flush_lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(values))
+        # Readers never see a half written file
+        os.replace(tmp, path)
+
+
+def _flush_at_exit():
+    if _values:
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def _merge(merged, entries):
+    for name, labels, value in entries:
+        if name not in METRICS:
+            continue
+        labels = tuple(sorted(labels.items()))
+        current = merged[name].get(labels)
+        if current is None:
+            merged[name][labels] = value
+        elif isinstance(value, list):
+            merged[name][labels] = [a + b for a, b in zip(current, value)]
+        else:
+            merged[name][labels] = current + value
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Running as another user
+    return True
+
+
+def _stopped_process_files(directory):
+    for path in directory.glob("*.json"):
+        pid = path.stem.split("-")[0]
+        if pid.isdigit() and not _is_running(int(pid)):
+            yield path
+
+
+def _read_archive(directory):
+    try:
+        archive = json.loads((directory / ARCHIVE_FILE).read_text())
+    except FileNotFoundError:
+        return {"folded": [], "entries": []}
+    # Only files whose deletion was cut short are still there
+    archive["folded"] = [
+        name for name in archive["folded"] if (directory / name).exists()
+    ]
+    return archive
+
+
+def _archive_stopped_processes(directory):
+    """
+    Fold the files of stopped processes into the archive and delete them.
+    Returns the archive. The caller holds the archive lock.
+    """
+    archive = _read_archive(directory)
+    stopped = [
+        path
+        for path in _stopped_process_files(directory)
+        if path.name not in archive["folded"]
+    ]
+    if stopped:
+        merged = defaultdict(dict)
+        _merge(merged, archive["entries"])
+        for path in stopped:
+            try:
+                _merge(merged, json.loads(path.read_text()))
+            except ValueError:
+                pass  # Nothing to keep of a corrupt file
+        archive = {
+            "folded": archive["folded"] + [path.name for path in stopped],
+            "entries": [
+                [name, dict(labels), value]
+                for name, series in merged.items()
+                for labels, value in series.items()
+            ],
+        }
+        tmp = (directory / ARCHIVE_FILE).with_suffix(".tmp")
+        tmp.write_text(json.dumps(archive))
+        os.replace(tmp, directory / ARCHIVE_FILE)
+    for name in archive["folded"]:
+        (directory / name).unlink(missing_ok=True)
+    return archive
+
+
+def collect():
+    """Merge the metrics files of all processes"""
+    flush()
+    directory = Path(settings.METRICS_DIR)
+    merged = defaultdict(dict)
+    # Archiving moves totals between files, so other collectors wait
+    with open(directory / "archive.lock", "wb") as lock:
+        locks.lock(lock, locks.LOCK_EX)
+        archive = _archive_stopped_processes(directory)
+        _merge(merged, archive["entries"])
+        for path in directory.glob("*.json"):
+            if path.name == ARCHIVE_FILE or path.name in archive["folded"]:
+                continue
+            try:
+                entries = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue  # Corrupt
+            _merge(merged, entries)
+    return merged
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def render(merged, gauges=()):
+    """
+    Prometheus text exposition of the merged metrics.
+
+    ``gauges`` are (name, help, value) tuples computed at scrape time.
+    """
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for labels, value in sorted(merged.get(name, {}).items()):
+            if kind == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            for bound, count in zip((*buckets, "+Inf"), value[:-1]):
+                bucket_labels = _format_labels((*labels, ("le", str(bound))))
+                lines.append(f"{name}_bucket{bucket_labels} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value[-1]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value[-2]}")
+    for name, help_text, value in gauges:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
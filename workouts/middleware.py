@@ -0,0 +1,470 @@
+"""
+Response compression and performance instrumentation.
+
+``CompressionMiddleware`` negotiates brotli or gzip with the client and
+compresses HTML, JSON and other text responses, including streaming ones. Small
+bodies, already encoded responses and binary formats are left alone. The bytes
+saved and CPU time spent are kept in process-wide counters, see
+``compression_stats()``.
+
+Against BREACH, gzip output is padded to a random length like Django's
+``compress_string()`` does, and pages that carry a CSRF token are never sent
+as brotli, which can't be padded that way.
+
+``PerformanceMiddleware`` reports query count, SQL, template and view time and
+cache hits of every request in a ``Server-Timing`` header and a log line, and
+feeds the Prometheus metrics in ``workouts.metrics``.
+
+``ProfilerMiddleware`` lets superusers profile a single request, see
+``workouts.profiling``.
+
+``GymMiddleware`` runs the queries of a request on the database of the user's
+gym, see ``workouts.shards``.
+"""
+
+import gzip
+import json
+import logging
+import secrets
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+
+from . import instrumentation, metrics, shards
+from .assets import accepted_encodings
+from .profiling import SamplingProfiler
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+performance_logger = logging.getLogger("gymtracker.performance")
+
+COMPRESSIBLE_CONTENT_TYPES = _lazy_re_compile(
+    r"^(text/(?!event-stream)|application/(json|javascript|xml|.*\+json|.*\+xml)"
+    r"|image/svg\+xml)"
+)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "responses": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "cpu_seconds": 0.0,
+}
+
+
+def compression_stats():
+    """Snapshot of the compression counters of this process"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["bytes_saved"] = stats["bytes_in"] - stats["bytes_out"]
+    return stats
+
+
+def reset_compression_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def _record(bytes_in, bytes_out, cpu_seconds, responses=0):
+    with _stats_lock:
+        _stats["responses"] += responses
+        _stats["bytes_in"] += bytes_in
+        _stats["bytes_out"] += bytes_out
+        _stats["cpu_seconds"] += cpu_seconds
+
+
+class GzipEncoder:
+    def __init__(self, level, max_random_bytes=0):
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        self._file_name = None
+        if max_random_bytes:
+            self._file_name = b"a" * secrets.randbelow(max_random_bytes)
+
+    def _pad(self, output):
+        # A file name of random length in the 10 byte header, which clients
+        # ignore, as in django.utils.text.compress_string()
+        if self._file_name is None or not output:
+            return output
+        header = bytearray(output[:10])
+        header[3] |= gzip.FNAME
+        output = bytes(header) + self._file_name + b"\0" + output[10:]
+        self._file_name = None
+        return output
+
+    def compress(self, data):
+        return self._pad(self._compressor.compress(data))
+
+    def flush(self):
+        # Sync flush so each streamed chunk reaches the client right away
+        return self._pad(self._compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    def finish(self):
+        return self._pad(self._compressor.flush(zlib.Z_FINISH))
+
+
+class BrotliEncoder:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def get_encoder(encoding):
+    if encoding == "br":
+        return BrotliEncoder(settings.COMPRESSION_BROTLI_QUALITY)
+    return GzipEncoder(
+        settings.COMPRESSION_GZIP_LEVEL, settings.COMPRESSION_MAX_RANDOM_BYTES
+    )
+
+
+def compress(encoding, data):
+    """Compress a complete body, returns the compressed bytes"""
+    start = time.thread_time()
+    encoder = get_encoder(encoding)
+    compressed = encoder.compress(data) + encoder.finish()
+    _record(len(data), len(compressed), time.thread_time() - start, responses=1)
+    return compressed
+
+
+def compress_stream(encoding, chunks):
+    encoder = get_encoder(encoding)
+    _record(0, 0, 0, responses=1)
+    for chunk in chunks:
+        start = time.thread_time()
+        compressed = encoder.compress(chunk) + encoder.flush()
+        _record(len(chunk), len(compressed), time.thread_time() - start)
+        if compressed:
+            yield compressed
+    start = time.thread_time()
+    tail = encoder.finish()
+    _record(0, len(tail), time.thread_time() - start)
+    yield tail
+
+
+async def compress_async_stream(encoding, chunks):
+    encoder = get_encoder(encoding)
+    _record(0, 0, 0, responses=1)
+    async for chunk in chunks:
+        start = time.thread_time()
+        compressed = encoder.compress(chunk) + encoder.flush()
+        _record(len(chunk), len(compressed), time.thread_time() - start)
+        if compressed:
+            yield compressed
+    start = time.thread_time()
+    tail = encoder.finish()
+    _record(0, len(tail), time.thread_time() - start)
+    yield tail
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress responses with brotli or gzip, whichever the client prefers.
+
+    Unlike Django's GZipMiddleware this also offers brotli, has configurable
+    levels and a minimum size, and flushes streaming responses chunk by chunk.
+    Static files are left alone, they are compressed ahead of time.
+    """
+
+    def process_response(self, request, response):
+        if not self._should_compress(request, response):
+            return response
+
+        # Whether or not we compress, caches must keep the variants apart
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        accepted = accepted_encodings(request)
+        # get_token() sets this when the page includes a CSRF token
+        carries_token = request.META.get("CSRF_COOKIE_NEEDS_UPDATE", False)
+        if "br" in accepted and brotli is not None and not carries_token:
+            encoding = "br"
+        elif "gzip" in accepted:
+            encoding = "gzip"
+        else:
+            return response
+
+        if response.streaming:
+            length = response.get("Content-Length")
+            if length and int(length) < settings.COMPRESSION_MIN_SIZE:
+                return response
+            if response.is_async:
+                response.streaming_content = compress_async_stream(
+                    encoding, response.streaming_content
+                )
+            else:
+                response.streaming_content = compress_stream(
+                    encoding, response.streaming_content
+                )
+            # The length of the compressed stream isn't known up front
+            del response["Content-Length"]
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+            compressed = compress(encoding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # A strong ETag promises byte-identical bodies, which no longer holds
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def _should_compress(self, request, response):
+        if response.status_code == 304 or response.has_header("Content-Encoding"):
+            return False
+        # serve_static sends the variants collectstatic compressed once
+        if request.path.startswith(settings.STATIC_URL):
+            return False
+        if "no-transform" in response.get("Cache-Control", ""):
+            return False
+        return bool(COMPRESSIBLE_CONTENT_TYPES.match(response.get("Content-Type", "")))
+
+
+class PerformanceMiddleware(MiddlewareMixin):
+    """
+    Time every request and report where the time went.
+
+    Enabled with the PERFORMANCE_INSTRUMENTATION setting. Place it first in
+    MIDDLEWARE so the total includes all other middleware.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    async def __acall__(self, request):
+        # The hooks don't block, so unlike MiddlewareMixin run them on the
+        # event loop, where the request's context variables live
+        self.process_request(request)
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_request(self, request):
+        request._performance_token = instrumentation.begin_request()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if stats := instrumentation.current_stats():
+            stats.url_name = request.resolver_match.view_name
+
+    def process_template_response(self, request, response):
+        stats = instrumentation.current_stats()
+        if stats is None:
+            return response
+        start = time.perf_counter()
+
+        def rendered(response):
+            stats.template_seconds += time.perf_counter() - start
+
+        # Called by Django right after this hook, once the template is rendered
+        response.add_post_render_callback(rendered)
+        return response
+
+    def process_response(self, request, response):
+        stats = instrumentation.current_stats()
+        token = getattr(request, "_performance_token", None)
+        if stats is None or token is None:
+            return response
+        instrumentation.end_request(token)
+
+        total_seconds = time.perf_counter() - stats.started
+        metrics.observe_request(
+            stats.url_name, response.status_code, total_seconds, stats
+        )
+
+        total_ms = total_seconds * 1000
+        sql_ms = stats.sql_seconds * 1000
+        template_ms = stats.template_seconds * 1000
+        # Queries run lazily while rendering count as SQL time, not as view
+        # or template time
+        view_ms = max(0.0, total_ms - template_ms - sql_ms)
+        response.headers["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={sql_ms:.1f};desc="{stats.queries} queries"',
+                f"tpl;dur={template_ms:.1f}",
+                f"view;dur={view_ms:.1f}",
+                f'cache;desc="{stats.cache_hits} hits, {stats.cache_misses} misses"',
+                f"total;dur={total_ms:.1f}",
+            ]
+        )
+        performance_logger.info(
+            json.dumps(
+                {
+                    "url_name": stats.url_name,
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "total_ms": round(total_ms, 1),
+                    "view_ms": round(view_ms, 1),
+                    "sql_ms": round(sql_ms, 1),
+                    "queries": stats.queries,
+                    "template_ms": round(template_ms, 1),
+                    "cache_hits": stats.cache_hits,
+                    "cache_misses": stats.cache_misses,
+                }
+            )
+        )
+        return response
+
+
+class ProfilerMiddleware:
+    """
+    Profile a request for a superuser who asks for it.
+
+    Add ``?_profile`` to the URL, or send an ``X-Profile`` header, to get the
+    collapsed stacks of the request instead of the page. With the value
+    ``store`` the page is returned as usual and the profile is written to
+    PROFILE_DIR. Place it after AuthenticationMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = request.GET.get("_profile", request.headers.get("X-Profile"))
+        if mode is None or not request.user.is_superuser:
+            return self.get_response(request)
+
+        with SamplingProfiler(settings.PROFILER_INTERVAL_MS / 1000) as profiler:
+            response = self.get_response(request)
+            if hasattr(response, "render"):
+                response.render()
+        return self._profile_response(request, response, profiler, mode)
+
+    async def __acall__(self, request):
+        mode = request.GET.get("_profile", request.headers.get("X-Profile"))
+        if mode is None or not (await request.auser()).is_superuser:
+            return await self.get_response(request)
+
+        # Samples the event loop thread, so time in sync code shows up as
+        # waiting for its thread
+        with SamplingProfiler(settings.PROFILER_INTERVAL_MS / 1000) as profiler:
+            response = await self.get_response(request)
+            if hasattr(response, "render"):
+                await sync_to_async(response.render)()
+        return self._profile_response(request, response, profiler, mode)
+
+    def _profile_response(self, request, response, profiler, mode):
+        summary = (
+            f"{sum(profiler.stacks.values())} samples, "
+            f"{profiler.duration * 1000:.1f} ms, {len(profiler.queries)} queries"
+        )
+        if mode == "store":
+            name = self._store(request, profiler)
+            response.headers["X-Profile"] = f"{name}: {summary}"
+            return response
+
+        response = HttpResponse(
+            profiler.collapsed(), content_type="text/plain; charset=utf-8"
+        )
+        response.headers["X-Profile"] = summary
+        return response
+
+    def _store(self, request, profiler):
+        match = request.resolver_match
+        view = match.view_name.replace(":", "-") if match else "unresolved"
+        name = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{view}"
+        directory = Path(settings.PROFILE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"{name}.collapsed").write_text(profiler.collapsed())
+        (directory / f"{name}.sql.txt").write_text(profiler.sql_summary())
+        return name
+
+
+_missing = object()
+
+
+class GymMiddleware:
+    """
+    Select the database of the logged in user's gym for the request.
+
+    The gym is kept in the session from login on, so changing a user's gym
+    takes effect at their next login. Not used unless GYM_SHARDS is set. Place
+    it after AuthenticationMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.GYM_SHARDS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        gym = None
+        if request.user.is_authenticated:
+            gym = request.session.get(shards.GYM_SESSION_KEY, _missing)
+            if gym is _missing:
+                # Logged in before GYM_SHARDS was set
+                gym = shards.gym_of(request.user)
+                request.session[shards.GYM_SESSION_KEY] = gym
+        # The thread serves the next request in the same context, so don't
+        # leave the gym set for it
+        token = shards.set_gym(gym)
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if response is not None and response.streaming:
+                # Its content still queries the gym's database as it is sent
+                response._resource_closers.append(lambda: shards.reset_gym(token))
+            else:
+                shards.reset_gym(token)
+        return response
+
+    async def __acall__(self, request):
+        gym = None
+        user = await request.auser()
+        if user.is_authenticated:
+            gym = await request.session.aget(shards.GYM_SESSION_KEY, _missing)
+            if gym is _missing:
+                gym = await sync_to_async(shards.gym_of)(user)
+                await request.session.aset(shards.GYM_SESSION_KEY, gym)
+        token = shards.set_gym(gym)
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            # A streaming response is sent, and closed in a copy of the
+            # context, after this returns. Every ASGI request is a task with a
+            # context of its own, which ends with it.
+            if response is None or not response.streaming:
+                shards.reset_gym(token)
+        return response
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workouts", "0002_userprofile_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exerciserecord",
+            name="client_id",
+            field=models.UUIDField(
+                blank=True,
+                editable=False,
+                help_text="Identifier generated by an offline client, used to deduplicate syncs",
+                null=True,
+                unique=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="workoutsession",
+            name="client_id",
+            field=models.UUIDField(
+                blank=True,
+                editable=False,
+                help_text="Identifier generated by an offline client, used to deduplicate syncs",
+                null=True,
+                unique=True,
+            ),
+        ),
+    ]
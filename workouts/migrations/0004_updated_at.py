@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workouts", "0003_client_ids"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exerciserecord",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="workoutsession",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="workoutsession",
+            index=models.Index(
+                fields=["user", "updated_at"], name="workouts_wo_user_id_ef8c5c_idx"
+            ),
+        ),
+    ]
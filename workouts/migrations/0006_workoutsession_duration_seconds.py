@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:21
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workouts", "0005_feedentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workoutsession",
+            name="duration_seconds",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.expressions.CombinedExpression(
+                    django.db.models.expressions.CombinedExpression(
+                        django.db.models.expressions.CombinedExpression(
+                            django.db.models.functions.comparison.Cast(
+                                models.Func(
+                                    models.Value("%s"), "end_time", function="strftime"
+                                ),
+                                models.IntegerField(),
+                            ),
+                            "-",
+                            django.db.models.functions.comparison.Cast(
+                                models.Func(
+                                    models.Value("%s"),
+                                    "start_time",
+                                    function="strftime",
+                                ),
+                                models.IntegerField(),
+                            ),
+                        ),
+                        "+",
+                        models.Value(86400),
+                    ),
+                    "%%",
+                    models.Value(86400),
+                ),
+                output_field=models.PositiveIntegerField(null=True),
+            ),
+        ),
+    ]
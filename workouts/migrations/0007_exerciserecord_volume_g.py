@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:28
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workouts", "0006_workoutsession_duration_seconds"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exerciserecord",
+            name="volume_g",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.expressions.CombinedExpression(
+                    django.db.models.expressions.CombinedExpression(
+                        django.db.models.functions.comparison.Cast(
+                            django.db.models.functions.math.Round(
+                                django.db.models.expressions.CombinedExpression(
+                                    models.F("weight_kg"), "*", models.Value(1000)
+                                )
+                            ),
+                            models.IntegerField(),
+                        ),
+                        "*",
+                        models.F("reps"),
+                    ),
+                    "*",
+                    models.F("sets"),
+                ),
+                output_field=models.PositiveBigIntegerField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="exerciserecord",
+            index=models.Index(
+                fields=["workout_session", "volume_g"],
+                name="workouts_ex_workout_73a352_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workouts", "0007_exerciserecord_volume_g"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExerciseRecommendation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "recommended_weight_kg",
+                    models.DecimalField(decimal_places=2, max_digits=5),
+                ),
+                ("last_weight_kg", models.DecimalField(decimal_places=2, max_digits=5)),
+                (
+                    "last_difficulty",
+                    models.IntegerField(
+                        choices=[
+                            (1, "Very Easy"),
+                            (2, "Easy"),
+                            (3, "Somewhat Easy"),
+                            (4, "Moderate"),
+                            (5, "Somewhat Hard"),
+                            (6, "Hard"),
+                            (7, "Very Hard"),
+                            (8, "Extremely Hard"),
+                            (9, "Maximum Effort"),
+                            (10, "Failure"),
+                        ]
+                    ),
+                ),
+                (
+                    "session_count",
+                    models.PositiveIntegerField(
+                        help_text="Number of recent sessions the recommendation is based on"
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "exercise",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="workouts.exercise",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="exercise_recommendations",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("user", "exercise")},
+            },
+        ),
+    ]
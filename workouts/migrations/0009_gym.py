@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workouts", "0008_exerciserecommendation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Gym",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+                (
+                    "slug",
+                    models.SlugField(
+                        help_text="Gets its own database when listed in GYM_SHARDS, see workouts.shards",
+                        unique=True,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="gym",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Takes effect at the next login, existing workouts are not moved",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="members",
+                to="workouts.gym",
+            ),
+        ),
+    ]
@@ -0,0 +1,119 @@
+from decimal import ROUND_HALF_DOWN, Decimal
+
+from django.db import migrations
+from django.db.models import F, Window
+from django.db.models.functions import DenseRank
+
+# A copy of workouts.recommendations as it was when the recommendations were
+# first stored, so later changes to it don't change what this migration does
+WEIGHT_INCREMENT = Decimal("2.5")
+RECOMMENDATION_SESSIONS = 5
+
+
+def difficulty_step(difficulty):
+    if difficulty <= 5:
+        return 1
+    if difficulty <= 7:
+        return 0
+    return -1
+
+
+def recommend_weight(top_sets):
+    targets = [
+        weight + difficulty_step(difficulty) * WEIGHT_INCREMENT
+        for weight, difficulty in top_sets
+    ]
+    n = len(targets)
+    mean_x = Decimal(n - 1) / 2
+    mean_y = sum(targets) / n
+    variance = sum((x - mean_x) ** 2 for x in range(n))
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(targets))
+    trend = mean_y + (covariance / variance if variance else 0) * (n - 1 - mean_x)
+
+    last_weight = top_sets[-1][0]
+    steps = ((trend - last_weight) / WEIGHT_INCREMENT).quantize(
+        Decimal("1"), rounding=ROUND_HALF_DOWN
+    )
+    steps = max(-1, min(1, steps))
+    return max(Decimal("0"), last_weight + steps * WEIGHT_INCREMENT)
+
+
+def backfill_recommendations(apps, schema_editor):
+    """Store the recommendations of every user"""
+    using = schema_editor.connection.alias
+    ExerciseRecord = apps.get_model("workouts", "ExerciseRecord")
+    ExerciseRecommendation = apps.get_model("workouts", "ExerciseRecommendation")
+
+    records = (
+        ExerciseRecord.objects.using(using)
+        .annotate(
+            session_number=Window(
+                DenseRank(),
+                partition_by=["workout_session__user_id", "exercise_id"],
+                order_by=[
+                    F("workout_session__date").desc(),
+                    F("workout_session_id").desc(),
+                ],
+            )
+        )
+        .filter(session_number__lte=RECOMMENDATION_SESSIONS)
+        .order_by(
+            "workout_session__user_id",
+            "exercise_id",
+            "session_number",
+            "-weight_kg",
+            "-created_at",
+        )
+        .values_list(
+            "workout_session__user_id",
+            "exercise_id",
+            "workout_session_id",
+            "weight_kg",
+            "difficulty_rating",
+        )
+    )
+    top_sets = {}
+    seen = set()
+    for user_id, exercise_id, session_id, weight, difficulty in records.iterator():
+        # The first record of a session is its heaviest
+        if (exercise_id, session_id) not in seen:
+            seen.add((exercise_id, session_id))
+            top_sets.setdefault((user_id, exercise_id), []).insert(
+                0, (weight, difficulty)
+            )
+
+    ExerciseRecommendation.objects.using(using).bulk_create(
+        [
+            ExerciseRecommendation(
+                user_id=user_id,
+                exercise_id=exercise_id,
+                recommended_weight_kg=recommend_weight(sets),
+                last_weight_kg=sets[-1][0],
+                last_difficulty=sets[-1][1],
+                session_count=len(sets),
+            )
+            for (user_id, exercise_id), sets in top_sets.items()
+        ],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["user", "exercise"],
+        update_fields=[
+            "recommended_weight_kg",
+            "last_weight_kg",
+            "last_difficulty",
+            "session_count",
+            "updated_at",
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workouts", "0009_gym"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_recommendations, migrations.RunPython.noop, elidable=True
+        ),
+    ]
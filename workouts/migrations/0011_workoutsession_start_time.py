@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:33
+
+import workouts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workouts", "0010_backfill_recommendations"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="workoutsession",
+            name="start_time",
+            field=models.TimeField(
+                blank=True, default=workouts.models.current_time, editable=False
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workouts", "0011_workoutsession_start_time"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exercise",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
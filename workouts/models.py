@@ -1,7 +1,26 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Cast, Round
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .events import publish_sessions_changed
+from .routers import analytics_database, archive_database
+from .templatetags.duration_filters import weight_format
+
+
+class AnalyticsQuerySet(models.QuerySet):
+    def for_analytics(self):
+        """Run on the read-only analytics connection, for heavy reports"""
+        return self.using(analytics_database())
+
+    def with_archives(self):
+        """Include archived sessions and records, see workouts.archive"""
+        return self.using(archive_database())
+
 
 class Exercise(models.Model):
     """Represents a type of exercise (e.g., 'Leg Press', 'Bench Press')"""
@@ -10,6 +29,9 @@ class Exercise(models.Model):
     description = models.TextField(blank=True, null=True)
     muscle_groups = models.CharField(max_length=200, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = AnalyticsQuerySet.as_manager()
 
     class Meta:
         ordering = ["name"]
@@ -18,6 +40,35 @@ class Exercise(models.Model):
         return self.name
 
 
+class WorkoutSessionQuerySet(AnalyticsQuerySet):
+    def touch(self):
+        """Mark sessions as changed, e.g. after their exercise records changed"""
+        return self.update(updated_at=timezone.now())
+
+    def visible_to(self, user):
+        """Sessions of the user, and of users who made them their partner"""
+        return self.filter(
+            models.Q(user=user) | models.Q(user__profile__default_workout_partner=user)
+        )
+
+
+def _seconds_since_midnight(field):
+    # SQLite's own strftime() rather than a Django function, which the
+    # database can't call from outside the app, e.g. for a backup
+    return Cast(
+        models.Func(models.Value("%s"), field, function="strftime"),
+        models.IntegerField(),
+    )
+
+
+def current_time():
+    """
+    Like auto_now_add, but a start time recorded offline can be kept. Local
+    time, as the user sees it, so durations are measured in one time zone.
+    """
+    return timezone.localtime().time()
+
+
 class WorkoutSession(models.Model):
     """Represents a single workout session on a specific day"""
 
@@ -25,28 +76,52 @@ class WorkoutSession(models.Model):
         User, on_delete=models.CASCADE, related_name="workout_sessions"
     )
     date = models.DateField()
-    start_time = models.TimeField(auto_now_add=True)
+    start_time = models.TimeField(default=current_time, editable=False, blank=True)
     end_time = models.TimeField(null=True, blank=True)
     notes = models.TextField(blank=True, null=True)
     is_completed = models.BooleanField(default=False)
+    client_id = models.UUIDField(
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Identifier generated by an offline client, used to deduplicate syncs",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Computed by the database so time trained can be summed in SQL. A session
+    # that ends before it started ended after midnight.
+    duration_seconds = models.GeneratedField(
+        expression=(
+            _seconds_since_midnight("end_time")
+            - _seconds_since_midnight("start_time")
+            + 86400
+        )
+        % 86400,
+        output_field=models.PositiveIntegerField(null=True),
+        db_persist=True,
+    )
+
+    objects = WorkoutSessionQuerySet.as_manager()
 
     class Meta:
         ordering = ["-date", "-start_time"]
         unique_together = ["user", "date", "start_time"]
+        indexes = [models.Index(fields=["user", "updated_at"])]
 
     def __str__(self):
         return f"{self.user.username} - {self.date} ({self.start_time})"
 
     @property
     def duration(self):
-        """Calculate workout duration if end_time is set"""
+        """
+        Calculate workout duration if end_time is set, like duration_seconds
+        but also for changes that aren't saved yet
+        """
         if self.end_time:
-            from datetime import datetime
-
             start_datetime = datetime.combine(self.date, self.start_time)
             end_datetime = datetime.combine(self.date, self.end_time)
-            return end_datetime - start_datetime
+            return (end_datetime - start_datetime) % timedelta(days=1)
         return None
 
 
@@ -81,24 +156,112 @@ class ExerciseRecord(models.Model):
         help_text="Rate how difficult this exercise felt (1=Very Easy, 10=Failure)",
     )
     notes = models.TextField(blank=True, null=True)
+    client_id = models.UUIDField(
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Identifier generated by an offline client, used to deduplicate syncs",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Weight in grams × reps × sets, an exact integer the database can sum
+    volume_g = models.GeneratedField(
+        expression=Cast(Round(models.F("weight_kg") * 1000), models.IntegerField())
+        * models.F("reps")
+        * models.F("sets"),
+        output_field=models.PositiveBigIntegerField(),
+        db_persist=True,
+    )
+
+    objects = AnalyticsQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
+        # Session totals are summed from the index alone
+        indexes = [models.Index(fields=["workout_session", "volume_g"])]
 
     def __str__(self):
         return f"{self.exercise.name} - {self.weight_kg}kg x {self.reps} ({self.sets} sets)"
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        # Cached pages of the session are validated against its updated_at
+        WorkoutSession.objects.filter(pk=self.workout_session_id).touch()
+        publish_sessions_changed([self.workout_session_id])
+        if adding:
+            FeedEntry.objects.records_added(self.workout_session.user_id, [self])
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        WorkoutSession.objects.filter(pk=self.workout_session_id).touch()
+        publish_sessions_changed([self.workout_session_id])
+        return result
+
     @property
     def total_volume(self):
-        """Calculate total volume (weight × reps × sets)"""
-        return float(self.weight_kg) * self.reps * self.sets
+        """
+        Calculate total volume (weight × reps × sets) in kg, like volume_g but
+        also for changes that aren't saved yet
+        """
+        return round(self.weight_kg * 1000) * self.reps * self.sets / 1000
+
+
+class ExerciseRecommendation(models.Model):
+    """
+    The weight to use next time for an exercise, precomputed from the user's
+    recent sessions, see workouts.recommendations
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="exercise_recommendations"
+    )
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name="+")
+    recommended_weight_kg = models.DecimalField(max_digits=5, decimal_places=2)
+    last_weight_kg = models.DecimalField(max_digits=5, decimal_places=2)
+    last_difficulty = models.IntegerField(choices=ExerciseRecord.DIFFICULTY_CHOICES)
+    session_count = models.PositiveIntegerField(
+        help_text="Number of recent sessions the recommendation is based on"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ["user", "exercise"]
+
+    def __str__(self):
+        return f"{self.exercise} for {self.user}: {self.recommended_weight_kg}kg"
+
+
+class Gym(models.Model):
+    """A gym location, whose members' workouts can have a database of their own"""
+
+    name = models.CharField(max_length=100, unique=True)
+    slug = models.SlugField(
+        unique=True,
+        help_text="Gets its own database when listed in GYM_SHARDS, see workouts.shards",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
 
 
 class UserProfile(models.Model):
     """Extended user profile for gym tracker specific settings"""
 
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
+    gym = models.ForeignKey(
+        Gym,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="members",
+        help_text="Takes effect at the next login, existing workouts are not moved",
+    )
     name = models.CharField(
         max_length=100,
         blank=True,
@@ -125,3 +288,118 @@ class UserProfile(models.Model):
     def display_name(self):
         """Get the user's display name, falling back to email if no name is set"""
         return self.name.strip() if self.name and self.name.strip() else self.user.email
+
+
+class FeedEntryQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """The user's feed, newest first"""
+        return self.filter(recipient=user).order_by("-created_at")
+
+    def recipient_ids(self, actor_id):
+        """Users who follow the actor's activity: whoever they train with"""
+        return list(
+            UserProfile.objects.filter(user_id=actor_id)
+            .exclude(default_workout_partner=None)
+            .values_list("default_workout_partner_id", flat=True)
+        )
+
+    def records_added(self, actor_id, records):
+        """Announce exercise records the actor logged"""
+        self.fan_out(
+            actor_id,
+            [
+                FeedEntry(
+                    workout_session_id=record.workout_session_id,
+                    kind=FeedEntry.RECORD_ADDED,
+                    summary=(
+                        f"{record.exercise.name} "
+                        f"{weight_format(record.weight_kg) or 0}kg × {record.reps}"
+                        + (f" ({record.sets} sets)" if record.sets > 1 else "")
+                    ),
+                )
+                for record in records
+            ],
+        )
+
+    def session_completed(self, session):
+        self.fan_out(
+            session.user_id,
+            [
+                FeedEntry(
+                    workout_session=session,
+                    kind=FeedEntry.SESSION_COMPLETED,
+                    summary="completed a workout",
+                )
+            ],
+        )
+
+    def fan_out(self, actor_id, entries):
+        """
+        Copy entries into the feed of everyone following the actor.
+
+        Feeds are written when the activity happens, so showing one is a
+        single index range read instead of a scan of several users' history.
+        Every feed keeps its newest ``FEED_MAX_ENTRIES`` entries.
+        """
+        if not entries:
+            return
+        recipient_ids = self.recipient_ids(actor_id)
+        self.bulk_create(
+            FeedEntry(
+                recipient_id=recipient_id,
+                actor_id=actor_id,
+                workout_session_id=entry.workout_session_id,
+                kind=entry.kind,
+                summary=entry.summary,
+            )
+            for recipient_id in recipient_ids
+            for entry in entries
+        )
+        for recipient_id in recipient_ids:
+            self.trim(recipient_id)
+
+    def trim(self, recipient_id, max_entries=None):
+        """Drop all but the newest entries of a feed"""
+        if max_entries is None:
+            max_entries = settings.FEED_MAX_ENTRIES
+        oldest_kept = (
+            self.filter(recipient_id=recipient_id)
+            .order_by("-created_at")
+            .values("created_at")[max_entries - 1 : max_entries]
+        )
+        # Deletes nothing while the feed has fewer entries (NULL cutoff)
+        return self.filter(
+            recipient_id=recipient_id, created_at__lt=models.Subquery(oldest_kept)
+        ).delete()
+
+
+class FeedEntry(models.Model):
+    """Something a workout partner did, in the feed of one user"""
+
+    RECORD_ADDED = "record_added"
+    SESSION_COMPLETED = "session_completed"
+    KIND_CHOICES = [
+        (RECORD_ADDED, "Exercise logged"),
+        (SESSION_COMPLETED, "Workout completed"),
+    ]
+
+    recipient = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="feed_entries"
+    )
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    workout_session = models.ForeignKey(
+        WorkoutSession, on_delete=models.CASCADE, related_name="+"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    summary = models.CharField(max_length=200)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = FeedEntryQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name_plural = "feed entries"
+        indexes = [models.Index(fields=["recipient", "-created_at"])]
+
+    def __str__(self):
+        return f"{self.actor} for {self.recipient}: {self.summary}"
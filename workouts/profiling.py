@@ -0,0 +1,107 @@
+"""
+Sampling profiler for single requests.
+
+A background thread samples the stack of the profiled thread at a fixed
+interval and counts identical stacks. The result is written in the collapsed
+stack format read by flamegraph.pl, inferno and speedscope: one line per stack,
+frames separated by semicolons, followed by the sample count. Samples taken
+while a query runs get the normalized SQL as an extra leaf frame, so database
+time shows up per query in the flame graph.
+"""
+
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+from .slow_queries import normalize_sql
+
+_PREFIXES = sorted(
+    {
+        str(Path(settings.BASE_DIR).resolve()),
+        *(sysconfig.get_paths()[key] for key in ("purelib", "platlib", "stdlib")),
+    },
+    key=len,
+    reverse=True,
+)
+
+
+def _frame_name(code):
+    filename = code.co_filename
+    for prefix in _PREFIXES:
+        if filename.startswith(prefix):
+            filename = filename[len(prefix) :].lstrip("/")
+            break
+    # Semicolons separate frames in the collapsed format
+    return f"{code.co_qualname} ({filename})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Profile the calling thread while used as a context manager"""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.queries = []
+        self.current_sql = None
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+        self._wrappers = ExitStack()
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        for connection in connections.all():
+            self._wrappers.enter_context(connection.execute_wrapper(self._sql))
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+        self._wrappers.close()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        names = []
+        while frame is not None:
+            names.append(_frame_name(frame.f_code))
+            frame = frame.f_back
+        names.reverse()
+        if sql := self.current_sql:
+            names.append(f"[sql] {sql}")
+        self.stacks[";".join(names)] += 1
+
+    def _sql(self, execute, sql, params, many, context):
+        self.current_sql = normalize_sql(sql)[:200].rstrip().replace(";", ":")
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((time.perf_counter() - start, sql))
+            self.current_sql = None
+
+    def collapsed(self):
+        """The profile in collapsed stack format"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+    def sql_summary(self):
+        """Queries of the profiled code, slowest first"""
+        total = sum(duration for duration, _ in self.queries)
+        lines = [f"{len(self.queries)} queries, {total * 1000:.1f} ms"]
+        for duration, sql in sorted(self.queries, reverse=True):
+            lines.append(f"{duration * 1000:8.2f} ms  {sql}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,148 @@
+"""
+Weight recommendations for the next session of an exercise.
+
+Every session in which the user did an exercise is reduced to its top set, the
+heaviest weight lifted, and how hard that felt. The weight the session points
+to next is that weight one ``WEIGHT_INCREMENT`` up if it was easy (difficulty
+up to 5), the same if it was hard (6 or 7), and one increment down if it was
+harder. The recommendation is a linear trend fitted through those targets of
+the last ``RECOMMENDATION_SESSIONS`` sessions, so steady progress carries on
+while a single bad or easy day moves it less than a run of them. It is rounded
+to whole increments from the last weight, and never moves more than one
+increment at a time. With one or two sessions it is the target of the last.
+
+Fitting the trend takes the user's recent history of an exercise, so it is
+not done while a page is shown, nor for every set logged.
+``update_recommendations()`` stores the result per user and exercise when a
+workout is completed, and once per batch of records synced from the offline
+client. The ``update_recommendations`` command does it for everyone, and
+migration 0010 did it for the records logged before there were stored
+recommendations.
+"""
+
+from decimal import ROUND_HALF_DOWN, Decimal
+
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import DenseRank
+
+from .models import ExerciseRecommendation, ExerciseRecord
+
+WEIGHT_INCREMENT = Decimal("2.5")
+
+
+def difficulty_step(difficulty):
+    """Increments to change the weight by after a set of this difficulty"""
+    if difficulty <= 5:
+        return 1
+    if difficulty <= 7:
+        return 0
+    return -1
+
+
+def recommend_weight(top_sets):
+    """
+    The weight to use next, from the ``(weight_kg, difficulty)`` top sets of
+    recent sessions, oldest first
+    """
+    if not top_sets:
+        return Decimal("0")
+    targets = [
+        weight + difficulty_step(difficulty) * WEIGHT_INCREMENT
+        for weight, difficulty in top_sets
+    ]
+    # Least squares line through the targets, read off at the newest session
+    n = len(targets)
+    mean_x = Decimal(n - 1) / 2
+    mean_y = sum(targets) / n
+    variance = sum((x - mean_x) ** 2 for x in range(n))
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(targets))
+    trend = mean_y + (covariance / variance if variance else 0) * (n - 1 - mean_x)
+
+    last_weight = top_sets[-1][0]
+    steps = ((trend - last_weight) / WEIGHT_INCREMENT).quantize(
+        Decimal("1"), rounding=ROUND_HALF_DOWN
+    )
+    steps = max(-1, min(1, steps))
+    return max(Decimal("0"), last_weight + steps * WEIGHT_INCREMENT)
+
+
+def recent_top_sets(user, sessions=None, exercise_ids=None):
+    """
+    The top sets of the user's last sessions of every exercise, or of these
+    exercises, as ``{exercise_id: [(weight_kg, difficulty), ...]}`` oldest first
+    """
+    if sessions is None:
+        sessions = settings.RECOMMENDATION_SESSIONS
+    records = ExerciseRecord.objects.filter(workout_session__user=user)
+    if exercise_ids is not None:
+        records = records.filter(exercise_id__in=exercise_ids)
+    records = (
+        records.annotate(
+            session_number=Window(
+                DenseRank(),
+                partition_by="exercise_id",
+                order_by=[
+                    F("workout_session__date").desc(),
+                    F("workout_session_id").desc(),
+                ],
+            )
+        )
+        .filter(session_number__lte=sessions)
+        .order_by("exercise_id", "session_number", "-weight_kg", "-created_at")
+        .values_list(
+            "exercise_id",
+            "workout_session_id",
+            "weight_kg",
+            "difficulty_rating",
+        )
+    )
+    top_sets = {}
+    seen = set()
+    for exercise_id, session_id, weight, difficulty in records:
+        # The first record of a session is its heaviest
+        if (exercise_id, session_id) not in seen:
+            seen.add((exercise_id, session_id))
+            top_sets.setdefault(exercise_id, []).insert(0, (weight, difficulty))
+    return top_sets
+
+
+def update_recommendations(user, exercise_ids=None):
+    """
+    Store the recommendation of the user, or user id, for every exercise they
+    did, or only for these exercises
+    """
+    user_id = getattr(user, "pk", user)
+    new = [
+        ExerciseRecommendation(
+            user_id=user_id,
+            exercise_id=exercise_id,
+            recommended_weight_kg=recommend_weight(top_sets),
+            last_weight_kg=top_sets[-1][0],
+            last_difficulty=top_sets[-1][1],
+            session_count=len(top_sets),
+        )
+        for exercise_id, top_sets in recent_top_sets(
+            user_id, exercise_ids=exercise_ids
+        ).items()
+    ]
+    ExerciseRecommendation.objects.bulk_create(
+        new,
+        update_conflicts=True,
+        unique_fields=["user", "exercise"],
+        update_fields=[
+            "recommended_weight_kg",
+            "last_weight_kg",
+            "last_difficulty",
+            "session_count",
+            "updated_at",
+        ],
+    )
+    # Exercises whose records were all deleted since
+    stale = ExerciseRecommendation.objects.filter(user_id=user_id).exclude(
+        exercise_id__in=[r.exercise_id for r in new]
+    )
+    if exercise_ids is not None:
+        stale = stale.filter(exercise_id__in=exercise_ids)
+    stale.delete()
+    return new
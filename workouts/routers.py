@@ -0,0 +1,92 @@
+"""
+Database routing.
+
+The ``analytics`` alias is a second, read-only connection (``mode=ro``) to the
+same SQLite database. With the database in WAL mode its long reporting queries
+read from a snapshot and never hold a lock that makes a writer wait. Querysets
+opt in with ``for_analytics()``; everything else, and every write, uses the
+primary connection, so a request always reads its own writes.
+
+The ``archive`` alias is a read-only connection that also sees the workout
+sessions and exercise records moved to the yearly archives, see
+``workouts.archive``. Querysets opt in with ``with_archives()``.
+
+With ``GYM_SHARDS`` set, ``TenantRouter`` sends the workouts of a gym's
+members to the gym's own database, see ``workouts.shards``. Analytics reads
+then run on that database too, and so do archive reads, which don't see the
+archives yet. Other queries that join the sharded tables, such as users with
+their workout sessions, pick it with ``using(router.db_for_read(...))`` of a
+sharded model.
+"""
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .shards import SHARDED_MODELS, current_shard, shard_aliases
+
+ANALYTICS_DB_ALIAS = "analytics"
+ARCHIVE_DB_ALIAS = "archive"
+
+
+def analytics_database():
+    """Alias to run analytics reads on, the primary if there is no replica"""
+    if shard := current_shard():
+        return shard
+    if ANALYTICS_DB_ALIAS not in connections:
+        return DEFAULT_DB_ALIAS
+    # Under test the alias is a mirror with the primary's settings; reading
+    # through the primary keeps the rows of the test transaction visible
+    name = connections[ANALYTICS_DB_ALIAS].settings_dict["NAME"]
+    if name == connections[DEFAULT_DB_ALIAS].settings_dict["NAME"]:
+        return DEFAULT_DB_ALIAS
+    return ANALYTICS_DB_ALIAS
+
+
+def archive_database():
+    """Alias to run reads that include archived rows on"""
+    return current_shard() or ARCHIVE_DB_ALIAS
+
+
+def _is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+class TenantRouter:
+    """
+    Send the reads and writes of the sharded models to the current gym's
+    database. Everything else falls through to AnalyticsRouter and the
+    primary; the shard's attached catalog doesn't see what the primary
+    connection hasn't committed yet.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _is_sharded(model):
+            return None
+        return current_shard()
+
+    def db_for_write(self, model, **hints):
+        if not _is_sharded(model):
+            return None
+        # Rows read from a gym's database are saved back to it
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db in shard_aliases():
+            return instance._state.db
+        return current_shard()
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db not in shard_aliases():
+            return None
+        return model_name is not None and f"{app_label}.{model_name}" in SHARDED_MODELS
+
+
+class AnalyticsRouter:
+    """Send all writes to the primary, including of rows read for analytics"""
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # All aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,128 @@
+"""
+Per-gym database shards.
+
+One deployment can serve several gyms without all of them sharing one ever
+growing database file and its single write lock. Every gym whose slug is
+listed in ``GYM_SHARDS`` gets a database file of its own in ``GYM_SHARD_DIR``,
+with the alias ``gym_<slug>``. It holds the workout sessions, exercise
+records, feed entries and recommendations of the members of that gym. Users
+without a gym, or with one that isn't listed, keep theirs in the default
+database.
+
+Everything else, such as users, profiles, gyms, exercises and login sessions,
+is the global catalog in the default database. Every shard connection
+attaches it read-only as ``catalog``. SQLite looks up tables the shard doesn't
+have there, so queries that join workouts to users or exercises run on the
+shard unchanged. SQLite can't enforce foreign keys into another database file,
+so shard connections don't enforce them; Django applies ``on_delete`` itself,
+but only within one database. ``delete_from_shards()`` deletes the rows of a
+deleted user from every shard. Exercises and gyms are not cascaded into the
+shards.
+
+``GymMiddleware`` selects the shard of the logged in user for the request.
+``TenantRouter`` then sends the reads and writes of the sharded models there.
+Code that runs outside a request uses the default database unless it is
+wrapped in ``use_gym()``. The ``shards`` command does that to run a command,
+or the migrations, on every shard.
+
+Archiving (see workouts.archive) only covers the default database so far.
+"""
+
+import contextlib
+import contextvars
+from pathlib import Path
+
+from django.conf import settings
+
+# Models whose rows live in the shard of their user's gym
+SHARDED_MODELS = {
+    "workouts.workoutsession",
+    "workouts.exerciserecord",
+    "workouts.feedentry",
+    "workouts.exerciserecommendation",
+}
+
+# The user's gym is looked up at login, not on every request
+GYM_SESSION_KEY = "_gym"
+
+_current_gym = contextvars.ContextVar("current_gym", default=None)
+
+
+def shard_alias(slug):
+    return f"gym_{slug}"
+
+
+def shard_aliases():
+    return {shard_alias(slug) for slug in settings.GYM_SHARDS}
+
+
+def current_shard():
+    """Alias of the current gym's database, None for the default database"""
+    slug = _current_gym.get()
+    if slug in settings.GYM_SHARDS:
+        return shard_alias(slug)
+    return None
+
+
+def set_gym(slug):
+    """Select the gym for the rest of the context, undone by ``reset_gym()``"""
+    return _current_gym.set(slug)
+
+
+def reset_gym(token):
+    _current_gym.reset(token)
+
+
+@contextlib.contextmanager
+def use_gym(slug):
+    """Run queries on the database of this gym"""
+    token = _current_gym.set(slug)
+    try:
+        yield
+    finally:
+        _current_gym.reset(token)
+
+
+def gym_of(user):
+    """Slug of the user's gym, or None"""
+    from .models import UserProfile
+
+    return (
+        UserProfile.objects.filter(user=user)
+        .values_list("gym__slug", flat=True)
+        .first()
+    )
+
+
+def remember_gym(sender, request, user, **kwargs):
+    """user_logged_in receiver that keeps the user's gym in the session"""
+    if settings.GYM_SHARDS:
+        request.session[GYM_SESSION_KEY] = gym_of(user)
+
+
+def delete_from_shards(sender, instance, **kwargs):
+    """
+    post_delete receiver for users that deletes their rows from every gym's
+    database, where the cascade from the catalog doesn't reach
+    """
+    from .models import ExerciseRecommendation, FeedEntry, WorkoutSession
+
+    for alias in sorted(shard_aliases()):
+        # Takes their exercise records and the feed entries about them along
+        WorkoutSession.objects.using(alias).filter(user_id=instance.pk).delete()
+        FeedEntry.objects.using(alias).filter(recipient_id=instance.pk).delete()
+        FeedEntry.objects.using(alias).filter(actor_id=instance.pk).delete()
+        ExerciseRecommendation.objects.using(alias).filter(user_id=instance.pk).delete()
+
+
+def attach_catalog(sender, connection, **kwargs):
+    """connection_created receiver that lets shard connections read the global
+    catalog"""
+    catalog = connection.settings_dict.get("CATALOG")
+    if catalog is None:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA foreign_keys = OFF")
+        cursor.execute(
+            "ATTACH DATABASE %s AS catalog", [f"{Path(catalog).as_uri()}?mode=ro"]
+        )
@@ -0,0 +1,115 @@
+"""
+Slow query log.
+
+Every database connection gets an execute wrapper that times each query.
+Queries slower than ``SLOW_QUERY_THRESHOLD_MS`` are logged as one JSON object
+per line on the ``gymtracker.slow_queries`` logger, together with the shape of
+their parameters, the URL name of the request, the template line being rendered
+and the innermost project source line that issued them. The
+``slow_query_report`` command ranks the logged queries.
+"""
+
+import datetime
+import json
+import logging
+import re
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from . import instrumentation
+
+logger = logging.getLogger("gymtracker.slow_queries")
+
+_PROJECT_DIR = str(Path(settings.BASE_DIR).resolve())
+# The execute wrappers themselves are never the interesting caller
+_WRAPPER_FILES = {__file__, instrumentation.__file__}
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    """Database execute wrapper logging queries above the threshold"""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+            _log_slow_query(sql, params, many, context, duration_ms)
+
+
+def install_slow_query_wrapper(sender, connection, **kwargs):
+    """connection_created receiver that adds the slow query wrapper"""
+    if slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
+
+
+def _log_slow_query(sql, params, many, context, duration_ms):
+    stats = instrumentation.current_stats()
+    template, source = _find_origin(sys._getframe(2))
+    logger.warning(
+        json.dumps(
+            {
+                "time": datetime.datetime.now(datetime.UTC).isoformat(),
+                "duration_ms": round(duration_ms, 2),
+                "database": context["connection"].alias,
+                "sql": sql,
+                "params": params_shape(params, many),
+                "view": stats.url_name if stats else None,
+                "template": template,
+                "source": source,
+            }
+        )
+    )
+
+
+def params_shape(params, many=False):
+    """Describe query parameters by type, without leaking their values"""
+    if params is None:
+        return None
+    if many:
+        rows = list(params)
+        return {"rows": len(rows), "row": params_shape(rows[0]) if rows else None}
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def _find_origin(frame):
+    """Innermost template line and project source line on the stack"""
+    template = source = None
+    while frame and not (template and source):
+        code = frame.f_code
+        if template is None and code.co_name == "render_annotated":
+            # django.template.base.Node.render_annotated of the innermost node
+            node = frame.f_locals.get("self")
+            token = getattr(node, "token", None)
+            origin = getattr(node, "origin", None)
+            if token is not None and origin is not None:
+                template = f"{origin.template_name}:{token.lineno}"
+        elif (
+            source is None
+            and code.co_filename.startswith(_PROJECT_DIR)
+            and "site-packages" not in code.co_filename
+            and code.co_filename not in _WRAPPER_FILES
+        ):
+            path = code.co_filename.removeprefix(_PROJECT_DIR).lstrip("/")
+            source = f"{path}:{frame.f_lineno} in {code.co_name}"
+        frame = frame.f_back
+    return template, source
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Replace literals and IN lists so similar queries group together"""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _PLACEHOLDER_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
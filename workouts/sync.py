@@ -0,0 +1,217 @@
+"""
+Batch synchronisation for the offline client.
+
+The offline client queues workout sessions and exercise records locally while
+the gym has no connectivity and sends them in one request once it is back
+online. Every operation carries a client generated UUID, so replaying a batch
+(for example after a dropped response) never creates duplicates.
+"""
+
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, router, transaction
+
+from .events import publish_sessions_changed
+from .forms import SyncExerciseRecordForm, SyncWorkoutSessionForm
+from .models import Exercise, ExerciseRecord, FeedEntry, WorkoutSession
+from .recommendations import update_recommendations
+
+# Roughly a week of heavy training; larger batches should be split client side
+MAX_SYNC_OPERATIONS = 500
+
+
+def _parse_client_id(value):
+    try:
+        return uuid.UUID(str(value))
+    except (TypeError, ValueError, AttributeError):
+        raise ValidationError(f"Invalid client_id: {value!r}")
+
+
+def _parse_id(value, kind):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValidationError(f"Invalid {kind} id: {value!r}")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError(f"Invalid {kind} id: {value!r}")
+
+
+def _form_error(kind, client_id, form):
+    errors = "; ".join(
+        f"{field}: {' '.join(messages)}" for field, messages in form.errors.items()
+    )
+    return ValidationError(f"Invalid {kind} {client_id}: {errors}")
+
+
+def apply_sync_batch(user, payload):
+    """
+    Apply a batch of offline operations for ``user`` in a single transaction.
+
+    ``payload`` is a dict with optional ``sessions`` and ``records`` lists.
+    Session operations create a new workout session identified by its
+    ``client_id``. Record operations reference their session either by server
+    id (``session``) or by the client id of a session in the same or an
+    earlier batch (``session_client_id``).
+
+    Returns the server ids of the objects created by this call, keyed by client
+    id, and the error of every operation that was rejected. Those are left out,
+    the rest of the batch is applied, so one bad operation doesn't hold up the
+    others forever. Operations that were already applied by an earlier sync
+    are skipped and not included. Raises ``ValidationError`` if the payload
+    itself is malformed, in which case nothing is written.
+    """
+    if not isinstance(payload, dict):
+        raise ValidationError("Sync payload must be an object")
+
+    session_ops = payload.get("sessions") or []
+    record_ops = payload.get("records") or []
+    if not isinstance(session_ops, list) or not isinstance(record_ops, list):
+        raise ValidationError("'sessions' and 'records' must be lists")
+    if len(session_ops) + len(record_ops) > MAX_SYNC_OPERATIONS:
+        raise ValidationError(
+            f"Too many operations in one batch (max {MAX_SYNC_OPERATIONS})"
+        )
+    if not all(isinstance(op, dict) for op in session_ops + record_ops):
+        raise ValidationError("Every operation must be an object")
+
+    rejected = {}
+
+    def reject(op, error):
+        rejected[str(op.get("client_id"))] = " ".join(error.messages)
+
+    sessions = []
+    for op in session_ops:
+        try:
+            sessions.append((_parse_client_id(op.get("client_id")), op))
+        except ValidationError as e:
+            reject(op, e)
+    records = []
+    for op in record_ops:
+        try:
+            records.append(
+                (
+                    _parse_client_id(op.get("client_id")),
+                    _parse_id(op.get("session"), "session"),
+                    _parse_id(op.get("exercise"), "exercise"),
+                    _parse_client_id(op["session_client_id"])
+                    if op.get("session_client_id")
+                    else None,
+                    op,
+                )
+            )
+        except ValidationError as e:
+            reject(op, e)
+
+    try:
+        with transaction.atomic(using=router.db_for_write(WorkoutSession)):
+            changes = _apply(user, sessions, records, reject)
+    except IntegrityError:
+        # Another request synced the same client id since it was checked
+        raise ValidationError("Conflicting concurrent sync, try again")
+    changes["rejected"] = rejected
+    return changes
+
+
+def _apply(user, sessions, records, reject):
+    # Client ids are unique across users, so look them up for everyone, and
+    # reject those of another user's sessions instead of failing the insert.
+    # Records may point at sessions synced in an earlier batch.
+    referenced = {session_client_id for *_, session_client_id, _ in records}
+    session_rows = WorkoutSession.objects.filter(
+        client_id__in={client_id for client_id, _ in sessions} | referenced - {None}
+    ).values_list("client_id", "user_id", "pk")
+    session_owners = {client_id: owner for client_id, owner, _ in session_rows}
+    known_sessions = {
+        client_id: pk for client_id, owner, pk in session_rows if owner == user.pk
+    }
+
+    new_sessions = []
+    for client_id, op in sessions:
+        if client_id in known_sessions:
+            continue
+        if client_id in session_owners:
+            reject(op, ValidationError(f"Session {client_id} is already in use"))
+            continue
+        form = SyncWorkoutSessionForm(op)
+        if not form.is_valid():
+            reject(op, _form_error("session", client_id, form))
+            continue
+        session = form.save(commit=False)
+        session.user = user
+        session.client_id = client_id
+        if form.cleaned_data["start_time"]:
+            # Keep the time the client recorded offline, not the time of sync
+            session.start_time = form.cleaned_data["start_time"]
+        new_sessions.append(session)
+        # Reserve the client id so a duplicate within the batch is skipped
+        known_sessions[client_id] = None
+
+    WorkoutSession.objects.bulk_create(new_sessions)
+    for session in new_sessions:
+        known_sessions[session.client_id] = session.pk
+
+    server_session_ids = set(
+        WorkoutSession.objects.filter(
+            user=user,
+            pk__in={session_id for _, session_id, *_ in records if session_id},
+        ).values_list("pk", flat=True)
+    )
+    exercises = Exercise.objects.in_bulk(
+        {exercise_id for _, _, exercise_id, *_ in records if exercise_id}
+    )
+    record_owners = dict(
+        ExerciseRecord.objects.filter(
+            client_id__in=[client_id for client_id, *_ in records]
+        ).values_list("client_id", "workout_session__user_id")
+    )
+
+    new_records = []
+    for client_id, session_id, exercise_id, session_client_id, op in records:
+        if client_id in record_owners:
+            if record_owners[client_id] != user.pk:
+                reject(op, ValidationError(f"Record {client_id} is already in use"))
+            continue
+        if session_client_id:
+            session_id = known_sessions.get(session_client_id)
+        elif session_id not in server_session_ids:
+            session_id = None
+        if session_id is None:
+            reject(op, ValidationError(f"Record {client_id} has an unknown session"))
+            continue
+
+        exercise = exercises.get(exercise_id)
+        if exercise is None:
+            reject(op, ValidationError(f"Record {client_id} has an unknown exercise"))
+            continue
+
+        form = SyncExerciseRecordForm(op)
+        if not form.is_valid():
+            reject(op, _form_error("record", client_id, form))
+            continue
+        record = form.save(commit=False)
+        record.workout_session_id = session_id
+        record.exercise = exercise
+        record.client_id = client_id
+        new_records.append(record)
+        record_owners[client_id] = user.pk
+
+    ExerciseRecord.objects.bulk_create(new_records)
+    if new_records:
+        # bulk_create skips ExerciseRecord.save(), which touches the session
+        session_ids = {r.workout_session_id for r in new_records}
+        WorkoutSession.objects.filter(pk__in=session_ids).touch()
+        publish_sessions_changed(session_ids)
+    FeedEntry.objects.records_added(user.pk, new_records)
+    for session in new_sessions:
+        if session.is_completed:
+            FeedEntry.objects.session_completed(session)
+    if new_records:
+        update_recommendations(user, {r.exercise_id for r in new_records})
+
+    return {
+        "sessions": {str(s.client_id): s.pk for s in new_sessions},
+        "records": {str(r.client_id): r.pk for r in new_records},
+    }
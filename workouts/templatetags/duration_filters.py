@@ -8,13 +8,17 @@ register = template.Library()
 @register.filter
 def duration_format(duration):
     """
-    Format a timedelta object as H:MM (e.g., 2:37)
+    Format a timedelta object, or a number of seconds such as
+    WorkoutSession.duration_seconds, as H:MM (e.g., 2:37)
     """
     if not duration:
         return ""
 
-    if isinstance(duration, timedelta):
-        total_seconds = int(duration.total_seconds())
+    if isinstance(duration, (timedelta, int)):
+        if isinstance(duration, timedelta):
+            total_seconds = int(duration.total_seconds())
+        else:
+            total_seconds = duration
         hours = total_seconds // 3600
         minutes = (total_seconds % 3600) // 60
 
@@ -0,0 +1,109 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Exercise, ExerciseRecord, WorkoutSession
+
+User = get_user_model()
+
+
+class AdminChangeListTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", username="admin", password="testpass123"
+        )
+        self.client.force_login(self.admin)
+        self.exercises = [
+            Exercise.objects.create(name="Bench Press"),
+            Exercise.objects.create(name="Squat"),
+        ]
+        self.users = []
+        self.sessions = 0
+
+    def add_workouts(self, count):
+        for _ in range(count):
+            user = User.objects.create(
+                email=f"user{self.sessions}@example.com",
+                username=f"user{self.sessions}",
+            )
+            self.users.append(user)
+            workout = WorkoutSession.objects.create(
+                user=user, date=date.today() - timedelta(days=self.sessions)
+            )
+            self.sessions += 1
+            for exercise in self.exercises:
+                ExerciseRecord.objects.create(
+                    workout_session=workout,
+                    exercise=exercise,
+                    weight_kg=Decimal("50.00"),
+                    reps=10,
+                    sets=3,
+                    difficulty_rating=6,
+                )
+
+    def queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url, params=None):
+        self.add_workouts(2)
+        few = self.queries(url, params)
+        self.add_workouts(8)
+        self.assertEqual(self.queries(url, params), few)
+
+    def test_workout_sessions_in_constant_queries(self):
+        url = reverse("admin:workouts_workoutsession_changelist")
+        self.assertConstantQueries(url)
+        response = self.client.get(url)
+        self.assertEqual(
+            [w.exercise_count for w in response.context["cl"].result_list],
+            [2] * 10,
+        )
+        # No user list in the sidebar, and no count of all sessions
+        self.assertNotContains(response, "user9@example.com")
+        self.assertNotContains(response, "10 total")
+
+    def test_exercise_records_in_constant_queries(self):
+        url = reverse("admin:workouts_exerciserecord_changelist")
+        self.assertConstantQueries(url)
+        response = self.client.get(url)
+        self.assertContains(response, "1500")
+
+    def test_filters_in_constant_queries(self):
+        self.assertConstantQueries(
+            reverse("admin:workouts_exerciserecord_changelist"),
+            {"exercise": self.exercises[0].pk},
+        )
+
+    def test_autocomplete_filters(self):
+        self.add_workouts(3)
+        url = reverse("admin:workouts_exerciserecord_changelist")
+        response = self.client.get(
+            url,
+            {
+                "exercise": self.exercises[1].pk,
+                "user": self.users[0].pk,
+            },
+        )
+        records = response.context["cl"].result_list
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0].exercise, self.exercises[1])
+        # The picked values are shown in the widgets
+        self.assertContains(
+            response, f'<option value="{self.users[0].pk}" selected>', html=False
+        )
+
+        url = reverse("admin:workouts_workoutsession_changelist")
+        response = self.client.get(url, {"user": self.users[2].pk})
+        self.assertEqual(
+            [w.user for w in response.context["cl"].result_list], [self.users[2]]
+        )
+        response = self.client.get(url, {"user": "nobody"})
+        self.assertRedirects(response, f"{url}?e=1")
@@ -0,0 +1,171 @@
+import io
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from . import archive
+from .models import Exercise, ExerciseRecord, FeedEntry, UserProfile, WorkoutSession
+
+User = get_user_model()
+
+
+class ArchiveTestCase(TransactionTestCase):
+    """
+    Attaching an archive isn't possible inside a transaction, so these tests
+    commit for real.
+    """
+
+    databases = {"default", "archive"}
+
+    def setUp(self):
+        settings_override = override_settings(ARCHIVE_DIR=tempfile.mkdtemp())
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Don't leave the next test with archives from this test's directory
+        self.addCleanup(archive.reattach_archives)
+
+        self.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        self.exercise = Exercise.objects.create(name="Bench Press")
+        self.today = date.today()
+
+    def create_workout(self, day, records=1, user=None):
+        workout = WorkoutSession.objects.create(user=user or self.user, date=day)
+        for reps in range(records):
+            ExerciseRecord.objects.create(
+                workout_session=workout,
+                exercise=self.exercise,
+                weight_kg=Decimal("60.00"),
+                reps=reps + 1,
+                difficulty_rating=6,
+            )
+        return workout
+
+
+class ArchiveSessionsTests(ArchiveTestCase):
+    def test_moves_old_sessions_with_their_records(self):
+        old = self.create_workout(date(2023, 3, 1), records=2)
+        older = self.create_workout(date(2022, 12, 31), records=1)
+        recent = self.create_workout(self.today, records=3)
+
+        moved = archive.archive_sessions(self.today - timedelta(days=365))
+
+        self.assertEqual(moved, {2022: 1, 2023: 1})
+        self.assertEqual(archive.archive_years(), [2022, 2023])
+        self.assertQuerySetEqual(WorkoutSession.objects.all(), [recent])
+        self.assertEqual(ExerciseRecord.objects.count(), 3)
+
+        archived = WorkoutSession.objects.with_archives().order_by("date")
+        self.assertEqual([w.pk for w in archived], [older.pk, old.pk, recent.pk])
+        workout = archived.get(pk=old.pk)
+        self.assertEqual(workout.date, old.date)
+        self.assertEqual(workout.user, self.user)
+        records = workout.exercise_records.order_by("reps")
+        self.assertEqual([r.reps for r in records], [1, 2])
+        self.assertEqual(records[0].weight_kg, Decimal("60.00"))
+        # Rows that are never archived come from the live tables
+        self.assertEqual(records[0].exercise, self.exercise)
+        self.assertEqual(ExerciseRecord.objects.with_archives().count(), 6)
+
+    def test_moves_in_chunks_and_can_run_again(self):
+        workouts = [self.create_workout(date(2023, 1, day)) for day in range(1, 6)]
+        cutoff = self.today - timedelta(days=365)
+        self.assertEqual(archive.archive_sessions(cutoff, chunk_size=2), {2023: 5})
+        self.assertEqual(archive.archive_sessions(cutoff, chunk_size=2), {})
+
+        # A session copied by a run interrupted before its delete is neither
+        # listed twice nor archived twice
+        workout = self.create_workout(date(2023, 2, 1))
+        with archive.attached_archive(2023), connections["default"].cursor() as c:
+            archive._copy_to_archive(c, [workout.pk])
+        self.assertEqual(WorkoutSession.objects.with_archives().count(), 6)
+
+        self.assertEqual(archive.archive_sessions(cutoff), {2023: 1})
+        self.assertEqual(WorkoutSession.objects.count(), 0)
+        self.assertEqual(
+            sorted(WorkoutSession.objects.with_archives().values_list("pk", flat=True)),
+            [w.pk for w in workouts] + [workout.pk],
+        )
+
+    def test_feed_entries_of_archived_sessions_are_removed(self):
+        partner = User.objects.create_user(
+            email="partner@example.com", username="partner", password="testpass123"
+        )
+        UserProfile.objects.create(user=self.user, default_workout_partner=partner)
+        self.create_workout(date(2023, 3, 1))
+        self.assertEqual(FeedEntry.objects.count(), 1)
+        archive.archive_sessions(self.today - timedelta(days=365))
+        self.assertEqual(FeedEntry.objects.count(), 0)
+
+    def test_command(self):
+        self.create_workout(date(2023, 3, 1))
+        stdout = io.StringIO()
+        call_command("archive_workouts", "--dry-run", stdout=stdout)
+        self.assertIn("Would archive 1 sessions from 2023", stdout.getvalue())
+        self.assertEqual(archive.archive_years(), [])
+
+        call_command("archive_workouts", "--days", "30", stdout=stdout)
+        self.assertIn("Archived 1 sessions from 2023", stdout.getvalue())
+        self.assertEqual(WorkoutSession.objects.count(), 0)
+
+
+class ArchivedViewTests(ArchiveTestCase):
+    def setUp(self):
+        super().setUp()
+        self.archived = [
+            self.create_workout(date(2023, 3, day), records=2) for day in range(1, 8)
+        ]
+        self.recent = [
+            self.create_workout(self.today - timedelta(days=day)) for day in range(6)
+        ]
+        archive.archive_sessions(self.today - timedelta(days=365))
+        self.client.force_login(self.user)
+
+    def test_history_only_shows_live_sessions(self):
+        response = self.client.get(reverse("workouts:workout_history"))
+        self.assertEqual(response.context["paginator"].count, 6)
+
+    def test_history_includes_archived_sessions_when_asked(self):
+        url = reverse("workouts:workout_history")
+        response = self.client.get(url, {"archived": "1"})
+        self.assertEqual(response.context["paginator"].count, 13)
+        # The first page ends with the newest archived sessions
+        self.assertEqual(
+            [w.pk for w in response.context["workouts"]],
+            [w.pk for w in self.recent] + [w.pk for w in self.archived[::-1][:4]],
+        )
+        self.assertContains(response, "?page=2&archived=1")
+
+        response = self.client.get(url, {"archived": "1", "page": "2"})
+        workouts = response.context["workouts"]
+        self.assertEqual(
+            [w.pk for w in workouts], [w.pk for w in self.archived[::-1][4:]]
+        )
+        self.assertEqual([w.exercise_count for w in workouts], [2, 2, 2])
+
+    def test_owner_can_view_archived_session_read_only(self):
+        workout = self.archived[0]
+        response = self.client.get(
+            reverse("workouts:workout_detail", kwargs={"pk": workout.pk})
+        )
+        self.assertContains(response, "Archived")
+        self.assertContains(response, "Bench Press")
+        self.assertNotContains(response, "Complete Workout")
+        self.assertNotContains(response, "data-events-url")
+
+    def test_others_cant_view_archived_session(self):
+        other = User.objects.create_user(
+            email="other@example.com", username="other", password="testpass123"
+        )
+        self.client.force_login(other)
+        response = self.client.get(
+            reverse("workouts:workout_detail", kwargs={"pk": self.archived[0].pk})
+        )
+        self.assertEqual(response.status_code, 404)
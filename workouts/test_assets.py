@@ -0,0 +1,110 @@
+import gzip
+import re
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .assets import IMMUTABLE_CACHE_CONTROL, MUTABLE_CACHE_CONTROL, serve_static
+
+COMPRESSED_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "workouts.assets.CompressedManifestStaticFilesStorage"},
+}
+
+
+@override_settings(STORAGES=COMPRESSED_STORAGES, STATIC_SENDFILE_HEADER=None)
+class CompressedStaticFilesTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        tmp = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(tmp.cleanup)
+        cls.static_root = Path(tmp.name)
+        static_root_override = override_settings(STATIC_ROOT=cls.static_root)
+        static_root_override.enable()
+        cls.addClassCleanup(static_root_override.disable)
+        super().setUpClass()
+        call_command("collectstatic", interactive=False, verbosity=0)
+        cls.css = staticfiles_storage.stored_name("vendor/bootstrap/bootstrap.min.css")
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get(self, path, **headers):
+        request = self.factory.get(f"/static/{path}", headers=headers)
+        response = serve_static(request, path)
+        if response.streaming:
+            # response.close() would fire request_finished, which touches the DB
+            self.addCleanup(response.file_to_stream.close)
+        return response
+
+    def test_collectstatic_writes_precompressed_variants(self):
+        original = (self.static_root / self.css).read_bytes()
+        compressed = (self.static_root / f"{self.css}.gz").read_bytes()
+        self.assertEqual(gzip.decompress(compressed), original)
+        self.assertLess(len(compressed), len(original))
+
+    def test_serves_gzip_when_accepted(self):
+        response = self.get(self.css, accept_encoding="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertEqual(response["Cache-Control"], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        body = b"".join(response.streaming_content)
+        self.assertEqual(
+            gzip.decompress(body), (self.static_root / self.css).read_bytes()
+        )
+
+    def test_serves_identity_without_accept_encoding(self):
+        for accept_encoding in ("", "gzip;q=0"):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.get(self.css, accept_encoding=accept_encoding)
+                self.assertNotIn("Content-Encoding", response)
+
+    def test_unhashed_names_get_short_cache_lifetime(self):
+        response = self.get("vendor/bootstrap/bootstrap.min.css")
+        self.assertEqual(response["Cache-Control"], MUTABLE_CACHE_CONTROL)
+
+    def test_unhashed_names_are_precompressed(self):
+        response = self.get(
+            "vendor/bootstrap/bootstrap.min.css", accept_encoding="gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_not_modified(self):
+        response = self.get(self.css)
+        response = self.get(self.css, if_modified_since=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_sendfile_header(self):
+        with override_settings(
+            STATIC_SENDFILE_HEADER="X-Accel-Redirect",
+            STATIC_SENDFILE_PREFIX="/internal-static/",
+        ):
+            response = self.get(self.css, accept_encoding="gzip")
+        self.assertEqual(
+            response["X-Accel-Redirect"], f"/internal-static/{self.css}.gz"
+        )
+        self.assertEqual(response.content, b"")
+
+    def test_rejects_paths_outside_static_root(self):
+        for path in ("../settings.py", "missing.css"):
+            with self.subTest(path=path):
+                with self.assertRaises(Http404):
+                    self.get(path)
+
+
+class VendoredHtmxTests(SimpleTestCase):
+    """The templates are written for the vendored htmx 1.9"""
+
+    def test_vendored_version(self):
+        htmx = settings.BASE_DIR / "static" / "vendor" / "htmx" / "htmx.js"
+        version = re.search(r'version: "(\d+)\.(\d+)\.(\d+)"', htmx.read_text())
+        major, minor, patch = map(int, version.groups())
+        # hx-on::after-request needs 1.9.3 or later
+        self.assertEqual((major, minor), (1, 9))
+        self.assertGreaterEqual(patch, 3)
@@ -0,0 +1,144 @@
+import datetime
+import gzip
+import io
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from .backup import (
+    WriterStallProbe,
+    backup_database,
+    backup_path,
+    expired_backups,
+)
+
+
+class BackupTestMixin:
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.source = self.directory / "db.sqlite3"
+        connection = sqlite3.connect(self.source)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE record (weight INTEGER, notes TEXT)")
+        connection.executemany(
+            "INSERT INTO record VALUES (?, ?)",
+            [(weight, "x" * 500) for weight in range(1000)],
+        )
+        connection.commit()
+        connection.close()
+        self.backups = self.directory / "backups"
+        self.backups.mkdir()
+
+    def restore(self, path):
+        restored = self.directory / "restored.sqlite3"
+        restored.write_bytes(gzip.decompress(path.read_bytes()))
+        connection = sqlite3.connect(restored)
+        self.addCleanup(connection.close)
+        return connection
+
+
+class BackupDatabaseTests(BackupTestMixin, SimpleTestCase):
+    def test_backup_is_a_compressed_copy(self):
+        path, stats = backup_database(self.source, self.backups, pages=10, sleep=0)
+        self.assertEqual(list(self.backups.iterdir()), [path])
+        connection = self.restore(path)
+        self.assertEqual(
+            connection.execute("SELECT COUNT(*), SUM(weight) FROM record").fetchone(),
+            (1000, sum(range(1000))),
+        )
+        # Restores without the WAL file of the live database
+        self.assertEqual(
+            connection.execute("PRAGMA journal_mode").fetchone(), ("delete",)
+        )
+        self.assertGreater(stats["steps"], 1)
+        self.assertEqual(stats["restarts"], 0)
+        self.assertLess(stats["compressed_size"], stats["size"])
+
+    def test_falls_back_to_one_step_when_writes_keep_restarting(self):
+        writer = sqlite3.connect(self.source, isolation_level=None)
+        self.addCleanup(writer.close)
+
+        def write(seconds):
+            writer.execute("INSERT INTO record VALUES (1, '')")
+
+        with mock.patch("workouts.backup.time.sleep", side_effect=write):
+            path, stats = backup_database(
+                self.source, self.backups, pages=10, max_restarts=2
+            )
+        self.assertEqual(stats["restarts"], 3)
+        count = self.restore(path).execute("SELECT COUNT(*) FROM record").fetchone()
+        self.assertGreater(count[0], 1000)
+
+    def test_command_reports_throughput_and_writer_stall(self):
+        stdout = io.StringIO()
+        with mock.patch.dict(settings.DATABASES["default"], {"NAME": self.source}):
+            call_command(
+                "backup_db", "--output-dir", self.backups, "--sleep", "1", stdout=stdout
+            )
+        output = stdout.getvalue()
+        self.assertRegex(output, r"Copied [\d.]+ MB in [\d.]+ s \([\d.]+ MB/s")
+        self.assertIn("Integrity check passed", output)
+        self.assertRegex(output, r"Longest writer stall: [\d.]+ ms")
+        self.assertEqual(len(list(self.backups.glob("db-*.sqlite3.gz"))), 1)
+
+
+class WriterStallProbeTests(BackupTestMixin, SimpleTestCase):
+    def test_probe_commits_without_changing_the_database(self):
+        connection = sqlite3.connect(self.source)
+        self.addCleanup(connection.close)
+        connection.execute("PRAGMA user_version = 7")
+        wal = self.source.with_name("db.sqlite3-wal")
+        size = wal.stat().st_size
+
+        probe = WriterStallProbe(self.source, interval=0)
+        probe.start()
+        probe.stop()
+        self.assertGreaterEqual(probe.probes, 1)
+        self.assertGreater(probe.max_stall, 0)
+        self.assertGreater(wal.stat().st_size, size)
+        self.assertEqual(connection.execute("PRAGMA user_version").fetchone(), (7,))
+
+
+class RetentionTests(SimpleTestCase):
+    def backups(self, *timestamps):
+        return [
+            backup_path("/backups", datetime.datetime.fromisoformat(timestamp))
+            for timestamp in timestamps
+        ]
+
+    def test_keeps_newest_backup_per_day(self):
+        paths = self.backups(
+            "2026-10-19 03:30",
+            "2026-10-19 01:00",
+            "2026-10-18 03:30",
+            "2026-10-17 03:30",
+            "2026-10-16 03:30",
+        )
+        self.assertEqual(
+            expired_backups(paths, keep_daily=2, keep_weekly=0),
+            [paths[1], paths[3], paths[4]],
+        )
+
+    def test_keeps_newest_backup_per_week(self):
+        # Weeks start on Monday, so each Sunday is the newest of its week
+        paths = self.backups(
+            "2026-10-19 03:30",
+            "2026-10-18 03:30",
+            "2026-10-12 03:30",
+            "2026-10-11 03:30",
+            "2026-10-05 03:30",
+            "2026-10-04 03:30",
+        )
+        self.assertEqual(
+            expired_backups(paths, keep_daily=1, keep_weekly=3),
+            [paths[2], paths[4], paths[5]],
+        )
+
+    def test_ignores_other_files(self):
+        paths = [Path("/backups/notes.txt"), Path("/backups/db-latest.sqlite3.gz")]
+        self.assertEqual(expired_backups(paths, keep_daily=1, keep_weekly=0), [])
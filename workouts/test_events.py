@@ -0,0 +1,233 @@
+import asyncio
+import contextlib
+import threading
+from datetime import date
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from . import events
+from .events import Broker, LocalBackend, format_event
+from .models import Exercise, ExerciseRecord, UserProfile, WorkoutSession
+
+User = get_user_model()
+
+
+class BrokerTests(SimpleTestCase):
+    async def test_publish_from_another_thread(self):
+        broker = Broker(LocalBackend, queue_size=4)
+        async with broker.subscribe("workout-session-1") as subscription:
+            thread = threading.Thread(
+                target=broker.publish, args=("workout-session-1", "changed")
+            )
+            thread.start()
+            thread.join()
+            self.assertEqual(await subscription.get(timeout=1), "changed")
+        self.assertEqual(broker.subscriber_count("workout-session-1"), 0)
+
+    async def test_only_subscribed_channel_is_delivered(self):
+        broker = Broker(LocalBackend, queue_size=4)
+        async with broker.subscribe("workout-session-1") as subscription:
+            broker.publish("workout-session-2", "changed")
+            with self.assertRaises(TimeoutError):
+                await subscription.get(timeout=0.01)
+
+    async def test_slow_subscriber_misses_messages(self):
+        broker = Broker(LocalBackend, queue_size=2)
+        async with broker.subscribe("channel") as subscription:
+            for i in range(5):
+                broker.publish("channel", i)
+            await asyncio.sleep(0)
+            self.assertTrue(subscription.missed)
+            self.assertEqual(subscription.queue.qsize(), 2)
+
+            subscription.clear()
+            self.assertFalse(subscription.missed)
+            self.assertTrue(subscription.queue.empty())
+
+    def test_format_event(self):
+        self.assertEqual(
+            format_event("record", "<div>\n</div>", id="1"),
+            "event: record\nid: 1\ndata: <div>\ndata: </div>\n\n",
+        )
+        self.assertEqual(format_event("records", ""), "event: records\ndata: \n\n")
+
+
+@override_settings(EVENTS_HEARTBEAT_SECONDS=0.05)
+class WorkoutEventsViewTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email="owner@example.com", username="owner", password="testpass123"
+        )
+        self.partner = User.objects.create_user(
+            email="partner@example.com", username="partner", password="testpass123"
+        )
+        UserProfile.objects.create(
+            user=self.owner, default_workout_partner=self.partner
+        )
+        self.exercise = Exercise.objects.create(name="Bench Press")
+        self.workout = WorkoutSession.objects.create(user=self.owner, date=date.today())
+        self.url = reverse("workouts:workout_events", kwargs={"pk": self.workout.pk})
+
+    @sync_to_async
+    def add_record(self):
+        # Publishes once the (test) transaction "commits"
+        with self.captureOnCommitCallbacks(execute=True):
+            return ExerciseRecord.objects.create(
+                workout_session=self.workout,
+                exercise=self.exercise,
+                weight_kg=Decimal("60.00"),
+                reps=10,
+                difficulty_rating=6,
+            )
+
+    @sync_to_async
+    def delete_record(self, record):
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delete()
+
+    @contextlib.asynccontextmanager
+    async def stream(self, user):
+        await self.async_client.aforce_login(user)
+        await self.workout.arefresh_from_db()
+        response = await self.async_client.get(
+            self.url, {"since": self.workout.updated_at.isoformat()}
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content
+        try:
+            yield stream
+        finally:
+            await stream.aclose()
+
+    async def next_event(self, stream):
+        """Type and data of the next event, skipping heartbeats"""
+        while (chunk := await anext(stream)) == b": heartbeat\n\n":
+            pass
+        fields = {}
+        for line in chunk.decode().rstrip("\n").split("\n"):
+            name, _, value = line.partition(": ")
+            fields.setdefault(name, []).append(value)
+        return fields["event"][0], "\n".join(fields["data"])
+
+    async def test_partner_gets_new_records(self):
+        async with self.stream(self.partner) as stream:
+            self.assertEqual(await self.next_event(stream), ("records", "[]"))
+
+            record = await self.add_record()
+            event, html = await self.next_event(stream)
+            self.assertEqual(event, "record")
+            self.assertIn(f'id="exercise-record-{record.pk}"', html)
+            self.assertIn("Bench Press", html)
+            # The partner can't edit the owner's records
+            self.assertNotIn("Edit", html)
+            self.assertEqual(
+                await self.next_event(stream), ("records", f"[{record.pk}]")
+            )
+
+    async def test_deleted_records_are_announced(self):
+        record = await self.add_record()
+        async with self.stream(self.owner) as stream:
+            self.assertEqual(
+                await self.next_event(stream), ("records", f"[{record.pk}]")
+            )
+            await self.delete_record(record)
+            self.assertEqual(await self.next_event(stream), ("records", "[]"))
+
+    async def test_client_that_falls_behind_is_told_to_reload(self):
+        channel = events.workout_channel(self.workout.pk)
+        async with self.stream(self.owner) as stream:
+            await self.next_event(stream)
+            for _ in range(events.get_broker().queue_size + 1):
+                events.publish(channel, "changed")
+            await asyncio.sleep(0)
+            self.assertEqual(await self.next_event(stream), ("reload", ""))
+            with self.assertRaises(StopAsyncIteration):
+                await anext(stream)
+        self.assertEqual(events.get_broker().subscriber_count(channel), 0)
+
+    async def test_heartbeat(self):
+        async with self.stream(self.owner) as stream:
+            await self.next_event(stream)
+            self.assertEqual(await anext(stream), b": heartbeat\n\n")
+
+    async def test_unsubscribes_when_client_goes_away(self):
+        channel = events.workout_channel(self.workout.pk)
+        async with self.stream(self.owner) as stream:
+            await self.next_event(stream)
+            self.assertEqual(events.get_broker().subscriber_count(channel), 1)
+            # Django cancels the response when the client disconnects
+            waiting = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+        self.assertEqual(events.get_broker().subscriber_count(channel), 0)
+
+    def test_other_users_get_404(self):
+        stranger = User.objects.create_user(
+            email="stranger@example.com", username="stranger", password="testpass123"
+        )
+        self.client.force_login(stranger)
+        response = self.client.get(self.url, {"since": "2025-10-07"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_no_stream_under_wsgi(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(self.url, {"since": "2025-10-07T10:00:00"})
+        self.assertEqual(response.status_code, 204)
+
+
+class PartnerWorkoutDetailTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email="owner@example.com", username="owner", password="testpass123"
+        )
+        self.partner = User.objects.create_user(
+            email="partner@example.com", username="partner", password="testpass123"
+        )
+        UserProfile.objects.create(
+            user=self.owner, name="Olivia", default_workout_partner=self.partner
+        )
+        self.workout = WorkoutSession.objects.create(user=self.owner, date=date.today())
+        ExerciseRecord.objects.create(
+            workout_session=self.workout,
+            exercise=Exercise.objects.create(name="Bench Press"),
+            weight_kg=Decimal("60.00"),
+            reps=10,
+            difficulty_rating=6,
+        )
+        self.url = reverse("workouts:workout_detail", kwargs={"pk": self.workout.pk})
+
+    def test_partner_sees_workout_read_only(self):
+        self.client.force_login(self.partner)
+        response = self.client.get(self.url)
+        self.assertContains(response, "Workout of Olivia")
+        self.assertContains(response, "Bench Press")
+        self.assertContains(response, "data-events-url")
+        self.assertNotContains(response, "Complete Workout")
+        self.assertNotContains(response, "Edit")
+
+    def test_owner_can_edit(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(self.url)
+        self.assertNotContains(response, "Workout of")
+        self.assertContains(response, "Complete Workout")
+        self.assertContains(response, "Edit")
+
+    def test_partner_page_revalidates_after_owner_changes(self):
+        self.client.force_login(self.partner)
+        etag = self.client.get(self.url)["ETag"]
+        WorkoutSession.objects.filter(pk=self.workout.pk).touch()
+        response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_others_get_404(self):
+        stranger = User.objects.create_user(
+            email="stranger@example.com", username="stranger", password="testpass123"
+        )
+        self.client.force_login(stranger)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
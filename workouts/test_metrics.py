@@ -0,0 +1,148 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from . import metrics
+
+User = get_user_model()
+
+
+class MetricsDirMixin:
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.metrics_dir = Path(tmp.name)
+        settings_override = override_settings(METRICS_DIR=self.metrics_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class MetricsAggregationTests(MetricsDirMixin, SimpleTestCase):
+    def test_merges_files_of_all_processes(self):
+        name = "gymtracker_http_request_duration_seconds"
+        labels = {"url_name": "workouts:aggregation-test", "status": "200"}
+        metrics.observe(name, labels, 0.02)
+        # Another worker that handled two requests for the same view
+        other = [0] * (len(metrics.LATENCY_BUCKETS) + 2)
+        for value in (0.003, 3.0):
+            for i, bound in enumerate(metrics.LATENCY_BUCKETS):
+                other[i] += value <= bound
+            other[-2] += 1
+            other[-1] += value
+        (self.metrics_dir / f"{os.getpid() + 1}.json").write_text(
+            json.dumps(
+                [
+                    [name, labels, other],
+                    ["gymtracker_cache_requests_total", {"result": "hit"}, 5],
+                ]
+            )
+        )
+
+        merged = metrics.collect()
+        key = tuple(sorted(labels.items()))
+        series = merged[name][key]
+        self.assertEqual(series[-2], 3)
+        self.assertAlmostEqual(series[-1], 3.023)
+        # le=0.005 holds only the other worker's fast request
+        self.assertEqual(series[0], 1)
+        self.assertGreaterEqual(
+            merged["gymtracker_cache_requests_total"][(("result", "hit"),)], 5
+        )
+
+        text = metrics.render(merged, [("gymtracker_test_gauge", "Test", 7)])
+        self.assertIn(f"# TYPE {name} histogram", text)
+        self.assertIn(
+            f'{name}_bucket{{status="200",url_name="workouts:aggregation-test",'
+            f'le="+Inf"}} 3',
+            text,
+        )
+        self.assertIn(
+            f'{name}_count{{status="200",url_name="workouts:aggregation-test"}} 3',
+            text,
+        )
+        self.assertIn("gymtracker_test_gauge 7", text)
+
+    def write_process_file(self, name, hits):
+        (self.metrics_dir / name).write_text(
+            json.dumps([["gymtracker_cache_requests_total", {"result": "miss"}, hits]])
+        )
+
+    def misses(self):
+        merged = metrics.collect()
+        return merged["gymtracker_cache_requests_total"].get((("result", "miss"),), 0)
+
+    def test_files_of_stopped_processes_are_archived(self):
+        before = self.misses()
+        with mock.patch.object(
+            metrics, "_is_running", side_effect=lambda pid: pid == os.getpid()
+        ):
+            self.write_process_file("4000001-1.json", 3)
+            self.write_process_file("4000002-1.json", 4)
+            self.assertEqual(self.misses(), before + 7)
+            self.assertFalse(list(self.metrics_dir.glob("4*")))
+            self.assertEqual(self.misses(), before + 7)
+
+            # A later process that got the same PID
+            self.write_process_file("4000001-2.json", 1)
+            self.assertEqual(self.misses(), before + 8)
+
+    def test_interrupted_archiving_is_not_counted_twice(self):
+        before = self.misses()
+        self.write_process_file("4000001-1.json", 3)
+        (self.metrics_dir / metrics.ARCHIVE_FILE).write_text(
+            json.dumps(
+                {
+                    "folded": ["4000001-1.json"],
+                    "entries": [
+                        ["gymtracker_cache_requests_total", {"result": "miss"}, 3]
+                    ],
+                }
+            )
+        )
+        with mock.patch.object(
+            metrics, "_is_running", side_effect=lambda pid: pid == os.getpid()
+        ):
+            self.assertEqual(self.misses(), before + 3)
+        self.assertFalse((self.metrics_dir / "4000001-1.json").exists())
+
+    def test_ignores_unreadable_files(self):
+        (self.metrics_dir / "12345.json").write_text("{not json")
+        self.assertIsInstance(metrics.collect(), dict)
+
+    def test_label_values_are_escaped(self):
+        self.assertEqual(
+            metrics._format_labels((("path", 'a"b\\c\n'),)), '{path="a\\"b\\\\c\\n"}'
+        )
+
+
+class MetricsViewTests(MetricsDirMixin, TestCase):
+    def test_exposes_request_metrics_and_sessions(self):
+        User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        self.client.login(email="test@example.com", password="testpass123")
+        self.client.get(reverse("workouts:dashboard"))
+
+        response = self.client.get(reverse("workouts:metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response["Content-Type"].startswith("text/plain; version=0.0.4")
+        )
+        text = response.content.decode()
+        self.assertIn(
+            'gymtracker_http_request_duration_seconds_count{status="200",'
+            'url_name="workouts:dashboard"}',
+            text,
+        )
+        self.assertIn("gymtracker_db_queries_per_request_bucket", text)
+        self.assertIn("gymtracker_active_sessions 1", text)
+
+    def test_only_allowed_addresses(self):
+        response = self.client.get(reverse("workouts:metrics"), REMOTE_ADDR="10.1.2.3")
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,270 @@
+import asyncio
+import gzip
+import json
+import re
+import tempfile
+import zlib
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.test import (
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from . import instrumentation
+from .middleware import (
+    CompressionMiddleware,
+    brotli,
+    compression_stats,
+    reset_compression_stats,
+)
+from .models import WorkoutSession
+from .profiling import SamplingProfiler
+
+User = get_user_model()
+
+HTML = b"<tr><td>Bench Press</td><td>60 kg</td></tr>" * 100
+
+
+@override_settings(COMPRESSION_MIN_SIZE=512, COMPRESSION_GZIP_LEVEL=6)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        reset_compression_stats()
+        self.factory = RequestFactory()
+
+    def process(self, response, accept_encoding="gzip", path="/"):
+        request = self.factory.get(path, headers={"accept-encoding": accept_encoding})
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_compresses_html(self):
+        response = self.process(HttpResponse(HTML))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertEqual(gzip.decompress(response.content), HTML)
+
+        stats = compression_stats()
+        self.assertEqual(stats["responses"], 1)
+        self.assertEqual(stats["bytes_in"], len(HTML))
+        self.assertEqual(stats["bytes_saved"], len(HTML) - len(response.content))
+
+    def test_prefers_brotli(self):
+        if brotli is None:
+            self.skipTest("brotli is not installed")
+        response = self.process(HttpResponse(HTML), "gzip, deflate, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.content), HTML)
+
+    def test_gzip_length_is_randomized(self):
+        lengths = set()
+        for _ in range(20):
+            response = self.process(HttpResponse(HTML))
+            self.assertEqual(gzip.decompress(response.content), HTML)
+            lengths.add(len(response.content))
+        self.assertGreater(len(lengths), 1)
+
+    def test_pages_with_csrf_token_are_not_brotli(self):
+        if brotli is None:
+            self.skipTest("brotli is not installed")
+        request = self.factory.get("/", headers={"accept-encoding": "gzip, br"})
+        get_token(request)
+        response = CompressionMiddleware(lambda request: HttpResponse(HTML))(request)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_skips_responses_that_are_not_worth_it(self):
+        cases = {
+            "small": HttpResponse(b"<p>hi</p>"),
+            "binary": HttpResponse(HTML, content_type="image/png"),
+            "event stream": HttpResponse(HTML, content_type="text/event-stream"),
+            "encoded": HttpResponse(HTML, headers={"Content-Encoding": "gzip"}),
+            "no-transform": HttpResponse(
+                HTML, headers={"Cache-Control": "no-transform"}
+            ),
+        }
+        for name, response in cases.items():
+            with self.subTest(name):
+                body = response.content
+                response = self.process(response)
+                self.assertEqual(response.content, body)
+
+    def test_skips_static_files(self):
+        response = self.process(
+            HttpResponse(HTML, content_type="text/css"),
+            path="/static/vendor/bootstrap/bootstrap.min.css",
+        )
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(response.content, HTML)
+
+    def test_identity_when_not_accepted(self):
+        response = self.process(HttpResponse(HTML), "gzip;q=0")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+    def test_weakens_etag(self):
+        response = self.process(HttpResponse(HTML, headers={"ETag": '"abc"'}))
+        self.assertEqual(response["ETag"], 'W/"abc"')
+
+    def test_streaming_chunks_are_flushed(self):
+        decompressor = zlib.decompressobj(31)
+        chunks = iter([HTML, HTML])
+        response = self.process(StreamingHttpResponse(chunks))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertNotIn("Content-Length", response)
+
+        stream = iter(response.streaming_content)
+        # The first chunk can be decoded before the second one is produced
+        self.assertEqual(decompressor.decompress(next(stream)), HTML)
+        rest = b"".join(stream)
+        self.assertEqual(decompressor.decompress(rest), HTML)
+        self.assertTrue(decompressor.eof)
+
+    def test_async_streaming(self):
+        async def chunks():
+            yield HTML
+            yield HTML
+
+        response = self.process(StreamingHttpResponse(chunks()))
+
+        async def consume():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(gzip.decompress(asyncio.run(consume())), HTML * 2)
+
+
+class BenchmarkCompressionCommandTests(TestCase):
+    def test_reports_each_page(self):
+        User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        out = StringIO()
+        call_command("benchmark_compression", "test@example.com", repeat=1, stdout=out)
+        self.assertIn("dashboard", out.getvalue())
+        self.assertIn("gzip-6", out.getvalue())
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        self.client.login(email="test@example.com", password="testpass123")
+
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs("gymtracker.performance", "INFO") as logs:
+            response = self.client.get(reverse("workouts:dashboard"))
+
+        timing = response["Server-Timing"]
+        for metric in ("db;dur=", "tpl;dur=", "view;dur=", "cache;desc=", "total;dur="):
+            self.assertIn(metric, timing)
+
+        entry = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(entry["url_name"], "workouts:dashboard")
+        self.assertEqual(entry["status"], 200)
+        self.assertGreater(entry["queries"], 0)
+        self.assertIn(f'"{entry["queries"]} queries"', timing)
+
+    def test_unresolved_urls_are_logged_without_name(self):
+        with self.assertLogs("gymtracker.performance", "INFO") as logs:
+            self.client.get("/no-such-page/")
+        self.assertIsNone(json.loads(logs.records[-1].getMessage())["url_name"])
+
+    @override_settings(PERFORMANCE_INSTRUMENTATION=False)
+    def test_can_be_switched_off(self):
+        response = Client().get(reverse("account_login"))
+        self.assertNotIn("Server-Timing", response)
+
+
+class InstrumentedCacheTests(SimpleTestCase):
+    def test_counts_hits_and_misses_of_current_request(self):
+        cache.set("instrumented", 1)
+        token = instrumentation.begin_request()
+        try:
+            self.assertEqual(cache.get("instrumented"), 1)
+            self.assertEqual(cache.get("missing", "default"), "default")
+            cache.get_many(["instrumented", "missing"])
+            stats = instrumentation.current_stats()
+        finally:
+            instrumentation.end_request(token)
+            cache.delete("instrumented")
+
+        self.assertEqual((stats.cache_hits, stats.cache_misses), (2, 2))
+
+    def test_no_request_no_counting(self):
+        self.assertIsNone(instrumentation.current_stats())
+        self.assertIsNone(cache.get("missing"))
+
+
+class ProfilerMiddlewareTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", username="admin", password="testpass123"
+        )
+        self.workout = WorkoutSession.objects.create(user=self.admin, date="2025-10-07")
+        self.url = reverse("workouts:workout_detail", kwargs={"pk": self.workout.pk})
+
+    def test_superuser_gets_collapsed_stacks(self):
+        self.client.login(email="admin@example.com", password="testpass123")
+        for params, headers in (({"_profile": ""}, {}), ({}, {"x-profile": "1"})):
+            with self.subTest(params=params, headers=headers):
+                response = self.client.get(self.url, params, headers=headers)
+                self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+                self.assertRegex(response["X-Profile"], r"^\d+ samples, .* queries$")
+                for line in response.content.decode().splitlines():
+                    self.assertRegex(line, r"^\S.* \d+$")
+
+    async def test_async_request(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(self.url, {"_profile": ""})
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+        self.assertRegex(response["X-Profile"], r"^\d+ samples, .* queries$")
+
+    def test_store_keeps_page_and_writes_profile(self):
+        self.client.login(email="admin@example.com", password="testpass123")
+        with tempfile.TemporaryDirectory() as tmp, self.settings(PROFILE_DIR=tmp):
+            response = self.client.get(self.url, {"_profile": "store"})
+            self.assertContains(response, "Workout")
+            name = response["X-Profile"].split(":")[0]
+            self.assertIn("workouts-workout_detail", name)
+            self.assertTrue((Path(tmp) / f"{name}.collapsed").exists())
+            sql = (Path(tmp) / f"{name}.sql.txt").read_text()
+            self.assertRegex(sql, r"^\d+ queries, ")
+
+    def test_ignored_for_other_users(self):
+        User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        self.client.login(email="test@example.com", password="testpass123")
+        response = self.client.get(reverse("workouts:dashboard"), {"_profile": ""})
+        self.assertNotIn("X-Profile", response)
+        self.assertContains(response, "Welcome back")
+
+
+class SamplingProfilerTests(SimpleTestCase):
+    def test_samples_annotate_running_sql(self):
+        with SamplingProfiler(interval=60) as profiler:
+            profiler.sample()
+            profiler.current_sql = "SELECT ? FROM t"
+            profiler.sample()
+            profiler.current_sql = None
+
+        stacks = list(profiler.stacks)
+        self.assertEqual(len(stacks), 2)
+        self.assertTrue(
+            any(stack.endswith(";[sql] SELECT ? FROM t") for stack in stacks)
+        )
+        self.assertTrue(
+            any(
+                re.search(r"test_samples_annotate_running_sql \(workouts/", stack)
+                for stack in stacks
+            )
+        )
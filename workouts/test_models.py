@@ -1,9 +1,10 @@
-from django.test import TestCase
+from django.db.models import Sum
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from datetime import date, time, timedelta
 from decimal import Decimal
 
-from .models import Exercise, WorkoutSession, ExerciseRecord, UserProfile
+from .models import Exercise, WorkoutSession, ExerciseRecord, UserProfile, FeedEntry
 
 User = get_user_model()
 
@@ -62,6 +63,24 @@ class WorkoutSessionModelTest(TestCase):
         duration = self.workout.duration
         self.assertEqual(duration.total_seconds(), 5400)  # 1.5 hours
 
+    def test_workout_duration_seconds(self):
+        self.workout.refresh_from_db()
+        self.assertIsNone(self.workout.duration_seconds)
+
+        self.workout.start_time = time(13, 0, 15, 250000)
+        self.workout.end_time = time(14, 30, 15, 250000)
+        self.workout.save()
+        self.workout.refresh_from_db()
+        self.assertEqual(self.workout.duration_seconds, 5400)
+
+        # Ended after midnight
+        WorkoutSession.objects.filter(pk=self.workout.pk).update(
+            start_time=time(23, 30), end_time=time(0, 45)
+        )
+        self.workout.refresh_from_db()
+        self.assertEqual(self.workout.duration_seconds, 4500)
+        self.assertEqual(self.workout.duration.total_seconds(), 4500)
+
     def test_workout_ordering(self):
         workout2 = WorkoutSession.objects.create(
             user=self.user, date=date.today() - timedelta(days=1)
@@ -105,10 +124,39 @@ class ExerciseRecordModelTest(TestCase):
         expected_volume = 80.0 * 10 * 3  # 2400
         self.assertEqual(self.record.total_volume, expected_volume)
 
+    def test_volume_g_is_exact(self):
+        self.record.refresh_from_db()
+        self.assertEqual(self.record.volume_g, 2_400_000)
+        ExerciseRecord.objects.create(
+            workout_session=self.workout,
+            exercise=self.exercise,
+            weight_kg=Decimal("0.1"),
+            reps=3,
+            sets=1,
+            difficulty_rating=7,
+        )
+        # 0.1 × 3 isn't exactly 0.3 in floating point
+        total = self.workout.exercise_records.aggregate(total=Sum("volume_g"))
+        self.assertEqual(total["total"], 2_400_300)
+
     def test_difficulty_choices(self):
         self.assertIn((1, "Very Easy"), ExerciseRecord.DIFFICULTY_CHOICES)
         self.assertIn((10, "Failure"), ExerciseRecord.DIFFICULTY_CHOICES)
 
+    def test_saving_and_deleting_touches_session(self):
+        self.workout.refresh_from_db()
+        created = self.workout.updated_at
+
+        self.record.reps = 12
+        self.record.save()
+        self.workout.refresh_from_db()
+        edited = self.workout.updated_at
+        self.assertGreater(edited, created)
+
+        self.record.delete()
+        self.workout.refresh_from_db()
+        self.assertGreater(self.workout.updated_at, edited)
+
 
 class UserProfileModelTest(TestCase):
     def setUp(self):
@@ -126,3 +174,53 @@ class UserProfileModelTest(TestCase):
     def test_profile_str(self):
         expected = f"{self.user.username}'s Profile"
         self.assertEqual(str(self.profile), expected)
+
+
+class FeedEntryModelTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        self.partner = User.objects.create_user(
+            email="partner@example.com", username="partner", password="testpass123"
+        )
+        UserProfile.objects.create(user=self.user, default_workout_partner=self.partner)
+        self.exercise = Exercise.objects.create(name="Bench Press")
+        self.workout = WorkoutSession.objects.create(user=self.user, date=date.today())
+
+    def add_record(self, **kwargs):
+        fields = {"weight_kg": Decimal("62.50"), "reps": 10, "difficulty_rating": 6}
+        return ExerciseRecord.objects.create(
+            workout_session=self.workout, exercise=self.exercise, **fields | kwargs
+        )
+
+    def test_new_record_is_written_to_partner_feed(self):
+        self.add_record(sets=3)
+        entry = FeedEntry.objects.for_user(self.partner).get()
+        self.assertEqual(entry.actor, self.user)
+        self.assertEqual(entry.workout_session, self.workout)
+        self.assertEqual(entry.kind, FeedEntry.RECORD_ADDED)
+        self.assertEqual(entry.summary, "Bench Press 62,5kg × 10 (3 sets)")
+        self.assertFalse(FeedEntry.objects.for_user(self.user).exists())
+
+    def test_editing_record_adds_no_entry(self):
+        record = self.add_record()
+        record.reps = 12
+        record.save()
+        self.assertEqual(FeedEntry.objects.count(), 1)
+
+    def test_no_feed_without_partner(self):
+        UserProfile.objects.filter(user=self.user).update(default_workout_partner=None)
+        self.add_record()
+        self.assertFalse(FeedEntry.objects.exists())
+
+    @override_settings(FEED_MAX_ENTRIES=3)
+    def test_feed_is_trimmed_to_newest_entries(self):
+        records = [self.add_record(reps=reps) for reps in range(1, 6)]
+        summaries = FeedEntry.objects.for_user(self.partner).values_list(
+            "summary", flat=True
+        )
+        self.assertEqual(
+            list(summaries),
+            [f"Bench Press 62,5kg × {r.reps}" for r in reversed(records[2:])],
+        )
@@ -0,0 +1,212 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .models import Exercise, ExerciseRecommendation, ExerciseRecord, WorkoutSession
+from .recommendations import (
+    recent_top_sets,
+    recommend_weight,
+    update_recommendations,
+)
+
+User = get_user_model()
+
+
+class RecommendWeightTests(TestCase):
+    def test_no_sessions(self):
+        self.assertEqual(recommend_weight([]), Decimal("0"))
+
+    def test_single_session(self):
+        """One session gives its target: up when easy, same when hard, else down"""
+        for difficulty, expected in [
+            (3, Decimal("82.5")),
+            (5, Decimal("82.5")),
+            (6, Decimal("80.0")),
+            (7, Decimal("80.0")),
+            (9, Decimal("77.5")),
+        ]:
+            with self.subTest(difficulty=difficulty):
+                self.assertEqual(
+                    recommend_weight([(Decimal("80.0"), difficulty)]), expected
+                )
+
+    def test_never_below_zero(self):
+        self.assertEqual(recommend_weight([(Decimal("1.0"), 10)]), Decimal("0"))
+
+    def test_steady_progress(self):
+        self.assertEqual(
+            recommend_weight(
+                [(Decimal("80"), 5), (Decimal("82.5"), 5), (Decimal("85"), 5)]
+            ),
+            Decimal("87.5"),
+        )
+
+    def test_one_easy_session_after_hard_ones(self):
+        """A single easy day after a run of hard ones doesn't raise the weight"""
+        self.assertEqual(
+            recommend_weight([(Decimal("80"), 8)] * 3 + [(Decimal("80"), 4)]),
+            Decimal("80"),
+        )
+
+    def test_run_of_hard_sessions(self):
+        self.assertEqual(
+            recommend_weight([(Decimal("80"), 5)] * 3 + [(Decimal("80"), 9)] * 2),
+            Decimal("77.5"),
+        )
+
+    def test_moves_one_increment_at_most(self):
+        self.assertEqual(
+            recommend_weight(
+                [(Decimal("60"), 2), (Decimal("70"), 2), (Decimal("80"), 2)]
+            ),
+            Decimal("82.5"),
+        )
+
+
+class UpdateRecommendationsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com", username="testuser")
+        self.bench = Exercise.objects.create(name="Bench Press")
+        self.squat = Exercise.objects.create(name="Squat")
+
+    def log(self, days_ago, exercise, weight_kg, difficulty_rating, user=None):
+        session, _ = WorkoutSession.objects.get_or_create(
+            user=user or self.user, date=date.today() - timedelta(days=days_ago)
+        )
+        return ExerciseRecord.objects.create(
+            workout_session=session,
+            exercise=exercise,
+            weight_kg=Decimal(weight_kg),
+            reps=10,
+            difficulty_rating=difficulty_rating,
+        )
+
+    @override_settings(RECOMMENDATION_SESSIONS=2)
+    def test_recent_top_sets(self):
+        self.log(3, self.bench, "70", 5)
+        self.log(2, self.bench, "75", 6)
+        self.log(2, self.bench, "72.5", 4)
+        self.log(1, self.bench, "77.5", 7)
+        self.log(1, self.squat, "100", 9)
+        other = User.objects.create(email="other@example.com", username="other")
+        self.log(0, self.bench, "200", 1, user=other)
+
+        self.assertEqual(
+            recent_top_sets(self.user),
+            {
+                self.bench.pk: [(Decimal("75"), 6), (Decimal("77.5"), 7)],
+                self.squat.pk: [(Decimal("100"), 9)],
+            },
+        )
+
+    def test_update_recommendations(self):
+        self.log(2, self.bench, "80", 5)
+        self.log(1, self.bench, "82.5", 5)
+        self.log(1, self.squat, "100", 9)
+
+        update_recommendations(self.user)
+        bench = ExerciseRecommendation.objects.get(user=self.user, exercise=self.bench)
+        self.assertEqual(bench.recommended_weight_kg, Decimal("85"))
+        self.assertEqual(bench.last_weight_kg, Decimal("82.5"))
+        self.assertEqual(bench.last_difficulty, 5)
+        self.assertEqual(bench.session_count, 2)
+
+        # Updated in place, and dropped for exercises without records
+        self.log(0, self.bench, "85", 9)
+        ExerciseRecord.objects.filter(exercise=self.squat).delete()
+        update_recommendations(self.user)
+        bench = ExerciseRecommendation.objects.get(user=self.user)
+        self.assertEqual(bench.exercise, self.bench)
+        self.assertEqual(bench.last_weight_kg, Decimal("85"))
+        self.assertEqual(bench.session_count, 3)
+
+    def test_completing_a_workout_updates_recommendations(self):
+        record = self.log(1, self.bench, "80", 3)
+        self.log(0, self.squat, "100", 5)
+        # Not while the sets are being logged
+        self.assertFalse(ExerciseRecommendation.objects.exists())
+
+        # Changes to earlier workouts are picked up as well
+        record.difficulty_rating = 9
+        record.save()
+        session = WorkoutSession.objects.get(user=self.user, date=date.today())
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("workouts:complete_workout", kwargs={"pk": session.pk}),
+            {"end_time": "19:30"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            set(
+                ExerciseRecommendation.objects.filter(user=self.user).values_list(
+                    "exercise", "recommended_weight_kg"
+                )
+            ),
+            {(self.bench.pk, Decimal("77.5")), (self.squat.pk, Decimal("102.5"))},
+        )
+
+    def test_backfill_migration(self):
+        self.log(2, self.bench, "80", 5)
+        self.log(1, self.bench, "82.5", 5)
+        other = User.objects.create(email="other@example.com", username="other")
+        self.log(1, self.squat, "100", 9, user=other)
+        self.log(1, self.bench, "60", 5, user=other)
+        ExerciseRecommendation.objects.all().delete()
+
+        name = "0010_backfill_recommendations"
+        migration = import_module(f"workouts.migrations.{name}")
+        # The models as they were at the migration
+        state = MigrationLoader(connection).project_state(("workouts", name))
+        schema_editor = mock.Mock(connection=connection)
+        migration.backfill_recommendations(state.apps, schema_editor)
+        self.assertEqual(
+            set(
+                ExerciseRecommendation.objects.values_list(
+                    "user", "exercise", "recommended_weight_kg"
+                )
+            ),
+            {
+                (self.user.pk, self.bench.pk, Decimal("85")),
+                (other.pk, self.squat.pk, Decimal("97.5")),
+                (other.pk, self.bench.pk, Decimal("62.5")),
+            },
+        )
+
+    def test_add_exercise_page_reads_recommendations_in_one_query(self):
+        for days_ago in range(5):
+            self.log(days_ago, self.bench, "80", 5)
+            self.log(days_ago, self.squat, "100", 5)
+        update_recommendations(self.user)
+        self.client.force_login(self.user)
+        url = reverse(
+            "workouts:add_exercise",
+            kwargs={"pk": WorkoutSession.objects.filter(user=self.user).first().pk},
+        )
+        self.client.get(url)
+        # The recommendations, plus the session, the workout's stats, the
+        # exercise choices and the user
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["exercise_recommendations"]), 2)
+
+    def test_command(self):
+        self.log(1, self.bench, "80", 5)
+        other = User.objects.create(email="other@example.com", username="other")
+        self.log(1, self.squat, "100", 5, user=other)
+        out = StringIO()
+        call_command("update_recommendations", stdout=out)
+        self.assertEqual(out.getvalue(), "Updated 2 recommendations\n")
+        self.assertEqual(ExerciseRecommendation.objects.count(), 2)
+
+        out = StringIO()
+        call_command("update_recommendations", "other@example.com", stdout=out)
+        self.assertEqual(out.getvalue(), "Updated 1 recommendations\n")
@@ -0,0 +1,101 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.db import OperationalError, connections, router
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from .models import Exercise, ExerciseRecord
+
+
+class AnalyticsRouterTests(SimpleTestCase):
+    def test_analytics_reads_use_primary_under_test(self):
+        # The alias is a test mirror, reading through it would not see the
+        # rows of the test transaction
+        self.assertEqual(Exercise.objects.for_analytics().db, "default")
+
+    def test_analytics_reads_use_analytics_connection(self):
+        analytics = connections["analytics"].settings_dict
+        with mock.patch.dict(analytics, {"NAME": "file:/srv/db.sqlite3?mode=ro"}):
+            self.assertEqual(Exercise.objects.for_analytics().db, "analytics")
+            self.assertEqual(
+                ExerciseRecord.objects.filter(sets=1).for_analytics().db,
+                "analytics",
+            )
+
+    def test_writes_go_to_primary(self):
+        exercise = Exercise(name="Leg Press")
+        exercise._state.db = "analytics"
+        self.assertEqual(router.db_for_write(Exercise, instance=exercise), "default")
+
+    def test_only_primary_is_migrated(self):
+        self.assertTrue(router.allow_migrate("default", "workouts"))
+        self.assertFalse(router.allow_migrate("analytics", "workouts"))
+
+
+class AnalyticsConnectionTests(SimpleTestCase):
+    """The configured connections, on a database file instead of the test DB"""
+
+    # Allows connecting with these aliases, the test databases aren't used
+    databases = {"default", "analytics"}
+
+    def connect(self, wal=True):
+        path = Path(tempfile.mkdtemp()) / "db.sqlite3"
+        primary = settings.DATABASES["default"]
+        analytics = settings.DATABASES["analytics"]
+        options = primary["OPTIONS"] if wal else {}
+        handler = ConnectionHandler(
+            {
+                # Fail right away instead of waiting for a lock
+                "default": {
+                    "ENGINE": primary["ENGINE"],
+                    "NAME": path,
+                    "OPTIONS": {**options, "timeout": 0},
+                },
+                "analytics": {
+                    "ENGINE": analytics["ENGINE"],
+                    "NAME": f"{path.as_uri()}?mode=ro",
+                    "OPTIONS": {"timeout": 0},
+                },
+            }
+        )
+        self.addCleanup(handler.close_all)
+        with handler["default"].cursor() as cursor:
+            cursor.execute("CREATE TABLE record (weight INTEGER)")
+            cursor.execute("INSERT INTO record VALUES (50)")
+        return handler["default"], handler["analytics"]
+
+    def count(self, cursor):
+        cursor.execute("SELECT COUNT(*) FROM record")
+        return cursor.fetchone()[0]
+
+    def test_writer_not_blocked_by_analytics_read(self):
+        writer, reader = self.connect()
+        with reader.cursor() as report, writer.cursor() as cursor:
+            report.execute("BEGIN")
+            self.assertEqual(self.count(report), 1)
+
+            # Commits while the report's read transaction is still open
+            cursor.execute("INSERT INTO record VALUES (55)")
+
+            # The report keeps reading from its snapshot
+            self.assertEqual(self.count(report), 1)
+            report.execute("COMMIT")
+            self.assertEqual(self.count(report), 2)
+
+    def test_writer_blocked_without_wal(self):
+        writer, reader = self.connect(wal=False)
+        with reader.cursor() as report, writer.cursor() as cursor:
+            report.execute("BEGIN")
+            self.count(report)
+            with self.assertRaisesMessage(OperationalError, "locked"):
+                cursor.execute("INSERT INTO record VALUES (55)")
+            report.execute("COMMIT")
+
+    def test_analytics_connection_is_read_only(self):
+        _, reader = self.connect()
+        with reader.cursor() as cursor:
+            with self.assertRaisesMessage(OperationalError, "readonly"):
+                cursor.execute("INSERT INTO record VALUES (55)")
@@ -0,0 +1,89 @@
+import io
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+User = get_user_model()
+
+
+class SessionCacheMixin:
+    def setUp(self):
+        cache_settings = {
+            **settings.CACHES,
+            "sessions": {
+                **settings.CACHES["sessions"],
+                "LOCATION": tempfile.mkdtemp(),
+            },
+        }
+        settings_override = override_settings(CACHES=cache_settings)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+
+
+class CachedSessionTests(SessionCacheMixin, TestCase):
+    def test_logged_in_requests_dont_read_the_session_table(self):
+        self.client.force_login(self.user)
+        session_key = self.client.session.session_key
+        # Written through to the database
+        self.assertTrue(Session.objects.filter(pk=session_key).exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("workouts:dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q["sql"] for q in queries if "django_session" in q["sql"]])
+
+    def test_falls_back_to_the_database(self):
+        self.client.force_login(self.user)
+        caches["sessions"].clear()
+        response = self.client.get(reverse("workouts:dashboard"))
+        self.assertEqual(response.status_code, 200)
+
+
+class SweepSessionsTests(SessionCacheMixin, TestCase):
+    def test_deletes_expired_sessions_in_batches(self):
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(
+                session_key=f"expired{i}", session_data="", expire_date=now
+            )
+        Session.objects.create(
+            session_key="active", session_data="", expire_date=now + timedelta(1)
+        )
+        stdout = io.StringIO()
+        with self.assertNumQueries(7):
+            call_command(
+                "sweep_sessions", "--batch-size", "2", "--sleep", "0", stdout=stdout
+            )
+        self.assertIn("Deleted 5 expired sessions", stdout.getvalue())
+        self.assertQuerySetEqual(
+            Session.objects.values_list("pk", flat=True), ["active"]
+        )
+
+    def test_deletes_expired_cache_entries(self):
+        cache = caches["sessions"]
+        cache.set("stale", "x", timeout=60)
+        cache.set("active", "x", timeout=120)
+        stdout = io.StringIO()
+        with mock.patch(
+            "django.core.cache.backends.filebased.time.time",
+            return_value=time.time() + 90,
+        ):
+            call_command("sweep_sessions", stdout=stdout)
+        self.assertIn("Deleted 1 expired session cache entries", stdout.getvalue())
+        self.assertIsNone(cache.get("stale"))
+        self.assertEqual(cache.get("active"), "x")
@@ -0,0 +1,391 @@
+import tempfile
+from datetime import date
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connections, router
+from django.db.migrations.executor import MigrationExecutor
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from .middleware import GymMiddleware
+from .models import (
+    Exercise,
+    ExerciseRecommendation,
+    ExerciseRecord,
+    FeedEntry,
+    Gym,
+    UserProfile,
+    WorkoutSession,
+)
+from .shards import (
+    GYM_SESSION_KEY,
+    SHARDED_MODELS,
+    current_shard,
+    delete_from_shards,
+    use_gym,
+)
+
+User = get_user_model()
+
+
+@override_settings(GYM_SHARDS=["north"])
+class TenantRouterTests(SimpleTestCase):
+    def test_default_without_gym(self):
+        self.assertEqual(router.db_for_read(WorkoutSession), "default")
+        self.assertEqual(router.db_for_write(WorkoutSession), "default")
+
+    def test_gym_without_shard(self):
+        with use_gym("south"):
+            self.assertIsNone(current_shard())
+            self.assertEqual(router.db_for_read(WorkoutSession), "default")
+            self.assertEqual(router.db_for_write(ExerciseRecord), "default")
+
+    def test_reads_go_to_shard(self):
+        with use_gym("north"):
+            self.assertEqual(router.db_for_read(WorkoutSession), "gym_north")
+            self.assertEqual(WorkoutSession.objects.with_archives().db, "gym_north")
+            # Analytics reads have a connection of their own anyway
+            self.assertEqual(Exercise.objects.for_analytics().db, "gym_north")
+
+    def test_catalog_is_read_from_primary(self):
+        with use_gym("north"):
+            self.assertEqual(router.db_for_read(Exercise), "default")
+            self.assertEqual(router.db_for_read(User), "default")
+
+    def test_only_sharded_models_are_written_to_shard(self):
+        with use_gym("north"):
+            self.assertEqual(router.db_for_write(ExerciseRecord), "gym_north")
+            self.assertEqual(router.db_for_write(Exercise), "default")
+            self.assertEqual(router.db_for_write(User), "default")
+
+    def test_rows_are_written_back_to_their_shard(self):
+        session = WorkoutSession()
+        session._state.db = "gym_north"
+        self.assertEqual(
+            router.db_for_write(WorkoutSession, instance=session), "gym_north"
+        )
+
+    def test_only_sharded_models_are_migrated_on_shard(self):
+        self.assertTrue(
+            router.allow_migrate("gym_north", "workouts", model_name="feedentry")
+        )
+        self.assertFalse(
+            router.allow_migrate("gym_north", "workouts", model_name="exercise")
+        )
+        self.assertFalse(router.allow_migrate("gym_north", "auth", model_name="user"))
+        self.assertFalse(router.allow_migrate("gym_north", "workouts"))
+        self.assertTrue(
+            router.allow_migrate("default", "workouts", model_name="feedentry")
+        )
+        self.assertTrue(
+            router.allow_migrate("default", "workouts", model_name="exercise")
+        )
+
+
+@override_settings(GYM_SHARDS=["north"])
+class GymMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com", username="testuser")
+        gym = Gym.objects.create(name="North", slug="north")
+        UserProfile.objects.create(user=self.user, gym=gym)
+        self.shards = []
+
+    def get_response(self, request):
+        self.shards.append(current_shard())
+        return HttpResponse()
+
+    def request(self, user, session=None, get_response=None):
+        request = RequestFactory().get("/")
+        request.user = user
+        request.session = SessionBase()
+        request.session.update(session or {})
+        request.response = GymMiddleware(get_response or self.get_response)(request)
+        return request
+
+    @override_settings(GYM_SHARDS=[])
+    def test_not_used_without_shards(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            GymMiddleware(self.get_response)
+
+    def test_gym_from_session(self):
+        with self.assertNumQueries(0):
+            self.request(self.user, {GYM_SESSION_KEY: "north"})
+            self.request(self.user, {GYM_SESSION_KEY: None})
+        self.assertEqual(self.shards, ["gym_north", None])
+
+    def test_gym_looked_up_when_not_in_session(self):
+        request = self.request(self.user)
+        self.assertEqual(self.shards, ["gym_north"])
+        self.assertEqual(request.session[GYM_SESSION_KEY], "north")
+
+    def test_gym_is_reset_after_the_request(self):
+        self.request(self.user, {GYM_SESSION_KEY: "north"})
+        self.assertEqual(self.shards, ["gym_north"])
+        self.assertIsNone(current_shard())
+
+    def test_gym_is_reset_when_a_streaming_response_closes(self):
+        def stream():
+            yield current_shard() or "none"
+
+        request = self.request(
+            self.user,
+            {GYM_SESSION_KEY: "north"},
+            lambda request: StreamingHttpResponse(stream()),
+        )
+        self.assertEqual(b"".join(request.response), b"gym_north")
+        request.response.close()
+        self.assertIsNone(current_shard())
+
+    def test_anonymous_user(self):
+        self.request(AnonymousUser(), {GYM_SESSION_KEY: "north"})
+        self.assertEqual(self.shards, [None])
+
+    async def test_async_request(self):
+        request = RequestFactory().get("/")
+        request.auser = mock.AsyncMock(return_value=self.user)
+        request.session = SessionBase()
+
+        async def get_response(request):
+            self.shards.append(current_shard())
+            return HttpResponse()
+
+        await GymMiddleware(get_response)(request)
+        self.assertEqual(self.shards, ["gym_north"])
+        self.assertIsNone(current_shard())
+        self.assertEqual(await request.session.aget(GYM_SESSION_KEY), "north")
+
+    def test_login_remembers_gym(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.session[GYM_SESSION_KEY], "north")
+
+
+@override_settings(GYM_SHARDS=["north"])
+class ShardConnectionTests(SimpleTestCase):
+    """A migrated gym database and its catalog, in files of their own"""
+
+    databases = {"north_catalog", "gym_north"}
+
+    @classmethod
+    def setUpClass(cls):
+        path = Path(tempfile.mkdtemp())
+        primary = settings.DATABASES["default"]
+        databases = {
+            "north_catalog": {
+                "ENGINE": primary["ENGINE"],
+                "NAME": path / "db.sqlite3",
+                "OPTIONS": primary["OPTIONS"],
+            },
+            "gym_north": {
+                "ENGINE": primary["ENGINE"],
+                "NAME": path / "north.sqlite3",
+                "OPTIONS": primary["OPTIONS"],
+                "CATALOG": path / "db.sqlite3",
+            },
+        }
+        # Fills in the defaults; a handler insists on having a default alias
+        configured = ConnectionHandler({"default": {}, **databases}).settings
+        # Migrations look connections up by alias, so they have to be known
+        settings_patch = mock.patch.dict(
+            connections.settings, {alias: configured[alias] for alias in databases}
+        )
+        settings_patch.start()
+        cls.addClassCleanup(settings_patch.stop)
+        cls.addClassCleanup(cls.close_connections, list(databases))
+        super().setUpClass()
+
+        with connections["north_catalog"].schema_editor() as editor:
+            editor.create_model(User)
+            editor.create_model(Exercise)
+        executor = MigrationExecutor(connections["gym_north"])
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        # The schema editor turns foreign key checks back on when it's done, a
+        # new connection leaves them off as after the shards migrate command
+        connections["gym_north"].close()
+
+        cls.user = User.objects.db_manager("north_catalog").create_user(
+            email="north@example.com", username="north"
+        )
+        WorkoutSession.objects.using("gym_north").create(
+            user=cls.user, date=date(2026, 10, 1)
+        )
+
+    @classmethod
+    def close_connections(cls, aliases):
+        for alias in aliases:
+            connections[alias].close()
+            del connections[alias]
+
+    def test_shard_only_has_sharded_tables(self):
+        tables = connections["gym_north"].introspection.table_names()
+        self.assertEqual(
+            set(tables),
+            {f"workouts_{label.split('.')[1]}" for label in SHARDED_MODELS}
+            | {"django_migrations"},
+        )
+
+    def test_queries_join_the_catalog(self):
+        self.assertEqual(
+            list(
+                WorkoutSession.objects.using("gym_north")
+                .filter(user__email="north@example.com")
+                .values_list("user__username", "date")
+            ),
+            [("north", date(2026, 10, 1))],
+        )
+
+    def test_routed_to_shard(self):
+        with use_gym("north"):
+            session = WorkoutSession.objects.create(
+                user=self.user, date=date(2026, 10, 2)
+            )
+            self.assertEqual(session._state.db, "gym_north")
+            self.assertEqual(session.user, self.user)
+            self.assertEqual(
+                User.objects.using(router.db_for_read(WorkoutSession)).get(
+                    workout_sessions=session
+                ),
+                self.user,
+            )
+        # Deleted from where it was read, outside the gym too
+        session.delete()
+        self.assertFalse(
+            WorkoutSession.objects.using("gym_north").filter(pk=session.pk).exists()
+        )
+
+    def test_deleted_users_are_deleted_from_shards(self):
+        other = User.objects.db_manager("north_catalog").create_user(
+            email="other@example.com", username="other"
+        )
+        exercise = Exercise.objects.db_manager("north_catalog").create(name="Squat")
+        shard = "gym_north"
+        sessions = [
+            WorkoutSession.objects.using(shard).create(user=user, date=date(2026, 9, 1))
+            for user in (self.user, other)
+        ]
+        self.addCleanup(sessions[0].delete)
+        ExerciseRecord.objects.using(shard).bulk_create(
+            ExerciseRecord(
+                workout_session=session,
+                exercise=exercise,
+                weight_kg=60,
+                reps=5,
+                difficulty_rating=6,
+            )
+            for session in sessions
+        )
+        FeedEntry.objects.using(shard).create(
+            recipient=self.user, actor=other, workout_session=sessions[1]
+        )
+        FeedEntry.objects.using(shard).create(
+            recipient=other, actor=self.user, workout_session=sessions[0]
+        )
+        ExerciseRecommendation.objects.using(shard).create(
+            user=other,
+            exercise=exercise,
+            recommended_weight_kg=62.5,
+            last_weight_kg=60,
+            last_difficulty=6,
+            session_count=1,
+        )
+
+        # A real delete of the user would cascade into tables this test's
+        # catalog doesn't have, so call the receiver directly
+        delete_from_shards(User, other)
+        self.assertFalse(
+            WorkoutSession.objects.using(shard).filter(user_id=other.pk).exists()
+        )
+        self.assertEqual(
+            list(ExerciseRecord.objects.using(shard).values_list("workout_session")),
+            [(sessions[0].pk,)],
+        )
+        # Both were about the deleted user, one in their feed, one by them
+        self.assertFalse(FeedEntry.objects.using(shard).exists())
+        self.assertFalse(ExerciseRecommendation.objects.using(shard).exists())
+
+    def test_catalog_is_read_only(self):
+        with self.assertRaisesMessage(OperationalError, "readonly"):
+            User.objects.using("gym_north").update(username="south")
+
+
+@override_settings(GYM_SHARDS=["north", "east"])
+class ShardsCommandTests(TestCase):
+    def call(self, *args):
+        out = StringIO()
+        call_command("shards", *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_list(self):
+        north = Gym.objects.create(name="North", slug="north")
+        Gym.objects.create(name="South", slug="south")
+        user = User.objects.create(email="test@example.com", username="testuser")
+        UserProfile.objects.create(user=user, gym=north)
+        self.assertEqual(
+            self.call("list"),
+            "east: in GYM_SHARDS, but there is no such gym\n"
+            "north: 1 members, in database gym_north\n"
+            "south: 0 members, in the default database\n",
+        )
+
+    @override_settings(GYM_SHARDS=[])
+    def test_no_shards(self):
+        with self.assertRaisesMessage(CommandError, "GYM_SHARDS is empty"):
+            self.call("run", "update_recommendations")
+
+    def test_run_for_every_shard(self):
+        shards = {}
+
+        def record_shard(name, *args, stdout):
+            shards[current_shard()] = (name, args)
+            stdout.write("Updated 0 recommendations\n")
+
+        with mock.patch(
+            "workouts.management.commands.shards.call_command",
+            side_effect=record_shard,
+        ):
+            out = self.call("run", "update_recommendations", "a@example.com")
+        self.assertEqual(
+            shards,
+            {
+                "gym_north": ("update_recommendations", ("a@example.com",)),
+                "gym_east": ("update_recommendations", ("a@example.com",)),
+            },
+        )
+        self.assertEqual(
+            out,
+            "north: done\nUpdated 0 recommendations\n"
+            "east: done\nUpdated 0 recommendations\n",
+        )
+
+    def test_run_reports_failures(self):
+        def fail_for_east(name, *args, stdout):
+            if current_shard() == "gym_east":
+                raise CommandError("No user with email a@example.com")
+
+        with mock.patch(
+            "workouts.management.commands.shards.call_command",
+            side_effect=fail_for_east,
+        ):
+            with self.assertRaisesMessage(CommandError, "Failed for east"):
+                self.call("run", "update_recommendations", "a@example.com")
+
+    def test_migrate(self):
+        with override_settings(GYM_SHARD_DIR=Path(tempfile.mkdtemp()) / "gyms"):
+            with mock.patch(
+                "workouts.management.commands.shards.call_command"
+            ) as migrate:
+                self.call("migrate", "--jobs", "1")
+            self.assertTrue(settings.GYM_SHARD_DIR.is_dir())
+        self.assertEqual(
+            sorted(call.kwargs["database"] for call in migrate.call_args_list),
+            ["gym_east", "gym_north"],
+        )
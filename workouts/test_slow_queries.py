@@ -0,0 +1,95 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .models import WorkoutSession
+from .slow_queries import normalize_sql, params_shape
+
+User = get_user_model()
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        self.client.login(email="test@example.com", password="testpass123")
+        self.workout = WorkoutSession.objects.create(user=user, date="2025-10-07")
+
+    def slow_queries(self, logs):
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_logs_view_template_and_source(self):
+        with self.assertLogs("gymtracker.slow_queries") as logs:
+            self.client.get(reverse("workouts:workout_history"))
+
+        entries = self.slow_queries(logs)
+        self.assertTrue(all(e["view"] == "workouts:workout_history" for e in entries))
+        # The paginated sessions are fetched while the template loops over them
+        templates = [e["template"] for e in entries if e["template"]]
+        self.assertTrue(
+            any(t.startswith("workouts/workout_history.html:") for t in templates)
+        )
+        self.assertIn("workouts/views.py", " ".join(str(e["source"]) for e in entries))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_parameters_are_not_logged(self):
+        with self.assertLogs("gymtracker.slow_queries") as logs:
+            WorkoutSession.objects.filter(notes="secret").count()
+        entry = self.slow_queries(logs)[-1]
+        self.assertEqual(entry["params"][0], "str")
+        self.assertNotIn("secret", logs.output[-1])
+
+    def test_fast_queries_are_not_logged(self):
+        with self.assertNoLogs("gymtracker.slow_queries"):
+            WorkoutSession.objects.count()
+
+
+class SlowQueryHelpersTests(SimpleTestCase):
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql(
+                "SELECT *  FROM t WHERE id IN (%s, %s, %s)\n AND name = 'x' LIMIT 21"
+            ),
+            "SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?",
+        )
+
+    def test_params_shape(self):
+        self.assertEqual(params_shape((1, "a", None)), ["int", "str", "NoneType"])
+        self.assertEqual(params_shape({"id": 1}), {"id": "int"})
+        self.assertEqual(
+            params_shape([(1, "a"), (2, "b")], many=True),
+            {"rows": 2, "row": ["int", "str"]},
+        )
+
+
+class SlowQueryReportCommandTests(SimpleTestCase):
+    def test_ranks_normalized_queries_by_total_time(self):
+        lines = [
+            {"sql": "SELECT a FROM t WHERE id = 1", "duration_ms": 150, "view": "v1"},
+            {"sql": "SELECT a FROM t WHERE id = 2", "duration_ms": 150, "view": "v1"},
+            {"sql": "SELECT b FROM u", "duration_ms": 200, "template": "x.html:3"},
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            log = Path(tmp) / "slow_queries.log"
+            log.write_text(
+                "\n".join(json.dumps(line) for line in lines) + "\nnot json\n"
+            )
+            out, err = StringIO(), StringIO()
+            call_command("slow_query_report", str(log), stdout=out, stderr=err)
+
+        report = out.getvalue()
+        self.assertLess(
+            report.index("SELECT a FROM t WHERE id = ?"), report.index("SELECT b")
+        )
+        self.assertIn("300 ms total, 2 calls", report)
+        self.assertIn("views: v1 (2)", report)
+        self.assertIn("from: x.html:3 (1)", report)
+        self.assertIn("Skipped 1", err.getvalue())
@@ -0,0 +1,40 @@
+import os
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from .management.commands.startup_profile import (
+    IMPORTED_MODULES_BUDGET,
+    STARTUP_TIME_BUDGET,
+    measure_startup,
+)
+
+
+class StartupBudgetTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # An empty DSN also overrides one from ~/.env
+        cls.elapsed, modules = measure_startup(
+            env={
+                "BUGSINK_DSN": "",
+                "SESSION_CACHE_DIR": str(settings.CACHES["sessions"]["LOCATION"]),
+            }
+        )
+        cls.modules = [name for name, *_ in modules]
+
+    def test_check_imports_within_budget(self):
+        self.assertLess(len(self.modules), IMPORTED_MODULES_BUDGET)
+
+    def test_check_starts_within_budget(self):
+        # Wall-clock time depends on the machine and its load, so it is only
+        # enforced on request, e.g. on a quiet machine before a release
+        if not os.environ.get("CHECK_STARTUP_TIME"):
+            self.skipTest(
+                f"manage.py check started in {self.elapsed:.2f}s, set "
+                f"CHECK_STARTUP_TIME=1 to enforce the {STARTUP_TIME_BUDGET}s budget"
+            )
+        self.assertLess(self.elapsed, STARTUP_TIME_BUDGET)
+
+    def test_optional_integrations_are_not_imported(self):
+        self.assertNotIn("sentry_sdk", self.modules)
@@ -0,0 +1,259 @@
+import json
+import uuid
+from datetime import date, time
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.urls import reverse
+
+from .models import Exercise, ExerciseRecord, WorkoutSession
+from .sync import apply_sync_batch
+
+User = get_user_model()
+
+
+def record_op(session=None, session_client_id=None, **overrides):
+    op = {
+        "client_id": str(uuid.uuid4()),
+        "weight_kg": "60",
+        "reps": 10,
+        "sets": 3,
+        "difficulty_rating": 6,
+    }
+    if session is not None:
+        op["session"] = session
+    if session_client_id is not None:
+        op["session_client_id"] = session_client_id
+    op.update(overrides)
+    return op
+
+
+class ApplySyncBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        self.bench = Exercise.objects.create(name="Bench Press")
+        self.squat = Exercise.objects.create(name="Squat")
+        self.workout = WorkoutSession.objects.create(user=self.user, date=date.today())
+
+    def test_creates_session_and_records_in_one_batch(self):
+        session_id = str(uuid.uuid4())
+        payload = {
+            "sessions": [
+                {"client_id": session_id, "date": "2025-10-07", "start_time": "18:05"}
+            ],
+            "records": [
+                record_op(session_client_id=session_id, exercise=self.bench.pk),
+                record_op(session_client_id=session_id, exercise=self.squat.pk),
+            ],
+        }
+        changes = apply_sync_batch(self.user, payload)
+
+        session = WorkoutSession.objects.get(client_id=session_id)
+        self.assertEqual(changes["sessions"], {session_id: session.pk})
+        self.assertEqual(session.user, self.user)
+        self.assertEqual(session.start_time.strftime("%H:%M"), "18:05")
+        self.assertEqual(session.exercise_records.count(), 2)
+        self.assertEqual(len(changes["records"]), 2)
+
+    def test_replaying_a_batch_is_idempotent(self):
+        payload = {
+            "records": [
+                record_op(session=self.workout.pk, exercise=self.bench.pk)
+                for _ in range(5)
+            ]
+        }
+        first = apply_sync_batch(self.user, payload)
+        second = apply_sync_batch(self.user, payload)
+
+        self.assertEqual(len(first["records"]), 5)
+        self.assertEqual(second, {"sessions": {}, "records": {}, "rejected": {}})
+        self.assertEqual(self.workout.exercise_records.count(), 5)
+
+    def test_records_can_reference_session_from_earlier_batch(self):
+        session_id = str(uuid.uuid4())
+        apply_sync_batch(
+            self.user,
+            {"sessions": [{"client_id": session_id, "date": "2025-10-07"}]},
+        )
+        changes = apply_sync_batch(
+            self.user,
+            {
+                "records": [
+                    record_op(session_client_id=session_id, exercise=self.bench.pk)
+                ]
+            },
+        )
+        self.assertEqual(len(changes["records"]), 1)
+
+    def test_rejected_ops_do_not_hold_up_the_rest(self):
+        valid = record_op(session=self.workout.pk, exercise=self.bench.pk)
+        invalid = record_op(session=self.workout.pk, exercise=self.bench.pk, reps=0)
+        changes = apply_sync_batch(self.user, {"records": [valid, invalid]})
+
+        self.assertEqual(list(changes["records"]), [valid["client_id"]])
+        self.assertEqual(list(changes["rejected"]), [invalid["client_id"]])
+        self.assertIn("reps", changes["rejected"][invalid["client_id"]])
+        self.assertEqual(self.workout.exercise_records.count(), 1)
+
+    def test_rejects_sessions_of_other_users(self):
+        other = User.objects.create_user(
+            email="other@example.com", username="other", password="testpass123"
+        )
+        other_workout = WorkoutSession.objects.create(user=other, date=date.today())
+        op = record_op(session=other_workout.pk, exercise=self.bench.pk)
+        changes = apply_sync_batch(self.user, {"records": [op]})
+        self.assertIn("unknown session", changes["rejected"][op["client_id"]])
+        self.assertFalse(ExerciseRecord.objects.exists())
+
+    def test_rejects_client_ids_of_other_users(self):
+        other = User.objects.create_user(
+            email="other@example.com", username="other", password="testpass123"
+        )
+        other_workout = WorkoutSession.objects.create(
+            user=other, date=date.today(), client_id=uuid.uuid4()
+        )
+        other_record = ExerciseRecord.objects.create(
+            workout_session=other_workout,
+            exercise=self.bench,
+            weight_kg=60,
+            reps=10,
+            sets=3,
+            difficulty_rating=6,
+            client_id=uuid.uuid4(),
+        )
+        session_op = {"client_id": str(other_workout.client_id), "date": "2025-10-07"}
+        other_op = record_op(
+            session=self.workout.pk,
+            exercise=self.bench.pk,
+            client_id=str(other_record.client_id),
+        )
+        changes = apply_sync_batch(
+            self.user, {"sessions": [session_op], "records": [other_op]}
+        )
+
+        self.assertEqual(
+            changes["rejected"],
+            {
+                session_op["client_id"]: f"Session {other_workout.client_id} is "
+                "already in use",
+                other_op["client_id"]: f"Record {other_record.client_id} is "
+                "already in use",
+            },
+        )
+        self.assertFalse(self.workout.exercise_records.exists())
+
+    def test_sessions_keep_their_start_time(self):
+        ops = [
+            {"client_id": str(uuid.uuid4()), "date": "2025-10-07", "start_time": time}
+            for time in ("07:30:15", "18:05:00")
+        ]
+        # savepoint, known sessions, insert, release
+        with self.assertNumQueries(4):
+            changes = apply_sync_batch(self.user, {"sessions": ops})
+        self.assertEqual(
+            sorted(
+                WorkoutSession.objects.filter(
+                    pk__in=changes["sessions"].values()
+                ).values_list("start_time", flat=True)
+            ),
+            [time(7, 30, 15), time(18, 5)],
+        )
+
+    def test_rejects_malformed_payload(self):
+        for payload in (
+            [],
+            {"records": "nope"},
+            {"records": ["nope"]},
+        ):
+            with self.subTest(payload=payload):
+                with self.assertRaises(ValidationError):
+                    apply_sync_batch(self.user, payload)
+
+    def test_rejects_malformed_ops(self):
+        malformed = record_op(session=[1], exercise=self.bench.pk)
+        changes = apply_sync_batch(
+            self.user, {"records": [{"client_id": "not-a-uuid"}, malformed]}
+        )
+        self.assertEqual(
+            changes["rejected"],
+            {
+                "not-a-uuid": "Invalid client_id: 'not-a-uuid'",
+                malformed["client_id"]: "Invalid session id: [1]",
+            },
+        )
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        payload = {
+            "records": [
+                record_op(session=self.workout.pk, exercise=self.bench.pk)
+                for _ in range(30)
+            ]
+        }
+        # savepoint, session check, exercises, known records, bulk insert,
+        # session touch, feed recipients, the exercise's recommendation (top
+        # sets, upsert, stale rows), release
+        with self.assertNumQueries(11):
+            apply_sync_batch(self.user, payload)
+
+
+class SyncViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        self.exercise = Exercise.objects.create(name="Bench Press")
+        self.workout = WorkoutSession.objects.create(user=self.user, date=date.today())
+        self.url = reverse("workouts:sync")
+
+    def post_json(self, payload):
+        return self.client.post(
+            self.url, json.dumps(payload), content_type="application/json"
+        )
+
+    def test_requires_login(self):
+        response = self.post_json({})
+        self.assertEqual(response.status_code, 403)
+
+    def test_sync_returns_created_ids(self):
+        self.client.login(email="test@example.com", password="testpass123")
+        op = record_op(session=self.workout.pk, exercise=self.exercise.pk)
+        response = self.post_json({"records": [op]})
+        self.assertEqual(response.status_code, 200)
+        record = ExerciseRecord.objects.get(client_id=op["client_id"])
+        self.assertEqual(response.json()["records"], {op["client_id"]: record.pk})
+
+    def test_invalid_payload_returns_400(self):
+        self.client.login(email="test@example.com", password="testpass123")
+        response = self.client.post(
+            self.url, "not json", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.post_json({"records": "nope"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("must be lists", response.json()["error"])
+
+    def test_rejected_ops_are_reported(self):
+        self.client.login(email="test@example.com", password="testpass123")
+        op = record_op(session=self.workout.pk)
+        response = self.post_json({"records": [op]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "sessions": {},
+                "records": {},
+                "rejected": {
+                    op["client_id"]: f"Record {op['client_id']} has an unknown exercise"
+                },
+            },
+        )
+
+    def test_service_worker_served_from_root(self):
+        response = self.client.get(reverse("workouts:service_worker"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/javascript")
+        self.assertEqual(response["Cache-Control"], "no-cache")
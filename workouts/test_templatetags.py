@@ -25,6 +25,11 @@ class DurationFilterTests(TestCase):
         result = duration_format(duration)
         self.assertEqual(result, "1:00")
 
+    def test_duration_format_seconds(self):
+        """Test formatting a number of seconds"""
+        self.assertEqual(duration_format(9465), "2:37")
+        self.assertEqual(duration_format(2730), "45m")
+
     def test_duration_format_none(self):
         """Test formatting None duration"""
         result = duration_format(None)
@@ -1,15 +1,48 @@
-from django.test import TestCase, Client
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
-from django.urls import reverse
+from django.urls import include, path, reverse
 from django.utils.formats import date_format
 from datetime import date, time, timedelta
 from decimal import Decimal
 
-from .models import Exercise, WorkoutSession, ExerciseRecord, UserProfile
-from .views import AddExerciseToWorkoutView
+from .models import (
+    Exercise,
+    ExerciseRecommendation,
+    WorkoutSession,
+    ExerciseRecord,
+    UserProfile,
+    FeedEntry,
+)
+from .recommendations import update_recommendations
+from .views import (
+    AsyncAddExerciseToWorkoutView,
+    AsyncDashboardView,
+    DashboardView,
+    AsyncWorkoutSessionDetailView,
+)
 
 User = get_user_model()
 
+# The async views next to the regular ones, for AsyncViewTests
+urlpatterns = [
+    path("async/", AsyncDashboardView.as_view(), name="async_dashboard"),
+    path(
+        "async/workout/<int:pk>/",
+        AsyncWorkoutSessionDetailView.as_view(),
+        name="async_workout_detail",
+    ),
+    path(
+        "async/workout/<int:pk>/add-exercise/",
+        AsyncAddExerciseToWorkoutView.as_view(),
+        name="async_add_exercise",
+    ),
+    path("", include("gymtracker.urls")),
+]
+
 
 class ViewTests(TestCase):
     def setUp(self):
@@ -30,6 +63,19 @@ class ViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Welcome back")
 
+    def test_dashboard_sums_time_trained_this_year(self):
+        WorkoutSession.objects.filter(pk=self.workout.pk).update(
+            start_time=time(9, 0), end_time=time(10, 30)
+        )
+        last_year = date.today().replace(month=1, day=1) - timedelta(days=1)
+        WorkoutSession.objects.create(
+            user=self.user, date=last_year, end_time=time(23, 59)
+        )
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("workouts:dashboard"))
+        self.assertEqual(response.context["seconds_trained_this_year"], 5400)
+        self.assertContains(response, "1:30")
+
     def test_create_workout_requires_login(self):
         response = self.client.get(reverse("workouts:create_workout"))
         self.assertEqual(response.status_code, 302)
@@ -64,6 +110,22 @@ class ViewTests(TestCase):
         expected_date = date_format(self.workout.date, "DATE_FORMAT")
         self.assertContains(response, expected_date)
 
+    def test_workout_detail_total_volume(self):
+        for weight in ["62.5", "0.25"]:
+            ExerciseRecord.objects.create(
+                workout_session=self.workout,
+                exercise=self.exercise,
+                weight_kg=Decimal(weight),
+                reps=8,
+                sets=3,
+                difficulty_rating=6,
+            )
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("workouts:workout_detail", kwargs={"pk": self.workout.pk})
+        )
+        self.assertEqual(response.context["total_volume"], 1506)
+
     def test_add_exercise_requires_login(self):
         response = self.client.get(
             reverse("workouts:add_exercise", kwargs={"pk": self.workout.pk})
@@ -153,6 +215,16 @@ class ViewTests(TestCase):
         self.workout.refresh_from_db()
         self.assertTrue(self.workout.is_completed)
 
+    def test_complete_workout_defaults_to_now(self):
+        self.client.login(email="test@example.com", password="testpass123")
+        self.client.post(
+            reverse("workouts:complete_workout", kwargs={"pk": self.workout.pk}),
+            {"is_completed": True},
+        )
+        self.workout.refresh_from_db()
+        # The start time is local time, so the end time must be as well
+        self.assertLess(self.workout.duration_seconds, 60)
+
 
 class IntegrationTests(TestCase):
     def setUp(self):
@@ -212,7 +284,7 @@ class IntegrationTests(TestCase):
 
 
 class AddExerciseToWorkoutViewTests(TestCase):
-    """Test the AddExerciseToWorkoutView, especially the _get_recommended_weight method"""
+    """Test the AddExerciseToWorkoutView, especially its weight recommendations"""
 
     def setUp(self):
         self.user = User.objects.create_user(
@@ -220,81 +292,6 @@ class AddExerciseToWorkoutViewTests(TestCase):
         )
         self.exercise = Exercise.objects.create(name="Bench Press")
         self.workout = WorkoutSession.objects.create(user=self.user, date=date.today())
-        self.view = AddExerciseToWorkoutView()
-        self.view.request = type("MockRequest", (), {"user": self.user})()
-
-    def test_get_recommended_weight_no_previous_record(self):
-        """Test recommendation when there's no previous record"""
-        result = self.view._get_recommended_weight(None)
-        self.assertEqual(result, 0)
-
-    def test_get_recommended_weight_easy_difficulty(self):
-        """Test recommendation for easy difficulty (1-5) - should increase weight"""
-        last_record = ExerciseRecord.objects.create(
-            workout_session=self.workout,
-            exercise=self.exercise,
-            weight_kg=Decimal("80.0"),
-            reps=10,
-            sets=3,
-            difficulty_rating=3,  # Easy
-        )
-        result = self.view._get_recommended_weight(last_record)
-        self.assertEqual(result, Decimal("82.5"))  # 80 + 2.5
-
-    def test_get_recommended_weight_moderate_difficulty(self):
-        """Test recommendation for moderate difficulty (6-7) - should keep same weight"""
-        last_record = ExerciseRecord.objects.create(
-            workout_session=self.workout,
-            exercise=self.exercise,
-            weight_kg=Decimal("80.0"),
-            reps=10,
-            sets=3,
-            difficulty_rating=6,  # Moderate
-        )
-        result = self.view._get_recommended_weight(last_record)
-        self.assertEqual(result, Decimal("80.0"))  # Same weight
-
-    def test_get_recommended_weight_hard_difficulty(self):
-        """Test recommendation for hard difficulty (8-10) - should decrease weight"""
-        last_record = ExerciseRecord.objects.create(
-            workout_session=self.workout,
-            exercise=self.exercise,
-            weight_kg=Decimal("80.0"),
-            reps=10,
-            sets=3,
-            difficulty_rating=9,  # Very hard
-        )
-        result = self.view._get_recommended_weight(last_record)
-        self.assertEqual(result, Decimal("77.5"))  # 80 - 2.5
-
-    def test_get_recommended_weight_hard_difficulty_minimum_zero(self):
-        """Test that weight doesn't go below 0 for hard difficulty"""
-        last_record = ExerciseRecord.objects.create(
-            workout_session=self.workout,
-            exercise=self.exercise,
-            weight_kg=Decimal("1.0"),
-            reps=10,
-            sets=3,
-            difficulty_rating=10,  # Maximum difficulty
-        )
-        result = self.view._get_recommended_weight(last_record)
-        self.assertEqual(result, Decimal("0.0"))  # max(0, 1.0 - 2.5) = 0
-
-    def test_get_recommended_weight_with_none_weight(self):
-        """Test recommendation when weight_kg is None (edge case)"""
-        # Create a record with None weight (this shouldn't happen in normal operation)
-        last_record = ExerciseRecord.objects.create(
-            workout_session=self.workout,
-            exercise=self.exercise,
-            weight_kg=Decimal("80.0"),
-            reps=10,
-            sets=3,
-            difficulty_rating=5,
-        )
-        # Manually set weight to None to simulate the edge case
-        last_record.weight_kg = None
-        result = self.view._get_recommended_weight(last_record)
-        self.assertEqual(result, 0)  # Should return 0 for None weight
 
     def test_add_exercise_view_with_recommendations(self):
         """Test that the add exercise view works with exercise recommendations"""
@@ -307,6 +304,7 @@ class AddExerciseToWorkoutViewTests(TestCase):
             sets=3,
             difficulty_rating=5,
         )
+        update_recommendations(self.user)
 
         # Test that the view loads without errors
         self.client.login(email="test@example.com", password="testpass123")
@@ -326,6 +324,119 @@ class AddExerciseToWorkoutViewTests(TestCase):
         self.assertEqual(recommendation["last_difficulty"], 5)
         self.assertEqual(recommendation["recommended_weight"], Decimal("82.5"))
 
+    def test_form_posts_with_htmx(self):
+        self.client.login(email="test@example.com", password="testpass123")
+        url = reverse("workouts:add_exercise", kwargs={"pk": self.workout.pk})
+        response = self.client.get(url)
+        self.assertContains(response, f'hx-post="{url}"')
+        self.assertContains(response, 'id="new-exercise-records"')
+        # The target of the stats swapped in when a record is added
+        self.assertContains(response, 'id="workout-stats"')
+
+
+class RepeatWorkoutViewTests(TestCase):
+    """Test starting a workout with the exercises of an earlier one"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com", username="testuser")
+        self.bench = Exercise.objects.create(name="Bench Press")
+        self.squat = Exercise.objects.create(name="Squat")
+        self.workout = WorkoutSession.objects.create(
+            user=self.user, date=date.today() - timedelta(days=7), is_completed=True
+        )
+        for exercise, weight_kg, reps in [
+            (self.bench, "60", 12),
+            (self.bench, "80", 8),
+            (self.squat, "100", 5),
+        ]:
+            ExerciseRecord.objects.create(
+                workout_session=self.workout,
+                exercise=exercise,
+                weight_kg=Decimal(weight_kg),
+                reps=reps,
+                sets=3,
+                difficulty_rating=5,
+            )
+        update_recommendations(self.user)
+        self.url = reverse("workouts:repeat_workout", kwargs={"pk": self.workout.pk})
+        self.client.force_login(self.user)
+
+    def test_repeat_workout(self):
+        response = self.client.post(self.url)
+
+        workout = WorkoutSession.objects.get(user=self.user, date=date.today())
+        batch_url = reverse("workouts:batch_add_exercises", kwargs={"pk": workout.pk})
+        self.assertRedirects(response, f"{batch_url}?repeat={self.workout.pk}")
+        self.assertFalse(workout.is_completed)
+        # Nothing is logged until the sets are submitted
+        self.assertFalse(workout.exercise_records.exists())
+        self.assertFalse(FeedEntry.objects.exists())
+
+    def test_repeat_prefills_batch_form(self):
+        # Bench press is recommended at 82.5kg
+        ExerciseRecommendation.objects.filter(exercise=self.squat).delete()
+        workout = WorkoutSession.objects.create(user=self.user, date=date.today())
+        response = self.client.get(
+            reverse("workouts:batch_add_exercises", kwargs={"pk": workout.pk}),
+            {"repeat": self.workout.pk},
+        )
+
+        formset = response.context["formset"]
+        self.assertEqual(
+            formset.initial,
+            [
+                # Lighter sets stay as much lighter than the recommendation
+                {
+                    "exercise": self.bench.pk,
+                    "weight_kg": Decimal("62.5"),
+                    "reps": 12,
+                    "sets": 3,
+                },
+                {
+                    "exercise": self.bench.pk,
+                    "weight_kg": Decimal("82.5"),
+                    "reps": 8,
+                    "sets": 3,
+                },
+                # No recommendation yet, the same weight as last time
+                {
+                    "exercise": self.squat.pk,
+                    "weight_kg": Decimal("100"),
+                    "reps": 5,
+                    "sets": 3,
+                },
+            ],
+        )
+        # The prefilled rows and the usual blank ones, all optional
+        self.assertEqual(len(formset.forms), 8)
+        self.assertEqual(formset.initial_form_count(), 0)
+        self.assertNotContains(response, "hx-post")
+
+    def test_repeat_of_unknown_workout(self):
+        other = User.objects.create(email="other@example.com", username="other")
+        other_workout = WorkoutSession.objects.create(user=other, date=date.today())
+        url = reverse("workouts:batch_add_exercises", kwargs={"pk": self.workout.pk})
+        for repeat in (other_workout.pk, "nope"):
+            with self.subTest(repeat=repeat):
+                response = self.client.get(url, {"repeat": repeat})
+                self.assertEqual(response.status_code, 404)
+
+    def test_repeat_workout_detail_button(self):
+        response = self.client.get(
+            reverse("workouts:workout_detail", kwargs={"pk": self.workout.pk})
+        )
+        self.assertContains(response, self.url)
+
+    def test_repeat_requires_post(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.assertFalse(WorkoutSession.objects.filter(date=date.today()).exists())
+
+    def test_cannot_repeat_other_users_workout(self):
+        other = User.objects.create(email="other@example.com", username="other")
+        self.client.force_login(other)
+        self.assertEqual(self.client.post(self.url).status_code, 404)
+        self.assertFalse(WorkoutSession.objects.filter(date=date.today()).exists())
+
 
 class WorkoutDetailViewTests(TestCase):
     """Test the WorkoutDetailView with smart exercise list functionality"""
@@ -498,3 +609,676 @@ class UserManagementTests(TestCase):
         # Should still be superuser
         self.superuser.refresh_from_db()
         self.assertTrue(self.superuser.is_superuser)
+
+
+class BatchAddExercisesViewTests(TestCase):
+    """Test logging several exercise records in one submission"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        self.bench = Exercise.objects.create(name="Bench Press")
+        self.squat = Exercise.objects.create(name="Squat")
+        self.workout = WorkoutSession.objects.create(user=self.user, date=date.today())
+        self.url = reverse(
+            "workouts:batch_add_exercises", kwargs={"pk": self.workout.pk}
+        )
+        self.client.login(email="test@example.com", password="testpass123")
+
+    def batch_data(self, rows, total_forms=5):
+        data = {
+            "form-TOTAL_FORMS": str(total_forms),
+            "form-INITIAL_FORMS": "0",
+            "form-MIN_NUM_FORMS": "0",
+            "form-MAX_NUM_FORMS": "30",
+        }
+        for index in range(total_forms):
+            # Browsers submit the prefilled sets value of untouched rows
+            data[f"form-{index}-sets"] = "1"
+        for index, row in enumerate(rows):
+            for field, value in row.items():
+                data[f"form-{index}-{field}"] = value
+        return data
+
+    def row(self, exercise, weight="60", reps="10", sets="1", difficulty="6"):
+        return {
+            "exercise": exercise.pk,
+            "weight_kg": weight,
+            "reps": reps,
+            "sets": sets,
+            "difficulty_rating": difficulty,
+        }
+
+    def test_batch_form_renders(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "form-TOTAL_FORMS")
+
+    def test_batch_post_creates_all_rows(self):
+        rows = [self.row(self.bench), self.row(self.squat, weight="100", sets="3")]
+        response = self.client.post(self.url, self.batch_data(rows))
+        self.assertRedirects(
+            response, reverse("workouts:workout_detail", kwargs={"pk": self.workout.pk})
+        )
+        self.assertEqual(self.workout.exercise_records.count(), 2)
+        squat = self.workout.exercise_records.get(exercise=self.squat)
+        self.assertEqual(squat.weight_kg, Decimal("100"))
+        self.assertEqual(squat.sets, 3)
+
+    def test_htmx_post_returns_only_new_rows(self):
+        rows = [self.row(self.bench), self.row(self.squat)]
+        response = self.client.post(
+            self.url, self.batch_data(rows), headers={"HX-Request": "true"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "workouts/partials/exercise_record_rows.html")
+        self.assertTemplateNotUsed(response, "base.html")
+        self.assertContains(response, "Bench Press")
+        self.assertContains(response, "Squat")
+
+    def test_invalid_row_saves_nothing(self):
+        rows = [self.row(self.bench), self.row(self.squat, reps="0")]
+        response = self.client.post(
+            self.url, self.batch_data(rows), headers={"HX-Request": "true"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["HX-Retarget"], "#batch-form")
+        self.assertFalse(self.workout.exercise_records.exists())
+
+    def test_empty_submission_is_rejected(self):
+        response = self.client.post(self.url, self.batch_data([]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Fill in at least one exercise.")
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def post(count):
+            rows = [self.row(self.bench) for _ in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(
+                    self.url,
+                    self.batch_data(rows, total_forms=count),
+                    headers={"HX-Request": "true"},
+                )
+            return len(queries)
+
+        self.assertEqual(post(2), post(10))
+
+    def test_cannot_log_to_other_users_workout(self):
+        other = User.objects.create_user(
+            email="other@example.com", username="other", password="testpass123"
+        )
+        other_workout = WorkoutSession.objects.create(user=other, date=date.today())
+        response = self.client.post(
+            reverse("workouts:batch_add_exercises", kwargs={"pk": other_workout.pk}),
+            self.batch_data([self.row(self.bench)]),
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        self.exercise = Exercise.objects.create(name="Bench Press")
+        self.workout = WorkoutSession.objects.create(user=self.user, date=date.today())
+        self.client.login(email="test@example.com", password="testpass123")
+        self.urls = [
+            reverse("workouts:dashboard"),
+            reverse("workouts:workout_history"),
+            reverse("workouts:workout_detail", kwargs={"pk": self.workout.pk}),
+        ]
+
+    def add_record(self):
+        return ExerciseRecord.objects.create(
+            workout_session=self.workout,
+            exercise=self.exercise,
+            weight_kg=Decimal("60.00"),
+            reps=10,
+            difficulty_rating=6,
+        )
+
+    def test_unchanged_pages_return_304(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("private", response["Cache-Control"])
+                self.assertIn("no-cache", response["Cache-Control"])
+
+                response = self.client.get(
+                    url, headers={"if-none-match": response["ETag"]}
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_304_costs_one_query(self):
+        url = self.urls[-1]
+        etag = self.client.get(url)["ETag"]
+        # The user lookup for authentication, the session comes from the
+        # cache, then the version query
+        with self.assertNumQueries(2):
+            response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_with_exercise_records(self):
+        etags = [self.client.get(url)["ETag"] for url in self.urls]
+
+        record = self.add_record()
+        after_add = [self.client.get(url)["ETag"] for url in self.urls]
+        record.delete()
+        after_delete = [self.client.get(url)["ETag"] for url in self.urls]
+
+        for before, added, deleted in zip(etags, after_add, after_delete):
+            self.assertNotEqual(before, added)
+            self.assertNotEqual(added, deleted)
+
+    def test_etag_changes_with_new_exercise(self):
+        url = self.urls[-1]
+        etag = self.client.get(url)["ETag"]
+        Exercise.objects.create(name="Squat")
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Squat")
+
+    def test_etag_changes_with_edited_exercise(self):
+        url = self.urls[-1]
+        self.add_record()
+        etag = self.client.get(url)["ETag"]
+        self.exercise.name = "Incline Bench Press"
+        self.exercise.save()
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Incline Bench Press")
+
+    def test_etag_changes_with_partner_profiles(self):
+        partner = User.objects.create_user(
+            email="partner@example.com", username="partner", password="testpass123"
+        )
+        etags = [self.client.get(self.urls[0])["ETag"]]
+        profile = UserProfile.objects.create(
+            user=partner, default_workout_partner=self.user
+        )
+        etags.append(self.client.get(self.urls[0])["ETag"])
+        profile.name = "Pat"
+        profile.save()
+        etags.append(self.client.get(self.urls[0])["ETag"])
+        self.assertEqual(len(set(etags)), 3)
+
+    def test_etag_changes_when_partner_deletes_an_older_session(self):
+        partner = User.objects.create_user(
+            email="partner@example.com", username="partner", password="testpass123"
+        )
+        UserProfile.objects.create(user=partner, default_workout_partner=self.user)
+        older = WorkoutSession.objects.create(
+            user=partner, date=date.today() - timedelta(days=7)
+        )
+        WorkoutSession.objects.create(user=partner, date=date.today())
+        etag = self.client.get(self.urls[0])["ETag"]
+        older.delete()
+        response = self.client.get(self.urls[0], headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_etags_are_per_user(self):
+        etag = self.client.get(self.urls[0])["ETag"]
+        User.objects.create_user(
+            email="other@example.com", username="other", password="testpass123"
+        )
+        self.client.login(email="other@example.com", password="testpass123")
+        response = self.client.get(self.urls[0], headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_pending_messages_are_rendered(self):
+        etag = self.client.get(self.urls[0])["ETag"]
+        response = self.client.post(
+            reverse("workouts:complete_workout", kwargs={"pk": self.workout.pk}),
+            {"end_time": "19:00", "notes": ""},
+        )
+        self.assertRedirects(response, self.urls[0], fetch_redirect_response=False)
+        response = self.client.get(self.urls[0], headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Workout completed!")
+
+
+class HtmxExerciseRecordChangeTests(TestCase):
+    """HTMX requests that change a record get its row and the workout's stats"""
+
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com", username="testuser")
+        self.bench = Exercise.objects.create(name="Bench Press")
+        self.squat = Exercise.objects.create(name="Squat")
+        self.workout = WorkoutSession.objects.create(user=self.user, date=date.today())
+        self.record = ExerciseRecord.objects.create(
+            workout_session=self.workout,
+            exercise=self.bench,
+            weight_kg=Decimal("80"),
+            reps=10,
+            sets=3,
+            difficulty_rating=6,
+        )
+        ExerciseRecord.objects.create(
+            workout_session=self.workout,
+            exercise=self.squat,
+            weight_kg=Decimal("100"),
+            reps=5,
+            difficulty_rating=8,
+        )
+        self.edit_url = reverse(
+            "workouts:edit_exercise",
+            kwargs={"workout_pk": self.workout.pk, "pk": self.record.pk},
+        )
+        self.client.force_login(self.user)
+
+    def record_data(self, **overrides):
+        return {
+            "exercise": self.bench.pk,
+            "weight_kg": "85",
+            "reps": "10",
+            "sets": "3",
+            "difficulty_rating": "7",
+            **overrides,
+        }
+
+    def assertStats(self, response, record_count, total_volume):
+        self.assertContains(response, 'id="workout-stats"')
+        self.assertContains(response, 'hx-swap-oob="true"')
+        self.assertContains(
+            response, f'<div class="stats-number">{record_count}</div>', count=2
+        )
+        self.assertContains(
+            response, f'<div class="stats-number">{total_volume}</div>', count=1
+        )
+
+    def test_edit_form_replaces_the_row(self):
+        response = self.client.get(self.edit_url, headers={"HX-Request": "true"})
+        self.assertContains(response, f'id="exercise-record-{self.record.pk}"')
+        self.assertContains(response, f'hx-post="{self.edit_url}"')
+        self.assertNotContains(response, "<html")
+
+    def test_edit(self):
+        # The user, the record, the exercise and its check, the update, the
+        # session's touch and the stats, but not the whole workout page
+        with self.assertNumQueries(7):
+            response = self.client.post(
+                self.edit_url, self.record_data(), headers={"HX-Request": "true"}
+            )
+        self.assertContains(response, f'id="exercise-record-{self.record.pk}"')
+        self.assertContains(response, "<strong>85kg</strong>")
+        # 85 × 10 × 3 + 100 × 5
+        self.assertStats(response, 2, 3050)
+        self.assertNotContains(response, "<html")
+        self.record.refresh_from_db()
+        self.assertEqual(self.record.weight_kg, Decimal("85"))
+
+    def test_invalid_edit_shows_the_form_again(self):
+        response = self.client.post(
+            self.edit_url, self.record_data(reps="0"), headers={"HX-Request": "true"}
+        )
+        self.assertContains(response, f'hx-post="{self.edit_url}"')
+        self.assertContains(response, "text-danger")
+        self.assertNotContains(response, "workout-stats")
+
+    def test_delete(self):
+        url = reverse(
+            "workouts:delete_exercise",
+            kwargs={"workout_pk": self.workout.pk, "pk": self.record.pk},
+        )
+        # The user, the record, the delete, the session's touch and the stats
+        with self.assertNumQueries(5):
+            response = self.client.post(url, headers={"HX-Request": "true"})
+        self.assertNotContains(response, "exercise-record-")
+        self.assertStats(response, 1, 500)
+        self.assertNotContains(response, "no-exercise-records")
+        self.assertFalse(ExerciseRecord.objects.filter(pk=self.record.pk).exists())
+
+    def test_deleting_the_last_record_shows_the_placeholder(self):
+        for record in self.workout.exercise_records.all():
+            response = self.client.post(
+                reverse(
+                    "workouts:delete_exercise",
+                    kwargs={"workout_pk": self.workout.pk, "pk": record.pk},
+                ),
+                headers={"HX-Request": "true"},
+            )
+        # The count and the volume are both 0
+        self.assertContains(response, '<div class="stats-number">0</div>', count=3)
+        self.assertContains(
+            response,
+            '<div id="no-exercise-records" class="text-center py-4" '
+            'hx-swap-oob="true"><p class="text-muted">No exercises added yet.</p>'
+            "</div>",
+            html=True,
+        )
+
+    def test_add(self):
+        # As for an edit, with the session instead of the record, and the
+        # feed's recipients
+        with self.assertNumQueries(8):
+            response = self.client.post(
+                reverse("workouts:add_exercise", kwargs={"pk": self.workout.pk}),
+                self.record_data(exercise=self.squat.pk, weight_kg="110", sets="1"),
+                headers={"HX-Request": "true"},
+            )
+        record = ExerciseRecord.objects.latest("pk")
+        self.assertContains(response, f'id="exercise-record-{record.pk}"')
+        self.assertStats(response, 3, 4000)
+
+    def test_invalid_add_shows_the_form_again(self):
+        response = self.client.post(
+            reverse("workouts:add_exercise", kwargs={"pk": self.workout.pk}),
+            self.record_data(reps="0"),
+            headers={"HX-Request": "true"},
+        )
+        self.assertContains(response, 'id="add-exercise-form"')
+        self.assertContains(response, "text-danger")
+        self.assertEqual(response["HX-Retarget"], "#add-exercise-form")
+        self.assertEqual(response["HX-Reswap"], "outerHTML")
+        self.assertNotContains(response, "workout-stats")
+        self.assertEqual(self.workout.exercise_records.count(), 2)
+
+    def test_without_htmx_redirects(self):
+        response = self.client.post(self.edit_url, self.record_data())
+        self.assertRedirects(
+            response,
+            reverse("workouts:workout_detail", kwargs={"pk": self.workout.pk}),
+            fetch_redirect_response=False,
+        )
+
+
+class ExerciseRecordTouchesSessionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        self.exercise = Exercise.objects.create(name="Bench Press")
+        self.workout = WorkoutSession.objects.create(user=self.user, date=date.today())
+        self.client.login(email="test@example.com", password="testpass123")
+
+    def test_batch_add_touches_session(self):
+        before = self.workout.updated_at
+        self.client.post(
+            reverse("workouts:batch_add_exercises", kwargs={"pk": self.workout.pk}),
+            {
+                "form-TOTAL_FORMS": "1",
+                "form-INITIAL_FORMS": "0",
+                "form-0-exercise": self.exercise.pk,
+                "form-0-weight_kg": "60",
+                "form-0-reps": "10",
+                "form-0-sets": "1",
+                "form-0-difficulty_rating": "6",
+            },
+        )
+        self.workout.refresh_from_db()
+        self.assertGreater(self.workout.updated_at, before)
+
+
+class PartnerActivityFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        self.partner = User.objects.create_user(
+            email="partner@example.com", username="partner", password="testpass123"
+        )
+        UserProfile.objects.create(
+            user=self.user, name="Olivia", default_workout_partner=self.partner
+        )
+        self.exercise = Exercise.objects.create(name="Bench Press")
+        self.workout = WorkoutSession.objects.create(user=self.user, date=date.today())
+
+    def test_dashboard_shows_partner_activity(self):
+        ExerciseRecord.objects.create(
+            workout_session=self.workout,
+            exercise=self.exercise,
+            weight_kg=Decimal("60.00"),
+            reps=10,
+            difficulty_rating=6,
+        )
+        self.client.force_login(self.partner)
+        response = self.client.get(reverse("workouts:dashboard"))
+        self.assertContains(response, "Partner Activity")
+        self.assertContains(response, "<strong>Olivia</strong> Bench Press 60kg × 10")
+        self.assertContains(
+            response, reverse("workouts:workout_detail", kwargs={"pk": self.workout.pk})
+        )
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("workouts:dashboard"))
+        self.assertNotContains(response, "<strong>Olivia</strong>")
+
+    def test_completing_workout_is_announced_once(self):
+        self.client.force_login(self.user)
+        url = reverse("workouts:complete_workout", kwargs={"pk": self.workout.pk})
+        self.client.post(url, {"end_time": "14:30"})
+        self.client.post(url, {"end_time": "14:45", "notes": "Typo fixed"})
+        entry = FeedEntry.objects.for_user(self.partner).get()
+        self.assertEqual(entry.kind, FeedEntry.SESSION_COMPLETED)
+
+    def test_batch_add_is_announced(self):
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse("workouts:batch_add_exercises", kwargs={"pk": self.workout.pk}),
+            {
+                "form-TOTAL_FORMS": "2",
+                "form-INITIAL_FORMS": "0",
+                "form-0-exercise": self.exercise.pk,
+                "form-0-weight_kg": "60",
+                "form-0-reps": "10",
+                "form-0-sets": "1",
+                "form-0-difficulty_rating": "6",
+                "form-1-exercise": self.exercise.pk,
+                "form-1-weight_kg": "65",
+                "form-1-reps": "8",
+                "form-1-sets": "2",
+                "form-1-difficulty_rating": "7",
+            },
+        )
+        self.assertCountEqual(
+            FeedEntry.objects.for_user(self.partner).values_list("summary", flat=True),
+            ["Bench Press 60kg × 10", "Bench Press 65kg × 8 (2 sets)"],
+        )
+
+    def test_feed_is_read_in_one_query(self):
+        for _ in range(3):
+            FeedEntry.objects.session_completed(self.workout)
+        view = DashboardView()
+        view.setup(RequestFactory().get("/"))
+        view.request.user = self.partner
+        with self.assertNumQueries(1):
+            entries = list(view.get_querysets()["partner_activity"])
+            self.assertEqual(len(entries), 3)
+            self.assertEqual(entries[0].actor.profile.display_name, "Olivia")
+
+
+class WorkoutRowFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        self.exercise = Exercise.objects.create(name="Bench Press")
+        self.workout = WorkoutSession.objects.create(
+            user=self.user, date=date.today(), notes="Leg day"
+        )
+        self.client.login(email="test@example.com", password="testpass123")
+        self.urls = [reverse("workouts:dashboard"), reverse("workouts:workout_history")]
+
+    def test_rows_are_served_from_cache_until_session_changes(self):
+        for url in self.urls:
+            self.client.get(url)
+
+        # Bypasses save(), so updated_at and the cached rows stay as they were
+        WorkoutSession.objects.filter(pk=self.workout.pk).update(is_completed=True)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), "In Progress")
+
+        WorkoutSession.objects.filter(pk=self.workout.pk).touch()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, "Completed")
+                self.assertNotContains(response, "In Progress")
+
+    def test_adding_records_refreshes_exercise_count(self):
+        self.assertContains(self.client.get(self.urls[1]), "0 exercises")
+        ExerciseRecord.objects.create(
+            workout_session=self.workout,
+            exercise=self.exercise,
+            weight_kg=Decimal("60.00"),
+            reps=10,
+            difficulty_rating=6,
+        )
+        self.assertContains(self.client.get(self.urls[1]), "1 exercises")
+
+    def test_cached_rows_need_no_queries_per_row(self):
+        for day in range(1, 6):
+            WorkoutSession.objects.create(
+                user=self.user, date=date.today() - timedelta(days=day)
+            )
+        self.client.get(self.urls[1])
+        with CaptureQueriesContext(connection) as warm:
+            self.client.get(self.urls[1])
+        for day in range(6, 16):
+            WorkoutSession.objects.create(
+                user=self.user, date=date.today() - timedelta(days=day)
+            )
+        self.client.get(self.urls[1])
+        with CaptureQueriesContext(connection) as more_rows:
+            self.client.get(self.urls[1])
+        self.assertEqual(len(warm), len(more_rows))
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewTests(TestCase):
+    """The async views show the same pages as the regular ones"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        self.bench = Exercise.objects.create(name="Bench Press")
+        self.squat = Exercise.objects.create(name="Squat")
+        self.workout = WorkoutSession.objects.create(user=self.user, date=date.today())
+        old_workout = WorkoutSession.objects.create(
+            user=self.user, date=date.today() - timedelta(days=7)
+        )
+        for workout, exercise in [
+            (old_workout, self.bench),
+            (old_workout, self.squat),
+            (self.workout, self.bench),
+        ]:
+            ExerciseRecord.objects.create(
+                workout_session=workout,
+                exercise=exercise,
+                weight_kg=Decimal("60.00"),
+                reps=10,
+                difficulty_rating=4,
+            )
+        update_recommendations(self.user)
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+
+    def assertSameContext(self, response, async_response, keys):
+        self.assertEqual(async_response.status_code, 200)
+        for key in keys:
+            with self.subTest(key=key):
+                expected = response.context[key]
+                actual = async_response.context[key]
+                if hasattr(expected, "__iter__"):
+                    expected, actual = list(expected), list(actual)
+                self.assertEqual(actual, expected)
+
+    async def test_dashboard(self):
+        response = await self.async_client.get(reverse("async_dashboard"))
+        self.assertContains(response, "Welcome back")
+        self.assertSameContext(
+            await self.sync_get(reverse("workouts:dashboard")),
+            response,
+            [
+                "recent_workouts",
+                "today_workout",
+                "recent_workouts_count",
+                "seconds_trained_this_year",
+                "recent_exercises",
+            ],
+        )
+
+    async def test_workout_detail(self):
+        response = await self.async_client.get(
+            reverse("async_workout_detail", kwargs={"pk": self.workout.pk})
+        )
+        self.assertEqual(list(response.context["available_exercises"]), [self.squat])
+        self.assertSameContext(
+            await self.sync_get(
+                reverse("workouts:workout_detail", kwargs={"pk": self.workout.pk})
+            ),
+            response,
+            ["exercise_records", "total_volume", "available_exercises"],
+        )
+
+    async def test_add_exercise_recommendations(self):
+        response = await self.async_client.get(
+            reverse("async_add_exercise", kwargs={"pk": self.workout.pk})
+        )
+        self.assertEqual(
+            response.context["exercise_recommendations"][self.bench.pk][
+                "recommended_weight"
+            ],
+            Decimal("62.50"),
+        )
+        self.assertSameContext(
+            await self.sync_get(
+                reverse("workouts:add_exercise", kwargs={"pk": self.workout.pk})
+            ),
+            response,
+            ["exercise_recommendations"],
+        )
+
+    async def test_add_exercise_post(self):
+        url = reverse("async_add_exercise", kwargs={"pk": self.workout.pk})
+        data = {
+            "exercise": self.squat.pk,
+            "weight_kg": "100",
+            "reps": 5,
+            "sets": 3,
+            "difficulty_rating": 8,
+        }
+        response = await self.async_client.post(url, data)
+        self.assertRedirects(
+            response,
+            reverse("workouts:workout_detail", kwargs={"pk": self.workout.pk}),
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(await self.workout.exercise_records.acount(), 2)
+
+        response = await self.async_client.post(url, {**data, "reps": 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.bench.pk, response.context["exercise_recommendations"])
+
+    async def test_requires_login(self):
+        await self.async_client.alogout()
+        response = await self.async_client.get(reverse("async_dashboard"))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_other_users_workout_not_found(self):
+        other = await User.objects.acreate_user(
+            email="other@example.com", username="other", password="testpass123"
+        )
+        workout = await WorkoutSession.objects.acreate(user=other, date=date.today())
+        for name in ["async_workout_detail", "async_add_exercise"]:
+            response = await self.async_client.get(
+                reverse(name, kwargs={"pk": workout.pk})
+            )
+            self.assertEqual(response.status_code, 404)
+
+    async def test_unchanged_page_returns_304(self):
+        url = reverse("async_workout_detail", kwargs={"pk": self.workout.pk})
+        response = await self.async_client.get(url)
+        response = await self.async_client.get(
+            url, headers={"if-none-match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def sync_get(self, url):
+        return await sync_to_async(self.client.get)(url)
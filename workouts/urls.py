@@ -1,23 +1,48 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = "workouts"
 
+if settings.ASYNC_VIEWS:
+    DashboardView = views.AsyncDashboardView
+    WorkoutSessionDetailView = views.AsyncWorkoutSessionDetailView
+    AddExerciseToWorkoutView = views.AsyncAddExerciseToWorkoutView
+else:
+    DashboardView = views.DashboardView
+    WorkoutSessionDetailView = views.WorkoutSessionDetailView
+    AddExerciseToWorkoutView = views.AddExerciseToWorkoutView
+
 urlpatterns = [
-    path("", views.DashboardView.as_view(), name="dashboard"),
+    path("", DashboardView.as_view(), name="dashboard"),
     path(
         "workout/new/", views.CreateWorkoutSessionView.as_view(), name="create_workout"
     ),
     path(
         "workout/<int:pk>/",
-        views.WorkoutSessionDetailView.as_view(),
+        WorkoutSessionDetailView.as_view(),
         name="workout_detail",
     ),
+    path(
+        "workout/<int:pk>/repeat/",
+        views.RepeatWorkoutView.as_view(),
+        name="repeat_workout",
+    ),
+    path(
+        "workout/<int:pk>/events/",
+        views.WorkoutEventsView.as_view(),
+        name="workout_events",
+    ),
     path(
         "workout/<int:pk>/add-exercise/",
-        views.AddExerciseToWorkoutView.as_view(),
+        AddExerciseToWorkoutView.as_view(),
         name="add_exercise",
     ),
+    path(
+        "workout/<int:pk>/add-exercises/",
+        views.BatchAddExercisesView.as_view(),
+        name="batch_add_exercises",
+    ),
     path(
         "workout/<int:workout_pk>/exercise/<int:pk>/edit/",
         views.EditExerciseRecordView.as_view(),
@@ -33,6 +58,9 @@ urlpatterns = [
         views.CompleteWorkoutView.as_view(),
         name="complete_workout",
     ),
+    path("sync/", views.SyncView.as_view(), name="sync"),
+    path("sw.js", views.ServiceWorkerView.as_view(), name="service_worker"),
+    path("metrics", views.MetricsView.as_view(), name="metrics"),
     path("exercises/", views.ExerciseListView.as_view(), name="exercise_list"),
     path("exercises/add/", views.AddExerciseView.as_view(), name="add_exercise_type"),
     path("history/", views.WorkoutHistoryView.as_view(), name="workout_history"),
@@ -1,63 +1,301 @@
-from django.shortcuts import get_object_or_404, redirect
+import asyncio
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
 from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import router, transaction
+from django.db.models import Count, Func, Max, OuterRef, Q, Subquery, Sum
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.template.loader import render_to_string
 from django.views.generic import (
+    View,
     ListView,
     DetailView,
     CreateView,
     UpdateView,
     DeleteView,
+    FormView,
     TemplateView,
 )
 from django.urls import reverse_lazy, reverse
+from django.middleware.csrf import get_token
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
 from datetime import date, timedelta
-from .models import Exercise, WorkoutSession, ExerciseRecord, UserProfile
-from .forms import WorkoutSessionForm, ExerciseRecordForm, ExerciseForm, UserProfileForm
+from decimal import Decimal
+from .models import (
+    Exercise,
+    ExerciseRecommendation,
+    WorkoutSession,
+    ExerciseRecord,
+    UserProfile,
+    FeedEntry,
+    current_time,
+)
+from .forms import (
+    WorkoutSessionForm,
+    ExerciseRecordForm,
+    ExerciseForm,
+    UserProfileForm,
+    BatchExerciseRecordFormSet,
+)
+from . import archive, events, metrics
+from .events import format_event, publish_sessions_changed
+from .recommendations import update_recommendations
+from .sync import apply_sync_batch
+
+
+async def alist(queryset):
+    """Evaluate a queryset with the async ORM"""
+    return [obj async for obj in queryset]
+
+
+class ConditionalGetMixin:
+    """
+    Answer repeat GETs with 304 Not Modified while the user's data is unchanged.
+
+    The ETag is a fingerprint of the user's workout sessions (whose updated_at
+    is touched whenever one of their exercise records changes), the sessions
+    and profiles of users who made them their workout partner, their profile
+    and the exercise list, fetched in a single aggregate query. Counts catch
+    rows that were deleted or stopped matching, the latest updated_at any
+    change to the rest.
+    """
+
+    def get_etag_parts(self):
+        """Extra values the page depends on, besides the user's data"""
+        return []
+
+    def get_version_queryset(self):
+        """The single row that changes whenever the user's data changes"""
+        return (
+            get_user_model()
+            # Joins the sessions, which may be in the gym's database
+            .objects.using(router.db_for_read(WorkoutSession))
+            .filter(pk=self.request.user.pk)
+            .values_list("profile__updated_at")
+            .annotate(
+                sessions_updated=Max("workout_sessions__updated_at"),
+                session_count=Count("workout_sessions"),
+                partner_sessions_updated=Subquery(
+                    WorkoutSession.objects.filter(
+                        user__profile__default_workout_partner=OuterRef("pk")
+                    )
+                    .order_by()
+                    .values(updated=Func("updated_at", function="MAX"))
+                ),
+                partner_session_count=Subquery(
+                    WorkoutSession.objects.filter(
+                        user__profile__default_workout_partner=OuterRef("pk")
+                    )
+                    .order_by()
+                    .values(count=Func("pk", function="COUNT"))
+                ),
+                partner_profiles_updated=Subquery(
+                    UserProfile.objects.filter(default_workout_partner=OuterRef("pk"))
+                    .order_by()
+                    .values(updated=Func("updated_at", function="MAX"))
+                ),
+                partner_count=Subquery(
+                    UserProfile.objects.filter(default_workout_partner=OuterRef("pk"))
+                    .order_by()
+                    .values(count=Func("pk", function="COUNT"))
+                ),
+                exercises_updated=Subquery(
+                    Exercise.objects.order_by().values(
+                        updated=Func("updated_at", function="MAX")
+                    )
+                ),
+                exercise_count=Subquery(
+                    Exercise.objects.order_by().values(
+                        count=Func("pk", function="COUNT")
+                    )
+                ),
+            )
+        )
 
+    def get_etag(self, version=None):
+        if version is None:
+            version = self.get_version_queryset().get()
+        # Cached forms carry a CSRF token, which must match the cookie. Set
+        # the cookie now rather than while rendering, so the first ETag
+        # already includes it.
+        get_token(self.request)
+        user = self.request.user
+        parts = [
+            user.pk,
+            user.email,
+            user.is_superuser,
+            self.request.META["CSRF_COOKIE"],
+            *version,
+            *self.get_etag_parts(),
+        ]
+        return quote_etag(hashlib.sha256(repr(parts).encode()).hexdigest()[:32])
+
+    def get(self, request, *args, **kwargs):
+        # Pending flash messages are part of the page, don't swallow them
+        if len(messages.get_messages(request)):
+            return super().get(request, *args, **kwargs)
+
+        etag = self.get_etag()
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return self.set_validators(response, etag)
+
+    def set_validators(self, response, etag):
+        response["ETag"] = etag
+        # Browsers must revalidate, and shared caches must not keep the page
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
-class DashboardView(LoginRequiredMixin, TemplateView):
-    """Main dashboard showing recent workouts and quick stats"""
 
-    template_name = "workouts/dashboard.html"
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """LoginRequiredMixin for views with async handlers"""
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        user = self.request.user
+    async def dispatch(self, request, *args, **kwargs):
+        # Load the user without blocking the event loop, later code reads it
+        # from request.user
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
+
+
+class AsyncConditionalGetMixin(ConditionalGetMixin):
+    """
+    ConditionalGetMixin for async views.
+
+    Views implement ``aget_page()``, the async counterpart of ``get()``.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        pending_messages = await sync_to_async(len)(messages.get_messages(request))
+        if pending_messages:
+            return await self.aget_page(request, *args, **kwargs)
+
+        etag = self.get_etag(await self.get_version_queryset().aget())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await self.aget_page(request, *args, **kwargs)
+        return self.set_validators(response, etag)
 
-        # Get recent workout sessions
-        recent_workouts = WorkoutSession.objects.filter(user=user).order_by(
-            "-date", "-start_time"
-        )[:5]
 
-        # Get today's workout if it exists
-        today_workout = WorkoutSession.objects.filter(
-            user=user, date=date.today()
-        ).first()
+class DashboardView(LoginRequiredMixin, ConditionalGetMixin, TemplateView):
+    """Main dashboard showing recent workouts and quick stats"""
+
+    template_name = "workouts/dashboard.html"
 
-        # Get workout stats for the last 30 days
+    def get_etag_parts(self):
+        # Today's workout and the 30 day count roll over at midnight
+        return [date.today()]
+
+    def get_querysets(self):
+        """The page's queries, which don't depend on each other"""
+        user = self.request.user
         thirty_days_ago = date.today() - timedelta(days=30)
-        recent_workouts_count = WorkoutSession.objects.filter(
-            user=user, date__gte=thirty_days_ago
-        ).count()
+        start_of_year = date.today().replace(month=1, day=1)
+        return {
+            # Recent workout sessions
+            "recent_workouts": (
+                WorkoutSession.objects.filter(user=user)
+                .annotate(exercise_count=Count("exercise_records"))
+                .order_by("-date", "-start_time")[:5]
+            ),
+            # Today's workout if it exists
+            "today_workout": WorkoutSession.objects.filter(
+                user=user, date=date.today()
+            ),
+            # Workout stats for the last 30 days and this year, see
+            # get_stats()
+            "workout_stats": WorkoutSession.objects.filter(
+                user=user, date__gte=min(thirty_days_ago, start_of_year)
+            ),
+            # Most recent exercise records for weight recommendations
+            "recent_exercises": ExerciseRecord.objects.filter(
+                workout_session__user=user
+            ).order_by("-created_at")[:10],
+            # What workout partners did lately
+            "partner_activity": FeedEntry.objects.for_user(user).select_related(
+                "actor__profile"
+            )[:10],
+        }
+
+    def get_stats(self):
+        """Aggregates over the workout_stats queryset"""
+        thirty_days_ago = date.today() - timedelta(days=30)
+        start_of_year = date.today().replace(month=1, day=1)
+        return {
+            "recent_workouts_count": Count("pk", filter=Q(date__gte=thirty_days_ago)),
+            "seconds_trained_this_year": Sum(
+                "duration_seconds", filter=Q(date__gte=start_of_year), default=0
+            ),
+        }
 
-        # Get most recent exercise records for weight recommendations
-        recent_exercises = ExerciseRecord.objects.filter(
-            workout_session__user=user
-        ).order_by("-created_at")[:10]
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        querysets = self.get_querysets()
+        context.update(
+            {
+                "recent_workouts": querysets["recent_workouts"],
+                "today_workout": querysets["today_workout"].first(),
+                **querysets["workout_stats"].aggregate(**self.get_stats()),
+                "recent_exercises": querysets["recent_exercises"],
+                "partner_activity": querysets["partner_activity"],
+            }
+        )
+        return context
 
+
+class AsyncDashboardView(
+    AsyncLoginRequiredMixin, AsyncConditionalGetMixin, DashboardView
+):
+    """DashboardView running its queries concurrently, for ASGI"""
+
+    async def aget_page(self, request, *args, **kwargs):
+        querysets = self.get_querysets()
+        (
+            recent_workouts,
+            today_workout,
+            workout_stats,
+            recent_exercises,
+            partner_activity,
+        ) = await asyncio.gather(
+            alist(querysets["recent_workouts"]),
+            querysets["today_workout"].afirst(),
+            querysets["workout_stats"].aaggregate(**self.get_stats()),
+            alist(querysets["recent_exercises"]),
+            alist(querysets["partner_activity"]),
+        )
+        # Skip DashboardView's, which runs the queries one after another
+        context = super(DashboardView, self).get_context_data(**kwargs)
         context.update(
             {
                 "recent_workouts": recent_workouts,
                 "today_workout": today_workout,
-                "recent_workouts_count": recent_workouts_count,
+                **workout_stats,
                 "recent_exercises": recent_exercises,
+                "partner_activity": partner_activity,
             }
         )
-        return context
+        return self.render_to_response(context)
 
 
 class CreateWorkoutSessionView(LoginRequiredMixin, CreateView):
@@ -79,7 +317,28 @@ class CreateWorkoutSessionView(LoginRequiredMixin, CreateView):
         return reverse("workouts:workout_detail", kwargs={"pk": self.object.pk})
 
 
-class WorkoutSessionDetailView(LoginRequiredMixin, DetailView):
+class RepeatWorkoutView(LoginRequiredMixin, View):
+    """
+    Start a workout session today, with the batch form prefilled from an
+    earlier one
+
+    Nothing is logged until the sets are submitted, so skipped exercises
+    don't end up in the feed or the weight trends.
+    """
+
+    http_method_names = ["post"]
+
+    def post(self, request, *args, **kwargs):
+        source = get_object_or_404(WorkoutSession, pk=kwargs["pk"], user=request.user)
+        workout = WorkoutSession.objects.create(user=request.user, date=date.today())
+        messages.success(
+            request, f"Workout session started with the exercises of {source.date}"
+        )
+        url = reverse("workouts:batch_add_exercises", kwargs={"pk": workout.pk})
+        return redirect(f"{url}?repeat={source.pk}")
+
+
+class WorkoutSessionDetailView(LoginRequiredMixin, ConditionalGetMixin, DetailView):
     """View details of a specific workout session"""
 
     model = WorkoutSession
@@ -87,7 +346,39 @@ class WorkoutSessionDetailView(LoginRequiredMixin, DetailView):
     context_object_name = "workout"
 
     def get_queryset(self):
-        return WorkoutSession.objects.filter(user=self.request.user)
+        # Workout partners can follow along, read-only
+        return WorkoutSession.objects.visible_to(self.request.user)
+
+    def get_object(self, queryset=None):
+        self.archived = False
+        try:
+            return super().get_object(queryset)
+        except Http404:
+            # Old sessions are moved to the archives, where only their owner
+            # can look them up
+            workout = archive.find_session(self.request.user, self.kwargs["pk"])
+            if workout is None:
+                raise
+            self.archived = True
+            return workout
+
+    def get_exercises_by_last_use(self):
+        """
+        All exercises, most recently done by this user first.
+
+        The last use aggregates the user's whole history, which doesn't need to
+        wait for (or hold up) writes on the primary connection.
+        """
+        return (
+            Exercise.objects.for_analytics()
+            .annotate(
+                last_used=Max(
+                    "exerciserecord__created_at",
+                    filter=Q(exerciserecord__workout_session__user=self.request.user),
+                )
+            )
+            .order_by("-last_used", "name")
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -97,36 +388,183 @@ class WorkoutSessionDetailView(LoginRequiredMixin, DetailView):
         exercise_records = workout.exercise_records.all().order_by("-created_at")
 
         # Calculate total volume
-        total_volume = sum(record.total_volume for record in exercise_records)
+        total_volume_g = exercise_records.aggregate(total=Sum("volume_g", default=0))[
+            "total"
+        ]
 
         # Get exercises already done in this workout
         done_exercise_ids = set(exercise_records.values_list("exercise_id", flat=True))
 
         # Get all exercises, excluding ones already done in this workout
-        available_exercises = Exercise.objects.exclude(id__in=done_exercise_ids)
+        available_exercises = self.get_exercises_by_last_use().exclude(
+            id__in=done_exercise_ids
+        )
 
-        # Sort by most recent usage (last time this exercise was done by this user)
-        # We'll annotate with the last usage date and sort by it
-        from django.db.models import Max, Q
+        context.update(
+            {
+                "exercise_records": exercise_records,
+                "total_volume": total_volume_g / 1000,
+                "available_exercises": available_exercises,
+                "archived": self.archived,
+                "read_only": workout.user_id != self.request.user.pk or self.archived,
+            }
+        )
+        return context
 
-        available_exercises = available_exercises.annotate(
-            last_used=Max(
-                "exerciserecord__created_at",
-                filter=Q(exerciserecord__workout_session__user=self.request.user),
+
+class AsyncWorkoutSessionDetailView(
+    AsyncLoginRequiredMixin, AsyncConditionalGetMixin, WorkoutSessionDetailView
+):
+    """WorkoutSessionDetailView running its queries concurrently, for ASGI"""
+
+    async def aget_page(self, request, *args, **kwargs):
+        archived = False
+        try:
+            self.object = await self.get_queryset().aget(pk=self.kwargs["pk"])
+        except WorkoutSession.DoesNotExist:
+            self.object = await sync_to_async(archive.find_session)(
+                request.user, self.kwargs["pk"]
             )
-        ).order_by("-last_used", "name")
+            if self.object is None:
+                raise Http404("No workout session found matching the query")
+            archived = True
+
+        # Fetch every exercise rather than exclude the ones done in this
+        # workout, so the two queries don't have to wait for each other
+        exercise_records, volume, exercises = await asyncio.gather(
+            alist(self.object.exercise_records.order_by("-created_at")),
+            self.object.exercise_records.aaggregate(total=Sum("volume_g", default=0)),
+            alist(self.get_exercises_by_last_use()),
+        )
+        done_exercise_ids = {record.exercise_id for record in exercise_records}
 
+        # Skip WorkoutSessionDetailView's, which runs the queries in turn
+        context = super(WorkoutSessionDetailView, self).get_context_data(**kwargs)
         context.update(
             {
                 "exercise_records": exercise_records,
-                "total_volume": total_volume,
-                "available_exercises": available_exercises,
+                "total_volume": volume["total"] / 1000,
+                "available_exercises": [
+                    exercise
+                    for exercise in exercises
+                    if exercise.id not in done_exercise_ids
+                ],
+                "archived": archived,
+                "read_only": self.object.user_id != request.user.pk or archived,
             }
         )
-        return context
+        return self.render_to_response(context)
+
+
+class WorkoutEventsView(AsyncLoginRequiredMixin, View):
+    """
+    Server-Sent Events stream of changes to a workout's exercise records.
+
+    Whenever records of the session change, the stream sends every record
+    saved since the last update as a rendered row (``record`` events), followed
+    by the ids of all current records (a ``records`` event) so deleted rows can
+    be removed. ``?since=`` is the session's updated_at as the page showed it;
+    after a reconnect the browser sends the last event id instead. A client
+    that falls so far behind that notifications are dropped gets a ``reload``
+    event, and the stream ends.
+    """
 
+    async def get(self, request, pk):
+        workout = await aget_object_or_404(
+            WorkoutSession.objects.visible_to(request.user), pk=pk
+        )
+        # Under WSGI an endless response would tie up a worker thread. 204
+        # tells EventSource not to reconnect.
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse(status=204)
+
+        since = parse_datetime(
+            request.headers.get("Last-Event-ID") or request.GET.get("since", "")
+        )
+        if since is None:
+            return HttpResponseBadRequest("since must be an ISO 8601 timestamp")
+
+        response = StreamingHttpResponse(
+            self.stream(workout, since), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # Don't let nginx hold events back in its buffer
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream(self, workout, since):
+        read_only = workout.user_id != self.request.user.pk
+        async with events.subscribe(events.workout_channel(workout.pk)) as updates:
+            while True:
+                # Also catches up on changes made before we subscribed
+                changed = workout.exercise_records.filter(
+                    updated_at__gt=since
+                ).select_related("exercise")
+                async for record in changed.order_by("updated_at"):
+                    html = await sync_to_async(render_to_string)(
+                        "workouts/partials/exercise_record_row.html",
+                        {"record": record, "workout": workout, "read_only": read_only},
+                    )
+                    yield format_event("record", html)
+                    since = record.updated_at
+                record_ids = await alist(
+                    workout.exercise_records.values_list("pk", flat=True)
+                )
+                yield format_event(
+                    "records", json.dumps(record_ids), id=since.isoformat()
+                )
 
-class AddExerciseToWorkoutView(LoginRequiredMixin, CreateView):
+                while True:
+                    try:
+                        await updates.get(timeout=settings.EVENTS_HEARTBEAT_SECONDS)
+                    except TimeoutError:
+                        # Keeps proxies from closing an idle connection
+                        yield ": heartbeat\n\n"
+                        continue
+                    if updates.missed:
+                        # Rather than catch up a client that doesn't keep up,
+                        # let it start over with a fresh page
+                        yield format_event("reload", "")
+                        return
+                    # One query covers every change announced so far
+                    updates.clear()
+                    break
+
+
+class ExerciseRecordChangeMixin:
+    """
+    Answer HTMX requests that change an exercise record with just its row and
+    the workout's stats, swapped in out of band, instead of redirecting to the
+    whole workout page
+    """
+
+    def is_htmx(self):
+        return bool(self.request.headers.get("HX-Request"))
+
+    def get_workout_stats(self, workout):
+        stats = ExerciseRecord.objects.filter(workout_session=workout).aggregate(
+            record_count=Count("pk"), total_volume_g=Sum("volume_g", default=0)
+        )
+        return {
+            "record_count": stats["record_count"],
+            "total_volume": stats["total_volume_g"] / 1000,
+        }
+
+    def render_record_change(self, workout, record=None):
+        """
+        The changed row, none for a deleted record, and the new stats, plus
+        the empty list placeholder once the last record is gone
+        """
+        return render(
+            self.request,
+            "workouts/partials/exercise_record_change.html",
+            {"record": record, "workout": workout, **self.get_workout_stats(workout)},
+        )
+
+
+class AddExerciseToWorkoutView(
+    LoginRequiredMixin, ExerciseRecordChangeMixin, CreateView
+):
     """Add an exercise to a workout session"""
 
     model = ExerciseRecord
@@ -158,70 +596,225 @@ class AddExerciseToWorkoutView(LoginRequiredMixin, CreateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["workout"] = self.workout
+        context.update(self.get_workout_stats(self.workout))
 
-        # Get recent performance for each exercise for weight recommendations
-        exercises = Exercise.objects.all()
-        exercise_recommendations = {}
+        context["exercise_recommendations"] = self.get_exercise_recommendations()
+        return context
 
-        for exercise in exercises:
-            last_record = (
-                ExerciseRecord.objects.filter(
-                    exercise=exercise, workout_session__user=self.request.user
-                )
-                .order_by("-created_at")
-                .first()
-            )
+    def get_exercise_recommendations(self):
+        """Weight recommendations for each exercise, see workouts.recommendations"""
+        return self.recommendations_from(self.get_recommendations())
 
-            if last_record:
-                exercise_recommendations[exercise.id] = {
-                    "last_weight": last_record.weight_kg,
-                    "last_difficulty": last_record.difficulty_rating,
-                    "recommended_weight": self._get_recommended_weight(last_record),
-                }
+    def get_recommendations(self):
+        return ExerciseRecommendation.objects.filter(user=self.request.user)
 
-        context["exercise_recommendations"] = exercise_recommendations
-        return context
+    def recommendations_from(self, recommendations):
+        return {
+            recommendation.exercise_id: {
+                "last_weight": recommendation.last_weight_kg,
+                "last_difficulty": recommendation.last_difficulty,
+                "recommended_weight": recommendation.recommended_weight_kg,
+            }
+            for recommendation in recommendations
+        }
 
     def form_valid(self, form):
         form.instance.workout_session = self.workout
+        if self.is_htmx():
+            self.object = form.save()
+            return self.render_record_change(self.workout, self.object)
         response = super().form_valid(form)
         messages.success(
             self.request, f"Added {form.instance.exercise.name} to workout"
         )
         return response
 
+    def form_invalid(self, form):
+        if self.is_htmx():
+            # Show the errors in place of the form instead of adding a row
+            response = render(
+                self.request,
+                "workouts/partials/exercise_add_form.html",
+                {"form": form, "workout": self.workout},
+            )
+            response["HX-Retarget"] = "#add-exercise-form"
+            response["HX-Reswap"] = "outerHTML"
+            return response
+        return super().form_invalid(form)
+
     def get_success_url(self):
         return reverse("workouts:workout_detail", kwargs={"pk": self.workout.pk})
 
-    def _get_recommended_weight(self, last_record):
-        """Simple weight recommendation based on last difficulty"""
-        from decimal import Decimal
 
-        if not last_record or last_record.weight_kg is None:
-            return Decimal(
-                "0"
-            )  # Default weight if no previous record or weight is None
+class AsyncAddExerciseToWorkoutView(AsyncLoginRequiredMixin, AddExerciseToWorkoutView):
+    """AddExerciseToWorkoutView looking up recommendations asynchronously, for ASGI"""
+
+    async def get(self, request, *args, **kwargs):
+        self.workout = await aget_object_or_404(
+            WorkoutSession, pk=kwargs["pk"], user=request.user
+        )
+        self.exercise_recommendations = self.recommendations_from(
+            await alist(self.get_recommendations())
+        )
+        # The form and its choices are still built synchronously
+        return await sync_to_async(super().get)(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        self.workout = await aget_object_or_404(
+            WorkoutSession, pk=kwargs["pk"], user=request.user
+        )
+        return await sync_to_async(super().post)(request, *args, **kwargs)
+
+    async def put(self, *args, **kwargs):
+        return await self.post(*args, **kwargs)
+
+    def get_exercise_recommendations(self):
+        # Only an invalid POST gets here without them
+        if hasattr(self, "exercise_recommendations"):
+            return self.exercise_recommendations
+        return super().get_exercise_recommendations()
+
+
+class BatchAddExercisesView(LoginRequiredMixin, FormView):
+    """Log several exercise records on a workout session in one submission"""
+
+    form_class = BatchExerciseRecordFormSet
+    template_name = "workouts/batch_add_exercises.html"
+
+    def dispatch(self, request, *args, **kwargs):
+        # Only get workout if user is authenticated
+        if request.user.is_authenticated:
+            self.workout = get_object_or_404(
+                WorkoutSession, pk=kwargs["pk"], user=request.user
+            )
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_initial(self):
+        # Prefilled rows are only a suggestion; what is posted stands alone
+        if self.request.method == "GET" and "repeat" in self.request.GET:
+            return self.get_repeat_initial(self.request.GET["repeat"])
+        return []
+
+    def get_repeat_initial(self, source_pk):
+        """
+        Rows for the exercises of an earlier workout, at their recommended
+        weights. The difficulty is left for the user to rate again.
+        """
+        try:
+            source = WorkoutSession.objects.get(
+                pk=int(source_pk), user=self.request.user
+            )
+        except (ValueError, WorkoutSession.DoesNotExist):
+            raise Http404("No such workout to repeat")
+        source_records = list(source.exercise_records.order_by("created_at", "pk"))
+        recommendations = {
+            r.exercise_id: r
+            for r in ExerciseRecommendation.objects.filter(
+                user=self.request.user,
+                exercise__in={record.exercise_id for record in source_records},
+            )
+        }
+        top_weights = {}
+        for record in source_records:
+            top_weights[record.exercise_id] = max(
+                record.weight_kg, top_weights.get(record.exercise_id, 0)
+            )
+        return [
+            {
+                "exercise": record.exercise_id,
+                "weight_kg": self.get_weight(
+                    record,
+                    top_weights[record.exercise_id],
+                    recommendations.get(record.exercise_id),
+                ),
+                "reps": record.reps,
+                "sets": record.sets,
+            }
+            for record in source_records
+        ]
+
+    def get_weight(self, record, top_weight, recommendation):
+        """
+        The recommended weight for the heaviest set of an exercise, and lighter
+        sets as much lighter as they were
+        """
+        if recommendation is None:
+            return record.weight_kg
+        return max(
+            Decimal("0"),
+            recommendation.recommended_weight_kg - (top_weight - record.weight_kg),
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["formset"] = context.pop("form")
+        context["workout"] = self.workout
+        return context
+
+    def form_valid(self, formset):
+        records = []
+        for form in formset:
+            if form.has_changed():
+                form.instance.workout_session = self.workout
+                records.append(form.save(commit=False))
+
+        with transaction.atomic(using=router.db_for_write(ExerciseRecord)):
+            ExerciseRecord.objects.bulk_create(records)
+            WorkoutSession.objects.filter(pk=self.workout.pk).touch()
+            publish_sessions_changed([self.workout.pk])
+            FeedEntry.objects.records_added(self.request.user.pk, records)
+
+        if self.request.headers.get("HX-Request"):
+            return render(
+                self.request,
+                "workouts/partials/exercise_record_rows.html",
+                {"records": records, "workout": self.workout},
+            )
+
+        messages.success(self.request, f"Logged {len(records)} exercises")
+        return redirect("workouts:workout_detail", pk=self.workout.pk)
 
-        if last_record.difficulty_rating <= 5:
-            # Easy to moderate, increase weight by 2.5kg
-            return last_record.weight_kg + Decimal("2.5")
-        elif last_record.difficulty_rating <= 7:
-            # Hard, keep same weight
-            return last_record.weight_kg
-        else:
-            # Very hard, decrease weight by 2.5kg
-            return max(Decimal("0"), last_record.weight_kg - Decimal("2.5"))
+    def form_invalid(self, formset):
+        if self.request.headers.get("HX-Request"):
+            # Show the errors in place of the form instead of adding rows
+            response = render(
+                self.request,
+                "workouts/partials/batch_exercise_form.html",
+                {"formset": formset, "workout": self.workout},
+            )
+            response["HX-Retarget"] = "#batch-form"
+            response["HX-Reswap"] = "outerHTML"
+            return response
+        return super().form_invalid(formset)
 
 
-class EditExerciseRecordView(LoginRequiredMixin, UpdateView):
-    """Edit an exercise record"""
+class EditExerciseRecordView(LoginRequiredMixin, ExerciseRecordChangeMixin, UpdateView):
+    """Edit an exercise record, in place of its row for HTMX requests"""
 
     model = ExerciseRecord
     form_class = ExerciseRecordForm
     template_name = "workouts/edit_exercise.html"
 
     def get_queryset(self):
-        return ExerciseRecord.objects.filter(workout_session__user=self.request.user)
+        return ExerciseRecord.objects.filter(
+            workout_session__user=self.request.user
+        ).select_related("workout_session")
+
+    def get_template_names(self):
+        if self.is_htmx():
+            return ["workouts/partials/exercise_record_form.html"]
+        return super().get_template_names()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["workout"] = self.object.workout_session
+        return context
+
+    def form_valid(self, form):
+        if self.is_htmx():
+            self.object = form.save()
+            return self.render_record_change(self.object.workout_session, self.object)
+        return super().form_valid(form)
 
     def get_success_url(self):
         return reverse(
@@ -229,14 +822,24 @@ class EditExerciseRecordView(LoginRequiredMixin, UpdateView):
         )
 
 
-class DeleteExerciseRecordView(LoginRequiredMixin, DeleteView):
+class DeleteExerciseRecordView(
+    LoginRequiredMixin, ExerciseRecordChangeMixin, DeleteView
+):
     """Delete an exercise record"""
 
     model = ExerciseRecord
     template_name = "workouts/delete_exercise.html"
 
     def get_queryset(self):
-        return ExerciseRecord.objects.filter(workout_session__user=self.request.user)
+        return ExerciseRecord.objects.filter(
+            workout_session__user=self.request.user
+        ).select_related("workout_session")
+
+    def form_valid(self, form):
+        if self.is_htmx():
+            self.object.delete()
+            return self.render_record_change(self.object.workout_session)
+        return super().form_valid(form)
 
     def get_success_url(self):
         return reverse(
@@ -255,10 +858,16 @@ class CompleteWorkoutView(LoginRequiredMixin, UpdateView):
         return WorkoutSession.objects.filter(user=self.request.user)
 
     def form_valid(self, form):
+        was_completed = form.initial["is_completed"]
         form.instance.is_completed = True
         if not form.instance.end_time:
-            form.instance.end_time = timezone.now().time()
+            form.instance.end_time = current_time()
         response = super().form_valid(form)
+        # Once per workout rather than with every set logged. Covers sets of
+        # earlier workouts changed since, too.
+        update_recommendations(self.request.user)
+        if not was_completed:
+            FeedEntry.objects.session_completed(self.object)
         messages.success(self.request, "Workout completed! Great job!")
         return response
 
@@ -266,6 +875,57 @@ class CompleteWorkoutView(LoginRequiredMixin, UpdateView):
         return reverse("workouts:dashboard")
 
 
+class SyncView(LoginRequiredMixin, View):
+    """Apply a batch of sessions and exercise records logged while offline"""
+
+    raise_exception = True  # API clients get a 403 instead of a login redirect
+
+    def post(self, request, *args, **kwargs):
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({"error": "Request body must be JSON"}, status=400)
+
+        try:
+            changes = apply_sync_batch(request.user, payload)
+        except ValidationError as e:
+            return JsonResponse({"error": " ".join(e.messages)}, status=400)
+
+        return JsonResponse(changes)
+
+
+class ServiceWorkerView(TemplateView):
+    """Serve the service worker from the site root so it can control every page"""
+
+    template_name = "workouts/sw.js"
+    content_type = "application/javascript"
+
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        # Browsers check for an updated worker on navigation; keep it fresh
+        response["Cache-Control"] = "no-cache"
+        return response
+
+
+class MetricsView(View):
+    """Prometheus metrics of all worker processes, for local scrapers only"""
+
+    def get(self, request, *args, **kwargs):
+        if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+            raise PermissionDenied
+        gauges = [
+            (
+                "gymtracker_active_sessions",
+                "Login sessions that have not expired",
+                Session.objects.filter(expire_date__gt=timezone.now()).count(),
+            ),
+        ]
+        return HttpResponse(
+            metrics.render(metrics.collect(), gauges),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+
 class ExerciseListView(LoginRequiredMixin, ListView):
     """List all available exercises"""
 
@@ -284,7 +944,7 @@ class AddExerciseView(LoginRequiredMixin, CreateView):
     success_url = reverse_lazy("workouts:exercise_list")
 
 
-class WorkoutHistoryView(LoginRequiredMixin, ListView):
+class WorkoutHistoryView(LoginRequiredMixin, ConditionalGetMixin, ListView):
     """View workout history with filtering"""
 
     model = WorkoutSession
@@ -304,7 +964,12 @@ class WorkoutHistoryView(LoginRequiredMixin, ListView):
         if date_to:
             queryset = queryset.filter(date__lte=date_to)
 
-        return queryset.order_by("-date", "-start_time")
+        queryset = queryset.annotate(exercise_count=Count("exercise_records")).order_by(
+            "-date", "-start_time"
+        )
+        if self.request.GET.get("archived"):
+            return queryset.with_archives()
+        return queryset
 
 
 class UserProfileView(LoginRequiredMixin, UpdateView):